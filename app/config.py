@@ -11,6 +11,76 @@ USE_ASYNC_ENGINE = bool(int(os.environ.get("USE_ASYNC_ENGINE", False)))
 TIMEZONE = os.environ.get("TIMEZONE", "Chile/Continental")
 REDIS_URL = os.environ.get("REDIS_URL", "redis://redis:6379")
 
+CACHE_L1_MAXSIZE = int(os.environ.get("CACHE_L1_MAXSIZE", 1024))
+CACHE_L1_TTL = float(os.environ.get("CACHE_L1_TTL", 30))
+CACHE_L2_ENABLED = bool(int(os.environ.get("CACHE_L2_ENABLED", True)))
+CACHE_L2_TTL = int(os.environ.get("CACHE_L2_TTL", 300))
+CACHE_INVALIDATION_CHANNEL = os.environ.get("CACHE_INVALIDATION_CHANNEL", "psifos:cache:invalidate")
+
+EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", 1000))
+COUNT_CACHE_TTL = int(os.environ.get("COUNT_CACHE_TTL", 10))
+TRACKER_SET_TTL = int(os.environ.get("TRACKER_SET_TTL", 30))
+TRACKER_VERIFY_MAX_HASHES = int(os.environ.get("TRACKER_VERIFY_MAX_HASHES", 500))
+
+LIVE_STATS_INTERVAL = float(os.environ.get("LIVE_STATS_INTERVAL", 5))
+LIVE_STATS_KEEPALIVE = float(os.environ.get("LIVE_STATS_KEEPALIVE", 15))
+
+SNAPSHOT_REFRESH_ENABLED = bool(int(os.environ.get("SNAPSHOT_REFRESH_ENABLED", True)))
+SNAPSHOT_FAST_INTERVAL = float(os.environ.get("SNAPSHOT_FAST_INTERVAL", 10))
+SNAPSHOT_SLOW_INTERVAL = float(os.environ.get("SNAPSHOT_SLOW_INTERVAL", 60))
+SNAPSHOT_JITTER = float(os.environ.get("SNAPSHOT_JITTER", 0.2))
+
+CIRCUIT_WINDOW = int(os.environ.get("CIRCUIT_WINDOW", 50))
+CIRCUIT_MIN_CALLS = int(os.environ.get("CIRCUIT_MIN_CALLS", 20))
+CIRCUIT_ERROR_RATE = float(os.environ.get("CIRCUIT_ERROR_RATE", 0.5))
+CIRCUIT_SLOW_CALL_SECONDS = float(os.environ.get("CIRCUIT_SLOW_CALL_SECONDS", 2))
+CIRCUIT_SLOW_CALL_RATE = float(os.environ.get("CIRCUIT_SLOW_CALL_RATE", 0.8))
+CIRCUIT_OPEN_SECONDS = float(os.environ.get("CIRCUIT_OPEN_SECONDS", 10))
+STALE_CACHE_MAXSIZE = int(os.environ.get("STALE_CACHE_MAXSIZE", 2048))
+STALE_CACHE_TTL = int(os.environ.get("STALE_CACHE_TTL", 86400))
+STALE_CACHE_REFRESH = float(os.environ.get("STALE_CACHE_REFRESH", 30))
+
+ADMISSION_HEAVY_CONCURRENCY = int(os.environ.get("ADMISSION_HEAVY_CONCURRENCY", 4))
+ADMISSION_HEAVY_QUEUE = int(os.environ.get("ADMISSION_HEAVY_QUEUE", 16))
+ADMISSION_LIST_CONCURRENCY = int(os.environ.get("ADMISSION_LIST_CONCURRENCY", 16))
+ADMISSION_LIST_QUEUE = int(os.environ.get("ADMISSION_LIST_QUEUE", 64))
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT", 10))
+ADMISSION_RETRY_AFTER = int(os.environ.get("ADMISSION_RETRY_AFTER", 5))
+
+# Queries outside of a route class, 0 for no limit
+STATEMENT_TIMEOUT_DEFAULT = float(os.environ.get("STATEMENT_TIMEOUT_DEFAULT", 0))
+STATEMENT_TIMEOUT_LIST = float(os.environ.get("STATEMENT_TIMEOUT_LIST", 5))
+STATEMENT_TIMEOUT_HEAVY = float(os.environ.get("STATEMENT_TIMEOUT_HEAVY", 30))
+# Snapshot refresher and Merkle tree rebuilds
+STATEMENT_TIMEOUT_BACKGROUND = float(os.environ.get("STATEMENT_TIMEOUT_BACKGROUND", 30))
+# Server side cursor streams (exports), 0 for no limit
+STATEMENT_TIMEOUT_STREAM = float(os.environ.get("STATEMENT_TIMEOUT_STREAM", 0))
+
+# "memory" keeps the jobs and their results in the worker process
+# (single worker deployments only), "redis" shares them between workers
+JOB_QUEUE_BACKEND = os.environ.get("JOB_QUEUE_BACKEND", "memory")
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 2))
+JOB_RESULT_TTL = int(os.environ.get("JOB_RESULT_TTL", 3600))
+
+BATCH_STATS_MAX_ELECTIONS = int(os.environ.get("BATCH_STATS_MAX_ELECTIONS", 100))
+
+ELECTION_INDEX_TTL = int(os.environ.get("ELECTION_INDEX_TTL", 60))
+
+RESULTS_CACHE_TTL = int(os.environ.get("RESULTS_CACHE_TTL", 86400))
+
+TALLY_CHUNK_SIZE = int(os.environ.get("TALLY_CHUNK_SIZE", 262144))
+TALLY_CACHE_TTL = int(os.environ.get("TALLY_CACHE_TTL", 86400))
+
+MERKLE_REFRESH_TTL = float(os.environ.get("MERKLE_REFRESH_TTL", 10))
+MERKLE_MAX_TREES = int(os.environ.get("MERKLE_MAX_TREES", 16))
+
+SYNC_MAX_PAGE_SIZE = int(os.environ.get("SYNC_MAX_PAGE_SIZE", 1000))
+
+BUNDLE_SHARD_SIZE = int(os.environ.get("BUNDLE_SHARD_SIZE", 5000))
+BUNDLE_MANIFEST_TTL = int(os.environ.get("BUNDLE_MANIFEST_TTL", 3600))
+# Manifest snapshots of started elections (votes still coming)
+BUNDLE_MANIFEST_LIVE_TTL = int(os.environ.get("BUNDLE_MANIFEST_LIVE_TTL", 60))
+
 TOKEN_ANALYTICS_INFO = os.environ.get("TOKEN_ANALYTICS_INFO")
 
 ORIGINS: list = [
@@ -0,0 +1,107 @@
+"""
+Circuit breaker for database queries.
+
+The breaker keeps the outcome of the last queries (error and
+latency) in a sliding window. When too many of them fail or
+are too slow the circuit opens: queries fail fast with
+CircuitOpenError, instead of piling up on the connection pool,
+until a probe query is allowed again after open_seconds.
+
+19-10-2026
+"""
+
+import time
+
+from collections import deque
+
+from app.logger import logger
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised when a query is refused because the circuit is open.
+    """
+
+    def __init__(self, retry_after: float) -> None:
+        super().__init__("database circuit is open")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker(object):
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, window: int, min_calls: int, error_rate: float, slow_call_seconds: float,
+                 slow_call_rate: float, open_seconds: float) -> None:
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.state = self.CLOSED
+        self._calls = deque(maxlen=window)
+        self._opened_at = 0
+        self._probing = False
+
+    def before_call(self):
+        """
+        Raises CircuitOpenError if the query must not be run,
+        lets a single probe through once open_seconds elapsed.
+        """
+
+        if self.state == self.CLOSED:
+            return
+
+        elapsed = time.monotonic() - self._opened_at
+        if elapsed < self.open_seconds or self._probing:
+            raise CircuitOpenError(retry_after=max(self.open_seconds - elapsed, 1))
+
+        self.state = self.HALF_OPEN
+        self._probing = True
+
+    def record_success(self, latency: float):
+        if self.state == self.HALF_OPEN:
+            self._close()
+        self._record(error=False, slow=latency >= self.slow_call_seconds)
+
+    def record_failure(self):
+        if self.state == self.HALF_OPEN:
+            self._open()
+            return
+        self._record(error=True, slow=False)
+
+    def record_abort(self):
+        """
+        Records a query that ended neither in a result nor in a
+        database error (e.g. cancelled when the client went away).
+        A half-open probe that ends so reopens the circuit, so that
+        the next probe is let through after open_seconds.
+        """
+
+        if self.state == self.HALF_OPEN:
+            self._open()
+
+    def _record(self, error: bool, slow: bool):
+        self._calls.append((error, slow))
+        if self.state != self.CLOSED or len(self._calls) < self.min_calls:
+            return
+
+        total = len(self._calls)
+        errors = sum(1 for error, _ in self._calls if error)
+        slow_calls = sum(1 for _, slow in self._calls if slow)
+        if errors / total >= self.error_rate or slow_calls / total >= self.slow_call_rate:
+            self._open()
+
+    def _open(self):
+        if self.state != self.OPEN:
+            logger.warning(f"database circuit opened for {self.open_seconds} seconds")
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._probing = False
+
+    def _close(self):
+        self.state = self.CLOSED
+        self._calls.clear()
+        self._probing = False
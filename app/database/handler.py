@@ -1,22 +1,92 @@
+import asyncio
+import time
+
+from contextvars import ContextVar
 from typing import Any
 
-from app.config import USE_ASYNC_ENGINE
-from sqlalchemy import create_engine
+from app.config import (
+    USE_ASYNC_ENGINE, CIRCUIT_WINDOW, CIRCUIT_MIN_CALLS, CIRCUIT_ERROR_RATE,
+    CIRCUIT_SLOW_CALL_SECONDS, CIRCUIT_SLOW_CALL_RATE, CIRCUIT_OPEN_SECONDS, STATEMENT_TIMEOUT_DEFAULT,
+    STATEMENT_TIMEOUT_STREAM
+)
+from app.database.circuit_breaker import CircuitBreaker
+from app.logger import logger
+from sqlalchemy import create_engine, event, exc, text
+from sqlalchemy.sql import Select
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import Session, declarative_base, sessionmaker
 
 
+# Execution time budget (seconds) of the SELECT statements run
+# in the current context, set by route class (app.psifos.admission)
+# and by the background tasks, 0 for no limit
+statement_timeout = ContextVar("statement_timeout", default=STATEMENT_TIMEOUT_DEFAULT)
+
+
+def with_time_budget(statement: Any, budget: float = None):
+    """
+    Adds the MySQL MAX_EXECUTION_TIME hint of budget (by default
+    the current statement_timeout) to a SELECT statement. MariaDB
+    ignores the hint, see mariadb_time_budget.
+    """
+
+    budget = statement_timeout.get() if budget is None else budget
+    if not budget or not isinstance(statement, Select):
+        return statement
+    return statement.prefix_with(
+        f"/*+ MAX_EXECUTION_TIME({int(budget * 1000)}) */", dialect="mysql"
+    ).execution_options(time_budget=budget)
+
+
+def mariadb_time_budget(conn, cursor, statement, parameters, context, executemany):
+    """
+    before_cursor_execute listener, runs the statements with a
+    time budget (with_time_budget) under SET STATEMENT
+    max_statement_time on MariaDB.
+    """
+
+    budget = context.execution_options.get("time_budget") if context is not None else None
+    if budget and getattr(conn.dialect, "is_mariadb", False):
+        statement = f"SET STATEMENT max_statement_time={budget:g} FOR {statement}"
+    return statement, parameters
+
+
 class AbstractHandler(object):
     """
     Holds the common behaviour of a database query handler.
     """
 
-    def __init__(self, session_local) -> None:
+    def __init__(self, session_local, circuit_breaker: CircuitBreaker = None) -> None:
         self.session_local = session_local
+        self.circuit_breaker = circuit_breaker
 
     def add(self, session: Session | AsyncSession, instance: Any):
         session.add(instance)
 
+    async def guarded(self, run, *args):
+        """
+        Runs the query coroutine function through the circuit
+        breaker, recording its latency or its database failure.
+        Any other ending (cancellation included) is recorded as an
+        abort so that a half-open probe is always released.
+        """
+
+        if self.circuit_breaker is None:
+            return await run(*args)
+
+        self.circuit_breaker.before_call()
+        start = time.monotonic()
+        try:
+            result = await run(*args)
+        except (exc.DBAPIError, exc.TimeoutError):
+            self.circuit_breaker.record_failure()
+            raise
+        except BaseException:
+            self.circuit_breaker.record_abort()
+            raise
+        self.circuit_breaker.record_success(time.monotonic() - start)
+        return result
+
 
 class AsyncHandler(AbstractHandler):
     """
@@ -24,15 +94,53 @@ class AsyncHandler(AbstractHandler):
     """
 
     async def execute(self, session: AsyncSession, statement: Any):
-        result = await session.execute(statement)
+        result = await self.guarded(self._execute, session, with_time_budget(statement))
         return result
 
+    async def _execute(self, session: AsyncSession, statement: Any):
+        """
+        Executes statement, if the task is cancelled (e.g. the
+        client disconnected) the query is killed in the server.
+        """
+
+        connection = await session.connection()
+        connection_id = connection.info.get("connection_id")
+        if connection_id is None:
+            connection_id = (await connection.execute(text("SELECT CONNECTION_ID()"))).scalar()
+            connection.info["connection_id"] = connection_id
+
+        try:
+            return await session.execute(statement)
+        except asyncio.CancelledError:
+            await asyncio.shield(self._kill_query(connection_id))
+            raise
+
+    async def _kill_query(self, connection_id: int):
+        try:
+            async with self.session_local() as session:
+                await session.execute(text(f"KILL QUERY {int(connection_id)}"))
+        except Exception as e:
+            logger.error(f"could not kill query of connection {connection_id}: {e}")
+
     async def refresh(self, session: AsyncSession, instance: Any):
         await session.refresh(instance)
 
     async def commit(self, session: AsyncSession):
         await session.commit()
 
+    async def stream(self, statement: Any, chunk_size: int):
+        """
+        Streams the rows of statement in partitions of chunk_size
+        through a server side cursor. It opens its own session
+        so that it can outlive the request (StreamingResponse),
+        and so it is limited by STATEMENT_TIMEOUT_STREAM instead of
+        the budget of the route.
+        """
+        async with self.session_local() as session:
+            result = await session.stream(with_time_budget(statement, STATEMENT_TIMEOUT_STREAM).execution_options(yield_per=chunk_size))
+            async for partition in result.partitions(chunk_size):
+                yield partition
+
     def func_with_session(self, func):
         session_local = self.session_local
 
@@ -58,15 +166,31 @@ class SyncHandler(AbstractHandler):
     """
 
     async def execute(self, session: Session, statement: Any):
-        result = session.execute(statement)
+        result = await self.guarded(self._execute, session, with_time_budget(statement))
         return result
 
+    async def _execute(self, session: Session, statement: Any):
+        return session.execute(statement)
+
     async def refresh(self, session: AsyncSession, instance: Any):
         session.refresh(instance)
 
     async def commit(self, session: Session):
         session.commit()
 
+    async def stream(self, statement: Any, chunk_size: int):
+        """
+        Streams the rows of statement in partitions of chunk_size
+        through a server side cursor. It opens its own session
+        so that it can outlive the request (StreamingResponse),
+        and so it is limited by STATEMENT_TIMEOUT_STREAM instead of
+        the budget of the route.
+        """
+        with self.session_local() as session:
+            result = session.execute(with_time_budget(statement, STATEMENT_TIMEOUT_STREAM).execution_options(yield_per=chunk_size, stream_results=True))
+            for partition in result.partitions(chunk_size):
+                yield partition
+
     def func_with_session(self, func):
         session_local = self.session_local
 
@@ -116,7 +240,19 @@ class Database(object):
             autocommit=False, autoflush=False, bind=engine, class_=session_class, expire_on_commit=False
         )
 
+        circuit_breaker = CircuitBreaker(
+            window=CIRCUIT_WINDOW,
+            min_calls=CIRCUIT_MIN_CALLS,
+            error_rate=CIRCUIT_ERROR_RATE,
+            slow_call_seconds=CIRCUIT_SLOW_CALL_SECONDS,
+            slow_call_rate=CIRCUIT_SLOW_CALL_RATE,
+            open_seconds=CIRCUIT_OPEN_SECONDS,
+        )
+
+        sync_engine = engine.sync_engine if USE_ASYNC_ENGINE else engine
+        event.listen(sync_engine, "before_cursor_execute", mariadb_time_budget, retval=True)
+
         handler_class = AsyncHandler if USE_ASYNC_ENGINE else SyncHandler
-        db_handler = handler_class(SessionLocal)
+        db_handler = handler_class(SessionLocal, circuit_breaker)
 
         return Base, engine, SessionLocal, db_handler
\ No newline at end of file
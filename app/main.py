@@ -1,13 +1,21 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 
 from .database import Base, engine
+from .database.circuit_breaker import CircuitOpenError
+from .middleware import CancelOnDisconnectMiddleware
 from .psifos.routes import api_router
+from .psifos.pagination import NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER
+from .psifos.snapshots import election_snapshots
+from .psifos.cache import cache
+from .psifos.jobs import job_queue
+from .psifos.utils import STALE_HEADER
 
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 
 from starlette_context import middleware, plugins
-from app.config import SECRET_KEY, ORIGINS, TOKEN_ANALYTICS_INFO
+from app.config import SECRET_KEY, ORIGINS, TOKEN_ANALYTICS_INFO, SNAPSHOT_REFRESH_ENABLED
 
 # from api_analytics.fastapi import Analytics
 
@@ -32,6 +40,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER, STALE_HEADER, "Age", "Warning"],
 )
 
 app.add_middleware(
@@ -41,5 +50,32 @@ app.add_middleware(
     ),
 )
 
+app.add_middleware(CancelOnDisconnectMiddleware)
+
 # Routes
 app.include_router(api_router)
+
+
+@app.exception_handler(CircuitOpenError)
+async def circuit_open_handler(request: Request, e: CircuitOpenError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Service temporarily unavailable"},
+        headers={"Retry-After": str(int(e.retry_after))},
+    )
+
+
+# Background tasks
+@app.on_event("startup")
+async def start_background_tasks():
+    cache.start()
+    job_queue.start()
+    if SNAPSHOT_REFRESH_ENABLED:
+        election_snapshots.start()
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    await election_snapshots.stop()
+    await job_queue.stop()
+    await cache.stop()
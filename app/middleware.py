@@ -0,0 +1,88 @@
+"""
+ASGI middlewares for Psifos.
+
+19-10-2026
+"""
+
+import asyncio
+
+
+def _has_body(scope) -> bool:
+    for name, value in scope.get("headers", []):
+        if name == b"transfer-encoding" or (name == b"content-length" and value.strip() != b"0"):
+            return True
+    return False
+
+
+class CancelOnDisconnectMiddleware(object):
+    """
+    Cancels the request handling when the client disconnects
+    before the response is sent, so that its in-flight query is
+    killed (see AsyncHandler._execute) instead of running on.
+
+    Once the request body is read (right away for a request
+    without a body, e.g. a GET) the middleware is the only reader
+    of receive and forwards the disconnect to the app.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        body_read = asyncio.Event()
+        disconnected = asyncio.Event()
+        response_started = False
+
+        has_body = _has_body(scope)
+        empty_body_sent = False
+        if not has_body:
+            body_read.set()
+
+        async def wrapped_receive():
+            nonlocal empty_body_sent
+            if body_read.is_set():
+                if not has_body and not empty_body_sent:
+                    empty_body_sent = True
+                    return {"type": "http.request", "body": b"", "more_body": False}
+                await disconnected.wait()
+                return {"type": "http.disconnect"}
+
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                disconnected.set()
+            elif not message.get("more_body", False):
+                body_read.set()
+            return message
+
+        async def wrapped_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        app_task = asyncio.create_task(self.app(scope, wrapped_receive, wrapped_send))
+
+        async def watch_disconnect():
+            await body_read.wait()
+            while True:
+                # The empty body of a request without one is skipped
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    break
+            disconnected.set()
+            # Streaming responses stop by themselves on disconnect
+            if not response_started:
+                app_task.cancel()
+
+        watcher = asyncio.create_task(watch_disconnect())
+        try:
+            await app_task
+        except asyncio.CancelledError:
+            if not disconnected.is_set():
+                raise
+        finally:
+            watcher.cancel()
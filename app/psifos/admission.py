@@ -0,0 +1,136 @@
+"""
+Admission control for Psifos.
+
+Routes are grouped in classes (e.g. "heavy" for the bundle,
+the ballot box and the exports), every class has a semaphore
+that bounds the requests it runs concurrently and a bounded
+queue of requests waiting for a slot. When the queue is full,
+or a request waits too long, it is rejected with 429 and a
+Retry-After header so that the heavy routes can not take every
+pooled connection and starve the cheap ones.
+
+The class also sets the execution time budget of the queries
+of its routes (app.database.handler.statement_timeout).
+
+Routes without a class are not limited and their queries get
+the default budget (STATEMENT_TIMEOUT_DEFAULT, none by default).
+
+19-10-2026
+"""
+
+import asyncio
+import weakref
+
+from functools import wraps
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.config import (
+    ADMISSION_HEAVY_CONCURRENCY, ADMISSION_HEAVY_QUEUE, ADMISSION_LIST_CONCURRENCY,
+    ADMISSION_LIST_QUEUE, ADMISSION_QUEUE_TIMEOUT, ADMISSION_RETRY_AFTER,
+    STATEMENT_TIMEOUT_HEAVY, STATEMENT_TIMEOUT_LIST
+)
+from app.database.handler import statement_timeout
+
+
+class RouteClass(object):
+    """
+    Concurrency limit, bounded wait queue and query time
+    budget of a route class.
+    """
+
+    def __init__(self, name: str, concurrency: int, queue_size: int, queue_timeout: float, retry_after: int,
+                 time_budget: float) -> None:
+        self.name = name
+        self.time_budget = time_budget
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    def _reject(self):
+        raise HTTPException(
+            status_code=429,
+            detail=f"Too many concurrent {self.name} requests",
+            headers={"Retry-After": str(self.retry_after)}
+        )
+
+    async def acquire(self):
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+            return
+
+        if self.waiting >= self.queue_size:
+            self._reject()
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._reject()
+        finally:
+            self.waiting -= 1
+
+    def release(self):
+        self._semaphore.release()
+
+
+ROUTE_CLASSES = {
+    "heavy": RouteClass("heavy", ADMISSION_HEAVY_CONCURRENCY, ADMISSION_HEAVY_QUEUE, ADMISSION_QUEUE_TIMEOUT,
+                        ADMISSION_RETRY_AFTER, STATEMENT_TIMEOUT_HEAVY),
+    "list": RouteClass("list", ADMISSION_LIST_CONCURRENCY, ADMISSION_LIST_QUEUE, ADMISSION_QUEUE_TIMEOUT,
+                       ADMISSION_RETRY_AFTER, STATEMENT_TIMEOUT_LIST),
+}
+
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that releases its slot once sent, or when
+    the client disconnects. A response that is never sent (the
+    request was cancelled after the endpoint returned) releases
+    its slot when it is collected.
+    """
+
+    def __init__(self, response: StreamingResponse, route_class: RouteClass) -> None:
+        self.__dict__.update(response.__dict__)
+        self.route_class = route_class
+        self._release = weakref.finalize(self, route_class.release)
+
+    async def __call__(self, scope, receive, send):
+        token = statement_timeout.set(self.route_class.time_budget)
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            statement_timeout.reset(token)
+            self._release()
+
+
+def admission_control(route_class_name: str):
+    """
+    Decorator for FastAPI endpoints, runs the endpoint within
+    a slot and the time budget of its route class. The slot of
+    a StreamingResponse is held until its body is fully sent.
+    """
+    route_class = ROUTE_CLASSES[route_class_name]
+
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            await route_class.acquire()
+            token = statement_timeout.set(route_class.time_budget)
+            try:
+                response = await func(*args, **kwargs)
+            except BaseException:
+                route_class.release()
+                raise
+            finally:
+                statement_timeout.reset(token)
+
+            if isinstance(response, StreamingResponse):
+                return AdmittedStreamingResponse(response, route_class)
+            route_class.release()
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,77 @@
+"""
+Bundle file of a Psifos election.
+
+The bundle holds every public value needed to verify an
+election, it is built by the bundle-file route and by the
+job queue (app.psifos.jobs). The votes are ordered by cast
+vote id, the order of the leaves of the Merkle root
+(app.psifos.merkle) computed from them. Its parts are also
+served as a sharded bundle (app.psifos.shards).
+
+The "vote" of every vote is the encrypted ballot as it was cast,
+a JSON text to be parsed by the consumers: vote_hash is computed
+on that exact text (verifier.hash_b64), which a re-serialization
+of the parsed ballot would not reproduce. Bundles before this
+format held the parsed ballot.
+
+19-10-2026
+"""
+
+import asyncio
+
+from app.psifos.merkle import merkle_summary
+from app.psifos.model import crud, bundle_schemas
+from app.psifos.utils import from_json
+
+
+def bundle_vote(encrypted_ballot: str, vote_hash: str, cast_at, voter_login_id: str) -> dict:
+    return {
+        "vote": encrypted_ballot,
+        "vote_hash": vote_hash,
+        "cast_at": cast_at,
+        "voter_login_id": voter_login_id,
+    }
+
+
+def bundle_election(election) -> bundle_schemas.ElectionBundle:
+    election.public_key = from_json(election.public_key)
+    election.questions = from_json(election.questions)
+    return bundle_schemas.ElectionBundle.from_orm(election)
+
+
+async def bundle_trustees(session, election) -> list:
+    # Lets decode string to json, on the schema so that the
+    # session does not try to flush the decoded values
+    trustee_out = []
+    for t in election.trustees:
+        trustee_out.append(bundle_schemas.TrusteeBundle(
+            trustee_id=t.trustee_id,
+            public_key=await crud.get_public_key_by_id(session=session, public_key_id=t.public_key_id),
+            public_key_hash=t.public_key_hash,
+            decryptions=await crud.get_decryption_by_trustee_id(session=session, trustee_crypto_id=t.id),
+            certificate=from_json(t.certificate),
+            coefficients=from_json(t.coefficients),
+            acknowledgements=from_json(t.acknowledgements),
+        ))
+    return trustee_out
+
+
+async def build_bundle(session, short_name: str) -> bundle_schemas.Bundle:
+    election = await crud.get_election_by_short_name(session=session, short_name=short_name)
+    voters = [bundle_schemas.VoterBundle.from_orm(v) for v in election.voters]
+    voters_id = [v.id for v in election.voters]
+
+    # Get votes by uuid and voter uuid
+    votes = await crud.get_votes_by_ids(session=session, voters_id=voters_id)
+    votes = [bundle_schemas.VoteBundle.from_orm(v) for v in votes]
+    merkle_root = await asyncio.to_thread(merkle_summary, [v.encrypted_ballot_hash for v in votes])
+    votes = [bundle_vote(v.encrypted_ballot, v.encrypted_ballot_hash, v.cast_at, v.psifos_voter.username) for v in votes]
+
+    trustee_out = await bundle_trustees(session, election)
+
+    return bundle_schemas.Bundle(election=bundle_election(election),
+                                 voters=voters,
+                                 votes=votes,
+                                 result=from_json(election.result),
+                                 trustees=trustee_out,
+                                 merkle_root=merkle_root)
@@ -0,0 +1,232 @@
+"""
+Two-tier cache for Psifos.
+
+    L1: bounded in-process LRU with TTL (one per worker).
+    L2: Redis at REDIS_URL, shared by every worker.
+
+Invalidations delete the key from L2 and are published on a
+Redis pub/sub channel, every worker listens to it and drops
+its L1 entries so that no worker keeps serving stale data.
+Other services (e.g. the admin backend) can publish the keys
+to invalidate on the same channel.
+
+If Redis is not reachable the cache degrades to L1 only.
+
+19-10-2026
+"""
+
+import asyncio
+import json
+import time
+
+from collections import OrderedDict
+
+import redis.asyncio as aioredis
+from fastapi.encoders import jsonable_encoder
+
+from app.config import (
+    REDIS_URL, CACHE_L1_MAXSIZE, CACHE_L1_TTL, CACHE_L2_ENABLED, CACHE_L2_TTL, CACHE_INVALIDATION_CHANNEL,
+    STALE_CACHE_MAXSIZE, STALE_CACHE_TTL
+)
+from app.logger import logger
+
+# Seconds without trying L2 after a Redis error
+L2_RETRY_DELAY = 5
+
+
+class LRUCache(object):
+    """
+    Bounded LRU cache whose entries expire after ttl seconds.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value, ttl: float = None):
+        self._entries[key] = (time.monotonic() + min(ttl or self.ttl, self.ttl), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class TwoTierCache(object):
+    """
+    L1 (LRU) + L2 (Redis) cache with pub/sub invalidation.
+    Values must be JSON serializable (they are jsonable_encoded),
+    both tiers hold their JSON text: every hit returns a new copy
+    and a cached None is told apart from a miss.
+    """
+
+    def __init__(self, redis_url: str | None, channel: str, l1_maxsize: int, l1_ttl: float, l2_ttl: float, redis_client=None) -> None:
+        self.redis_url = redis_url
+        self.channel = channel
+        self.l2_ttl = l2_ttl
+        self.l1 = LRUCache(l1_maxsize, l1_ttl)
+        self.counters = {"l1_hits": 0, "l2_hits": 0, "misses": 0, "l2_errors": 0}
+        self._redis = redis_client
+        self._l2_retry_at = 0
+        self._listener = None
+
+    @property
+    def redis(self):
+        if self._redis is None and self.redis_url:
+            self._redis = aioredis.from_url(self.redis_url)
+        return self._redis
+
+    def _l2(self):
+        """
+        Returns the Redis client, None while L2 is disabled or
+        backing off after an error.
+        """
+        if time.monotonic() < self._l2_retry_at:
+            return None
+        return self.redis
+
+    def _l2_failed(self, e: Exception):
+        self.counters["l2_errors"] += 1
+        self._l2_retry_at = time.monotonic() + L2_RETRY_DELAY
+        logger.warning(f"L2 cache unavailable: {e}")
+
+    async def _get_text(self, key: str) -> str | None:
+        """
+        Returns the JSON text of key, None on a miss.
+        """
+
+        text = self.l1.get(key)
+        if text is not None:
+            self.counters["l1_hits"] += 1
+            return text
+
+        redis = self._l2()
+        if redis is not None:
+            try:
+                raw = await redis.get(key)
+            except Exception as e:
+                self._l2_failed(e)
+                raw = None
+            if raw is not None:
+                self.counters["l2_hits"] += 1
+                text = raw.decode()
+                self.l1.set(key, text)
+                return text
+
+        self.counters["misses"] += 1
+        return None
+
+    async def get(self, key: str):
+        text = await self._get_text(key)
+        return json.loads(text) if text is not None else None
+
+    async def set(self, key: str, value, ttl: float = None):
+        value = jsonable_encoder(value)
+        text = json.dumps(value)
+        self.l1.set(key, text, ttl)
+        redis = self._l2()
+        if redis is not None:
+            try:
+                await redis.set(key, text, ex=int(ttl or self.l2_ttl))
+            except Exception as e:
+                self._l2_failed(e)
+        return value
+
+    async def get_or_set(self, key: str, compute, ttl: float = None):
+        """
+        Returns the cached value of key, compute is an awaitable
+        factory only called on a miss (a cached None is a hit).
+        """
+
+        text = await self._get_text(key)
+        if text is not None:
+            return json.loads(text)
+        return await self.set(key, await compute(), ttl)
+
+    async def invalidate(self, *keys: str):
+        for key in keys:
+            self.l1.delete(key)
+
+        redis = self._l2()
+        if redis is not None and keys:
+            try:
+                await redis.delete(*keys)
+                await redis.publish(self.channel, json.dumps(list(keys)))
+            except Exception as e:
+                self._l2_failed(e)
+
+    async def _listen(self):
+        while True:
+            try:
+                pubsub = self.redis.pubsub()
+                await pubsub.subscribe(self.channel)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    for key in json.loads(message["data"]):
+                        self.l1.delete(key)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Without the channel L1 could go stale, drop it and retry
+                self._l2_failed(e)
+                self.l1.clear()
+                await asyncio.sleep(L2_RETRY_DELAY)
+
+    def start(self):
+        if self._listener is None and self.redis is not None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    def stats(self) -> dict:
+        return {**self.counters, "l1_evictions": self.l1.evictions, "l1_size": len(self.l1)}
+
+
+cache = TwoTierCache(
+    REDIS_URL if CACHE_L2_ENABLED else None,
+    CACHE_INVALIDATION_CHANNEL,
+    CACHE_L1_MAXSIZE,
+    CACHE_L1_TTL,
+    CACHE_L2_TTL,
+)
+
+# Last known good responses, served while the database circuit
+# is open (utils.serve_stale). They are never invalidated.
+stale_cache = TwoTierCache(
+    REDIS_URL if CACHE_L2_ENABLED else None,
+    CACHE_INVALIDATION_CHANNEL,
+    STALE_CACHE_MAXSIZE,
+    STALE_CACHE_TTL,
+    STALE_CACHE_TTL,
+)
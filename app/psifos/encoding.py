@@ -0,0 +1,169 @@
+"""
+Compact binary (MessagePack) encoding for Psifos.
+
+Encrypted ballots and decryption factors are big integers
+written as long decimal strings, often inside a JSON text
+(CastVote.encrypted_ballot). Clients that send
+
+    Accept: application/msgpack
+
+get the bundle file, the cast votes and the exports as
+MessagePack, with those values as extension types:
+
+    1: decimal string of a big integer -> its bytes
+    2: string holding JSON -> style byte + the MessagePack of its value
+    3: integer out of the 64 bits range -> its signed bytes
+
+Every extension is only used when decoding it gives back the
+exact original value, so the conversion back to the canonical
+JSON of the routes is lossless:
+
+    python -m app.psifos.encoding bundle.msgpack > bundle.json
+    python -m app.psifos.encoding --ndjson cast_votes.msgpack > cast_votes.ndjson
+
+msgpack is an optional dependency, without it the routes answer
+with JSON. This module does not depend on the rest of the
+application.
+
+19-10-2026
+"""
+
+import argparse
+import json
+import re
+import sys
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_MEDIA_TYPES = {MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack"}
+
+EXT_BIG_INTEGER = 1
+EXT_JSON_TEXT = 2
+EXT_BIG_NUMBER = 3
+
+# Shorter decimal strings are kept as strings
+BIG_INTEGER_MIN_DIGITS = 20
+_BIG_INTEGER = re.compile(r"[1-9][0-9]{%d,}" % (BIG_INTEGER_MIN_DIGITS - 1))
+
+# json.dumps options of the JSON texts, the style byte is the index
+JSON_TEXT_STYLES = [{}, {"separators": (",", ":")}]
+
+_INT64_MIN, _UINT64_MAX = -(2 ** 63), 2 ** 64 - 1
+
+
+def msgpack_available() -> bool:
+    return msgpack is not None
+
+
+def accepts_msgpack(request) -> bool:
+    """
+    Whether the Accept header of the request asks for MessagePack.
+    """
+
+    if msgpack is None:
+        return False
+
+    for media_range in request.headers.get("accept", "").split(","):
+        media_type, *params = [part.strip() for part in media_range.split(";")]
+        if media_type.lower() in MSGPACK_MEDIA_TYPES and "q=0" not in params:
+            return True
+    return False
+
+
+# -- Encoding --
+
+
+def _compact_string(value: str):
+    if _BIG_INTEGER.fullmatch(value):
+        try:
+            number = int(value)
+        except ValueError:
+            return value
+        return msgpack.ExtType(EXT_BIG_INTEGER, number.to_bytes((number.bit_length() + 7) // 8, "big"))
+
+    if value[:1] in ("{", "["):
+        try:
+            parsed = json.loads(value)
+        except ValueError:
+            return value
+        for style, options in enumerate(JSON_TEXT_STYLES):
+            if json.dumps(parsed, **options) == value:
+                return msgpack.ExtType(EXT_JSON_TEXT, bytes([style]) + packb(parsed))
+    return value
+
+
+def _compact(value):
+    if isinstance(value, str):
+        return _compact_string(value)
+    if isinstance(value, dict):
+        return {key: _compact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_compact(item) for item in value]
+    if isinstance(value, int) and not isinstance(value, bool) and not _INT64_MIN <= value <= _UINT64_MAX:
+        return msgpack.ExtType(EXT_BIG_NUMBER, value.to_bytes(value.bit_length() // 8 + 1, "big", signed=True))
+    return value
+
+
+def packb(data) -> bytes:
+    """
+    MessagePack of JSON data (e.g. jsonable_encoder output).
+    """
+    return msgpack.packb(_compact(data), use_bin_type=True)
+
+
+# -- Decoding --
+
+
+def _ext_hook(code: int, data: bytes):
+    if code == EXT_BIG_INTEGER:
+        return str(int.from_bytes(data, "big"))
+    if code == EXT_JSON_TEXT:
+        return json.dumps(unpackb(data[1:]), **JSON_TEXT_STYLES[data[0]])
+    if code == EXT_BIG_NUMBER:
+        return int.from_bytes(data, "big", signed=True)
+    return msgpack.ExtType(code, data)
+
+
+def unpackb(content: bytes):
+    return msgpack.unpackb(content, ext_hook=_ext_hook, raw=False)
+
+
+def iter_unpack(stream):
+    """
+    Values of a stream of concatenated MessagePack values (exports).
+    """
+    return msgpack.Unpacker(stream, ext_hook=_ext_hook, raw=False)
+
+
+def to_json(content: bytes) -> str:
+    """
+    The JSON the route returns without MessagePack.
+    """
+    return json.dumps(unpackb(content), ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Converts a Psifos MessagePack response back to JSON.")
+    parser.add_argument("source", help="MessagePack file or - for stdin")
+    parser.add_argument("--ndjson", action="store_true", help="the source is an export (one value per row)")
+    args = parser.parse_args(argv)
+
+    if msgpack is None:
+        parser.error("msgpack is not installed")
+
+    source = sys.stdin.buffer if args.source == "-" else open(args.source, "rb")
+    with source:
+        if args.ndjson:
+            for row in iter_unpack(source):
+                sys.stdout.write(json.dumps(row) + "\n")
+        else:
+            sys.stdout.write(to_json(source.read()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
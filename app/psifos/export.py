@@ -0,0 +1,91 @@
+"""
+Streaming export for Psifos (NDJSON / CSV / MessagePack).
+
+Rows come in partitions from a server side cursor
+(db_handler.stream) and every partition is encoded into a
+single chunk. StreamingResponse only pulls the next chunk
+once the previous one was sent, so a slow client also stops
+the cursor and memory stays constant whatever the row count.
+
+19-10-2026
+"""
+
+import csv
+import io
+import json
+
+from datetime import datetime
+from fastapi import HTTPException
+
+from app.psifos import encoding
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+if encoding.msgpack_available():
+    EXPORT_FORMATS["msgpack"] = encoding.MSGPACK_MEDIA_TYPE
+
+
+def export_media_type(export_format: str) -> str:
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown export format: {export_format}")
+    return EXPORT_FORMATS[export_format]
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+async def ndjson_chunks(partitions):
+    """
+    Encodes every partition of rows as newline delimited JSON.
+    """
+
+    async for partition in partitions:
+        yield "".join(
+            json.dumps(dict(row._mapping), default=_json_default) + "\n" for row in partition
+        )
+
+
+async def csv_chunks(partitions, columns: list):
+    """
+    Encodes every partition of rows as CSV, the header goes in the first chunk.
+    """
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+
+    async for partition in partitions:
+        for row in partition:
+            writer.writerow([v.isoformat() if isinstance(v, datetime) else v for v in row])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+async def msgpack_chunks(partitions):
+    """
+    Encodes every partition of rows as concatenated MessagePack
+    maps, the same values as the NDJSON lines (app.psifos.encoding).
+    """
+
+    async for partition in partitions:
+        yield b"".join(
+            encoding.packb({k: _json_default(v) if isinstance(v, datetime) else v for k, v in row._mapping.items()})
+            for row in partition
+        )
+
+
+def export_chunks(partitions, export_format: str, columns: list):
+    if export_format == "csv":
+        return csv_chunks(partitions, columns)
+    if export_format == "msgpack":
+        return msgpack_chunks(partitions)
+    return ndjson_chunks(partitions)
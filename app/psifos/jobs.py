@@ -0,0 +1,428 @@
+"""
+Asynchronous jobs for Psifos.
+
+Heavy computations (bundle, weight histograms, full exports)
+can exceed the proxy timeouts when computed inside a request.
+Clients submit them as jobs, poll their status and fetch their
+result once done:
+
+    POST /jobs                 {"kind": "bundle", "short_name": "..."}
+    GET  /jobs/{job_id}
+    GET  /jobs/{job_id}/result
+
+Jobs run on a pool of JOB_WORKERS tasks. Identical jobs (same
+kind and parameters) are deduplicated while queued, running or
+retained, results are kept JOB_RESULT_TTL seconds.
+
+Exports are not held in memory: their rows are streamed from the
+database and their result (a JSON list) is written in chunks to
+the store, and streamed back by the result route.
+
+The queue lives in memory (per worker process, results of exports
+in temporary files) unless JOB_QUEUE_BACKEND is "redis", then jobs
+and results are stored in Redis and any process can run or answer
+for them.
+
+Workers are tasks of the event loop. With the sync engine
+(USE_ASYNC_ENGINE=0) a query blocks the loop, so computations
+that are not chunked run on a thread with their own loop and
+session. Chunked exports stay on the loop, each partition is a
+bounded fetch from a server side cursor.
+
+19-10-2026
+"""
+
+import asyncio
+import inspect
+import json
+import os
+import tempfile
+import time
+import uuid
+
+import redis.asyncio as aioredis
+from redis.exceptions import WatchError
+from fastapi.encoders import jsonable_encoder
+
+from app.config import (
+    REDIS_URL, EXPORT_CHUNK_SIZE, JOB_QUEUE_BACKEND, JOB_WORKERS, JOB_RESULT_TTL, STATEMENT_TIMEOUT_HEAVY,
+    USE_ASYNC_ENGINE
+)
+from app.database import db_handler
+from app.database.handler import statement_timeout
+from app.logger import logger
+from app.psifos import stats
+from app.psifos.bundle import build_bundle
+from app.psifos.model import crud
+
+
+class JobStatus(object):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+async def _bundle_job(session, short_name: str):
+    return await build_bundle(session, short_name)
+
+
+async def _weight_histograms_job(session, short_name: str):
+    return {
+        **await stats.voters_by_weight_init(session, short_name),
+        **await stats.votes_by_weight_init(session, short_name),
+        **await stats.votes_by_weight_end(session, short_name),
+    }
+
+
+async def _export_rows(session, short_name: str, stream_rows, columns: list):
+    election_id = await crud.get_election_id_by_short_name(session=session, short_name=short_name)
+    if election_id is None:
+        raise ValueError(f"election {short_name} not found")
+
+    keys = [c.key for c in columns]
+    async for partition in stream_rows(election_id=election_id, chunk_size=EXPORT_CHUNK_SIZE):
+        yield [dict(zip(keys, row)) for row in partition]
+
+
+def _export_voters_job(session, short_name: str):
+    return _export_rows(session, short_name, crud.stream_voters_by_election_id, crud.VOTER_EXPORT_COLUMNS)
+
+
+def _export_cast_votes_job(session, short_name: str):
+    return _export_rows(session, short_name, crud.stream_cast_votes_by_election_id, crud.CAST_VOTE_EXPORT_COLUMNS)
+
+
+# kind -> computation, called as computation(session, **params).
+# Computations that return an async iterator of row lists are
+# chunked: their result is written to the store as it comes.
+JOB_KINDS = {
+    "bundle": _bundle_job,
+    "weight_histograms": _weight_histograms_job,
+    "export_voters": _export_voters_job,
+    "export_cast_votes": _export_cast_votes_job,
+}
+
+# Parameters accepted by every job kind
+JOB_PARAMS = ("short_name",)
+
+# Size of the pieces a chunked result is read back in
+RESULT_READ_SIZE = 1 << 16
+
+
+def _append_text(path: str, text: str):
+    with open(path, "a", encoding="utf-8") as result_file:
+        result_file.write(text)
+
+
+class MemoryJobStore(object):
+    """
+    Jobs, deduplication keys and queue of this process.
+    """
+
+    def __init__(self) -> None:
+        self._jobs = {}
+        self._keys = {}
+        self._results = {}
+        self._queue = asyncio.Queue()
+
+    def _expire(self, job_id: str):
+        job = self._jobs.pop(job_id)
+        if self._keys.get(job["key"]) == job_id:
+            self._keys.pop(job["key"])
+        self._drop_result(job_id)
+
+    def _drop_result(self, job_id: str):
+        path = self._results.pop(job_id, None)
+        if path is not None and os.path.exists(path):
+            os.remove(path)
+
+    async def get(self, job_id: str):
+        job = self._jobs.get(job_id)
+        if job is not None and job.get("expires_at", float("inf")) < time.time():
+            self._expire(job_id)
+            return None
+        return job
+
+    async def save(self, job: dict, ttl: int = None):
+        if ttl is not None:
+            job["expires_at"] = time.time() + ttl
+            now = time.time()
+            for job_id in [i for i, j in self._jobs.items() if j.get("expires_at", float("inf")) < now]:
+                self._expire(job_id)
+        self._jobs[job["id"]] = job
+
+    async def claim_key(self, key: str, job_id: str):
+        """
+        Returns the id of the live job with key, or claims the
+        key for job_id and returns None.
+        """
+        existing = self._keys.get(key)
+        if existing is not None and await self.get(existing) is not None:
+            return existing
+        self._keys[key] = job_id
+        return None
+
+    async def release_key(self, key: str, job_id: str = None):
+        """
+        Releases key, only if it is held by job_id when given.
+        """
+        if job_id is None or self._keys.get(key) == job_id:
+            self._keys.pop(key, None)
+
+    async def push(self, job_id: str):
+        self._queue.put_nowait(job_id)
+
+    async def pop(self) -> str:
+        return await self._queue.get()
+
+    async def write_result(self, job_id: str, text: str):
+        path = self._results.get(job_id)
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix=f"psifos-job-{job_id}-", suffix=".json")
+            os.close(fd)
+            self._results[job_id] = path
+        await asyncio.to_thread(_append_text, path, text)
+
+    async def read_result(self, job_id: str):
+        path = self._results.get(job_id)
+        if path is None:
+            return
+        with open(path, encoding="utf-8") as result_file:
+            while True:
+                text = await asyncio.to_thread(result_file.read, RESULT_READ_SIZE)
+                if not text:
+                    break
+                yield text
+
+    async def drop_result(self, job_id: str):
+        self._drop_result(job_id)
+
+
+class RedisJobStore(object):
+    """
+    Jobs, deduplication keys and queue shared through Redis.
+    """
+
+    PREFIX = "psifos:jobs"
+
+    def __init__(self, redis_url: str, pending_ttl: int) -> None:
+        self.pending_ttl = pending_ttl
+        self.redis = aioredis.from_url(redis_url)
+
+    async def get(self, job_id: str):
+        raw = await self.redis.get(f"{self.PREFIX}:job:{job_id}")
+        return json.loads(raw) if raw is not None else None
+
+    async def save(self, job: dict, ttl: int = None):
+        await self.redis.set(f"{self.PREFIX}:job:{job['id']}", json.dumps(jsonable_encoder(job)), ex=ttl or self.pending_ttl)
+        # The result lives as long as its job
+        await self.redis.expire(f"{self.PREFIX}:result:{job['id']}", ttl or self.pending_ttl)
+
+    async def claim_key(self, key: str, job_id: str):
+        """
+        Returns the id the key is held by, or claims the key for
+        job_id and returns None.
+        """
+        name = f"{self.PREFIX}:key:{key}"
+        while True:
+            if await self.redis.set(name, job_id, nx=True, ex=self.pending_ttl):
+                return None
+            existing = await self.redis.get(name)
+            if existing is not None:
+                return existing.decode()
+            # The key expired between SET NX and GET, claim it again
+
+    async def release_key(self, key: str, job_id: str = None):
+        """
+        Releases key, only if it is held by job_id when given.
+        """
+        name = f"{self.PREFIX}:key:{key}"
+        if job_id is None:
+            await self.redis.delete(name)
+            return
+
+        async with self.redis.pipeline() as pipe:
+            try:
+                await pipe.watch(name)
+                if await pipe.get(name) == job_id.encode():
+                    pipe.multi()
+                    pipe.delete(name)
+                    await pipe.execute()
+            except WatchError:
+                # Claimed again meanwhile, it is not held by job_id
+                pass
+
+    async def push(self, job_id: str):
+        await self.redis.rpush(f"{self.PREFIX}:queue", job_id)
+
+    async def pop(self) -> str:
+        while True:
+            item = await self.redis.blpop(f"{self.PREFIX}:queue", timeout=5)
+            if item is not None:
+                return item[1].decode()
+
+    async def write_result(self, job_id: str, text: str):
+        key = f"{self.PREFIX}:result:{job_id}"
+        await self.redis.rpush(key, text)
+        await self.redis.expire(key, self.pending_ttl)
+
+    async def read_result(self, job_id: str):
+        key = f"{self.PREFIX}:result:{job_id}"
+        start = 0
+        while True:
+            pieces = await self.redis.lrange(key, start, start + 99)
+            for piece in pieces:
+                yield piece.decode()
+            if len(pieces) < 100:
+                break
+            start += len(pieces)
+
+    async def drop_result(self, job_id: str):
+        await self.redis.delete(f"{self.PREFIX}:result:{job_id}")
+
+
+class JobQueue(object):
+    """
+    Submits jobs and runs them on a pool of worker tasks.
+    """
+
+    def __init__(self, store, workers: int, result_ttl: int) -> None:
+        self.store = store
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self._tasks = []
+
+    @staticmethod
+    def job_key(kind: str, params: dict) -> str:
+        return f"{kind}:{json.dumps(params, sort_keys=True)}"
+
+    async def submit(self, kind: str, params: dict) -> dict:
+        """
+        Queues a job, or returns the live job identical to it.
+        """
+
+        key = self.job_key(kind, params)
+        job_id = uuid.uuid4().hex
+        while True:
+            existing = await self.store.claim_key(key, job_id)
+            if existing is None:
+                break
+            job = await self.store.get(existing)
+            if job is not None:
+                return job
+            # The key outlived its job
+            await self.store.release_key(key, existing)
+
+        job = {
+            "id": job_id,
+            "key": key,
+            "kind": kind,
+            "params": params,
+            "status": JobStatus.QUEUED,
+            "created_at": time.time(),
+            "finished_at": None,
+            "error": None,
+            "result": None,
+        }
+        await self.store.save(job)
+        await self.store.push(job_id)
+        return job
+
+    async def get(self, job_id: str):
+        return await self.store.get(job_id)
+
+    def read_result(self, job_id: str):
+        """
+        Pieces of the JSON text of a chunked result.
+        """
+        return self.store.read_result(job_id)
+
+    async def _write_chunked(self, job_id: str, partitions):
+        await self.store.write_result(job_id, "[")
+        separator = ""
+        async for rows in partitions:
+            if rows:
+                text = ",".join(json.dumps(row) for row in jsonable_encoder(rows))
+                await self.store.write_result(job_id, separator + text)
+                separator = ","
+        await self.store.write_result(job_id, "]")
+
+    async def _compute(self, session, job: dict):
+        result = JOB_KINDS[job["kind"]](session, **job["params"])
+        if inspect.isasyncgen(result):
+            job["chunked"] = True
+            await self._write_chunked(job["id"], result)
+            return
+        job["result"] = jsonable_encoder(await result)
+
+    async def _compute_on_thread(self, job: dict):
+        computation = db_handler.func_with_session(JOB_KINDS[job["kind"]])
+        job["result"] = await asyncio.to_thread(
+            lambda: jsonable_encoder(asyncio.run(computation(**job["params"])))
+        )
+
+    async def _run(self, job: dict):
+        job["status"] = JobStatus.RUNNING
+        await self.store.save(job)
+        try:
+            # Sync sessions would block the loop (see the module docstring)
+            if USE_ASYNC_ENGINE or not inspect.iscoroutinefunction(JOB_KINDS[job["kind"]]):
+                await db_handler.func_with_session(self._compute)(job)
+            else:
+                await self._compute_on_thread(job)
+            job["status"] = JobStatus.DONE
+        except asyncio.CancelledError:
+            await self.store.drop_result(job["id"])
+            raise
+        except Exception as e:
+            logger.error(f"job {job['id']} ({job['kind']}) failed: {e}")
+            job["error"] = str(e)
+            job["status"] = JobStatus.FAILED
+            job.pop("chunked", None)
+            await self.store.drop_result(job["id"])
+            # Failed jobs are not deduplicated, they can be resubmitted
+            await self.store.release_key(job["key"], job["id"])
+        job["finished_at"] = time.time()
+        await self.store.save(job, ttl=self.result_ttl)
+
+    async def _worker(self):
+        statement_timeout.set(STATEMENT_TIMEOUT_HEAVY)
+        while True:
+            try:
+                job = await self.store.get(await self.store.pop())
+                if job is not None and job["status"] == JobStatus.QUEUED:
+                    await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"job worker failed: {e}")
+                await asyncio.sleep(1)
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+
+def public_job(job: dict) -> dict:
+    """
+    Status of a job, without its result.
+    """
+    return {k: v for k, v in job.items() if k not in ("key", "result", "expires_at")}
+
+
+job_queue = JobQueue(
+    RedisJobStore(REDIS_URL, JOB_RESULT_TTL) if JOB_QUEUE_BACKEND == "redis" else MemoryJobStore(),
+    JOB_WORKERS,
+    JOB_RESULT_TTL,
+)
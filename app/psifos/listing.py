@@ -0,0 +1,138 @@
+"""
+Filtered and cached election listing for Psifos.
+
+The listing index (the ordered ids of the elections matching
+some filters) is kept in the two-tier cache. Its keys carry an
+index generation, dropping the generation key invalidates every
+index at once: this worker does it when it sees the status of an
+election change, wherever the status is read (observe_election_status)
+or when a listed election does not match the status filter, and
+other services (e.g. the admin backend) can publish
+ELECTION_INDEX_GENERATION_KEY on the cache invalidation channel.
+
+19-10-2026
+"""
+
+import hashlib
+import uuid
+
+from fastapi import HTTPException
+
+from app.config import ELECTION_INDEX_TTL
+from app.psifos.cache import cache
+from app.psifos.model import crud, schemas
+from app.psifos.model.enums import ElectionStatusEnum, ElectionTypeEnum, ElectionLoginTypeEnum
+
+ELECTION_INDEX_GENERATION_KEY = "elections:index:generation"
+
+# Fields of the listing when none are requested: the summary
+# columns, the public key is only included with include_public_key
+# and the rest (questions, trustees, results...) with fields
+ELECTION_LIST_FIELDS = {name: {} for name in ("id", "status", *schemas.ElectionBase.__fields__)}
+
+# Last status of every election seen by this worker
+_election_statuses = {}
+
+
+def _parse_enum_values(raw, enum_class, name: str):
+    """
+    Parses one value or a list of values of enum_class, given
+    by value (e.g. "Started") or by name (e.g. "started").
+    """
+
+    if raw is None:
+        return None
+
+    values = []
+    for value in raw if isinstance(raw, list) else [raw]:
+        if value in enum_class.__members__:
+            values.append(enum_class[value])
+            continue
+        try:
+            values.append(enum_class(value))
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Unknown {name}: {value}")
+    return values
+
+
+def election_filters(data: dict) -> dict:
+    """
+    Validates the filters of the election listing.
+    """
+
+    search = data.get("search")
+    if search is not None and not isinstance(search, str):
+        raise HTTPException(status_code=400, detail="search must be a string")
+
+    order_by = data.get("order_by") or "id"
+    if not isinstance(order_by, str) or order_by.lstrip("-") not in crud.ELECTION_ORDERINGS:
+        raise HTTPException(status_code=400, detail=f"Unknown order_by: {order_by}")
+
+    return {
+        "statuses": _parse_enum_values(data.get("status"), ElectionStatusEnum, "status"),
+        "types": _parse_enum_values(data.get("type"), ElectionTypeEnum, "type"),
+        "login_types": _parse_enum_values(data.get("voters_login_type"), ElectionLoginTypeEnum, "voters_login_type"),
+        "search": search.strip() if search else None,
+        "order_by": order_by,
+    }
+
+
+async def _index_generation() -> str:
+    generation = await cache.get(ELECTION_INDEX_GENERATION_KEY)
+    if generation is None:
+        generation = await cache.set(ELECTION_INDEX_GENERATION_KEY, uuid.uuid4().hex, ttl=ELECTION_INDEX_TTL * 10)
+    return generation
+
+
+async def election_index(session, filters: dict) -> list:
+    """
+    Returns the (cached) ordered ids of the elections matching filters.
+    The index keeps the statuses of the elections when it was built,
+    they are the last statuses seen of the elections this worker has
+    not seen yet.
+    """
+
+    filters_tag = hashlib.sha1(repr(sorted((k, str(v)) for k, v in filters.items())).encode()).hexdigest()
+    key = f"elections:index:v2:{await _index_generation()}:{filters_tag}"
+
+    async def compute():
+        election_ids = await crud.get_election_ids(session=session, **filters)
+        statuses = await crud.get_election_statuses(session=session)
+        return {"ids": election_ids, "statuses": [[e.id, e.status] for e in statuses]}
+
+    index = await cache.get_or_set(key, compute, ttl=ELECTION_INDEX_TTL)
+    for election_id, status in index["statuses"]:
+        _election_statuses.setdefault(election_id, status)
+    return index["ids"]
+
+
+async def invalidate_election_index():
+    await cache.invalidate(ELECTION_INDEX_GENERATION_KEY)
+
+
+async def observe_election_status(election_id: int, status):
+    """
+    Records the status of an election read by a route or by the
+    snapshot refresher, every index is invalidated when it is not
+    the last one this worker saw.
+    """
+
+    previous = _election_statuses.get(election_id)
+    _election_statuses[election_id] = status
+    if previous is not None and previous != status:
+        await invalidate_election_index()
+
+
+async def observe_listed_statuses(elections: list, filters: dict):
+    """
+    Observes the statuses of a page of the listing. A listed
+    election that does not match the status filter means that the
+    index is stale (e.g. built by another worker), it is invalidated.
+    """
+
+    stale = False
+    for election in elections:
+        await observe_election_status(election.id, election.status)
+        stale = stale or (filters["statuses"] is not None and election.status not in filters["statuses"])
+    if stale:
+        await invalidate_election_index()
@@ -0,0 +1,106 @@
+"""
+Live turnout stream (Server-Sent Events) for Psifos.
+
+Every worker runs at most one poller per election, whatever the
+number of viewers: the poller computes the turnout once per
+interval and pushes it to the queue of every subscriber, so the
+database load does not grow with the audience.
+
+19-10-2026
+"""
+
+import asyncio
+import json
+
+from app.config import LIVE_STATS_INTERVAL, LIVE_STATS_KEEPALIVE
+from app.database import db_handler
+from app.logger import logger
+from app.psifos.model import crud
+
+
+async def get_turnout(session, election_id: int) -> dict:
+    return {
+        "num_casted_votes": await crud.get_num_casted_votes(session=session, election_id=election_id),
+        "total_voters": await crud.get_total_voters_by_election_id(session=session, election_id=election_id),
+        "status": await crud.get_election_status_by_id(session=session, election_id=election_id),
+    }
+
+
+class TurnoutBroadcaster(object):
+    """
+    Shares a single turnout poller per election between all
+    the subscribers of this worker.
+    """
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self._subscribers = {}
+        self._pollers = {}
+        self._last = {}
+
+    def subscribe(self, election_id: int) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=1)
+        self._subscribers.setdefault(election_id, set()).add(queue)
+
+        if election_id in self._last:
+            queue.put_nowait(self._last[election_id])
+        if election_id not in self._pollers:
+            self._pollers[election_id] = asyncio.create_task(self._poll(election_id))
+        return queue
+
+    def unsubscribe(self, election_id: int, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(election_id, set())
+        subscribers.discard(queue)
+        if subscribers:
+            return
+
+        self._subscribers.pop(election_id, None)
+        self._last.pop(election_id, None)
+        poller = self._pollers.pop(election_id, None)
+        if poller is not None:
+            poller.cancel()
+
+    def _publish(self, election_id: int, event: dict):
+        self._last[election_id] = event
+        for queue in self._subscribers.get(election_id, set()):
+            # Slow subscribers only keep the most recent event
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    async def _poll(self, election_id: int):
+        previous = None
+        while True:
+            try:
+                turnout = await db_handler.func_with_session(get_turnout)(election_id)
+                if turnout != previous:
+                    delta = turnout["num_casted_votes"] - previous["num_casted_votes"] if previous else 0
+                    self._publish(election_id, {**turnout, "delta": delta})
+                    previous = turnout
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"live turnout poller for election {election_id} failed: {e}")
+            await asyncio.sleep(self.interval)
+
+
+turnout_broadcaster = TurnoutBroadcaster(LIVE_STATS_INTERVAL)
+
+
+async def turnout_events(election_id: int, keepalive: float = LIVE_STATS_KEEPALIVE):
+    """
+    SSE stream of the turnout of an election, the subscription is
+    dropped when the client disconnects (the generator is cancelled).
+    """
+
+    queue = turnout_broadcaster.subscribe(election_id)
+    try:
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"event: turnout\ndata: {json.dumps(event)}\n\n"
+    finally:
+        turnout_broadcaster.unsubscribe(election_id, queue)
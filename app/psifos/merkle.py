@@ -0,0 +1,253 @@
+"""
+Merkle tree over the ballot trackers of a Psifos election.
+
+The leaves are the cast vote hashes (encrypted_ballot_hash)
+ordered by CastVote.id, hashed as in RFC 6962 (with an odd
+node promoted to the next level):
+
+    leaf = sha256(0x00 || tracker)
+    node = sha256(0x01 || left || right)
+
+With the root (published in the bundle file) and an inclusion
+proof of O(log n) hashes a voter can check that their ballot is
+in the ballot box without downloading it.
+
+Every worker keeps the trees it has served in memory and keeps
+them up to date incrementally: only the cast votes with a new id
+or a newer cast_at (a voter that votes again replaces the hash of
+its row) are read, and the tree is rebuilt only when the number
+of leaves does not match the number of cast votes. The trees of
+the elections that are no longer started do not change anymore,
+they are refreshed once more when the status of the election
+changes.
+
+19-10-2026
+"""
+
+import asyncio
+import hashlib
+import time
+
+from app.config import MERKLE_REFRESH_TTL, MERKLE_MAX_TREES, STATEMENT_TIMEOUT_BACKGROUND
+from app.database.handler import statement_timeout
+from app.psifos.cache import LRUCache
+from app.psifos.model import crud
+from app.psifos.model.enums import ElectionStatusEnum
+
+MERKLE_SCHEME = "sha256, leaf = H(0x00 || tracker), node = H(0x01 || left || right), odd node promoted"
+
+# Seconds an unused tree is kept in memory
+TREE_IDLE_TTL = 3600
+
+
+def leaf_hash(tracker: str) -> bytes:
+    return hashlib.sha256(b"\x00" + tracker.encode("utf-8")).digest()
+
+
+def node_hash(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+
+def _summary(tree: "MerkleTree") -> dict:
+    root = tree.root
+    return {
+        "root": root.hex() if root is not None else None,
+        "size": len(tree),
+        "scheme": MERKLE_SCHEME,
+    }
+
+
+def merkle_summary(trackers: list) -> dict:
+    """
+    Root of the trackers (ordered by cast vote id) computed from
+    scratch, for the values published next to the votes they are
+    computed from (the bundle file).
+    """
+    return _summary(MerkleTree.from_leaves([leaf_hash(tracker) for tracker in trackers]))
+
+
+class MerkleTree(object):
+    """
+    Merkle tree whose leaves can be appended or replaced,
+    updating only the path from the leaf to the root.
+    """
+
+    def __init__(self) -> None:
+        self.levels = [[]]
+
+    @classmethod
+    def from_leaves(cls, leaves: list) -> "MerkleTree":
+        tree = cls()
+        level = list(leaves)
+        tree.levels = [level]
+        while len(level) > 1:
+            level = [
+                node_hash(level[i], level[i + 1]) if i + 1 < len(level) else level[i]
+                for i in range(0, len(level), 2)
+            ]
+            tree.levels.append(level)
+        return tree
+
+    def __len__(self) -> int:
+        return len(self.levels[0])
+
+    @property
+    def root(self) -> bytes | None:
+        return self.levels[-1][0] if self.levels[0] else None
+
+    def set(self, index: int, leaf: bytes):
+        """
+        Replaces the leaf at index, or appends it if index is
+        the number of leaves.
+        """
+
+        level = 0
+        node = leaf
+        while True:
+            nodes = self.levels[level]
+            if index == len(nodes):
+                nodes.append(node)
+            else:
+                nodes[index] = node
+            if len(nodes) == 1:
+                break
+
+            sibling = index ^ 1
+            if sibling < len(nodes):
+                node = node_hash(nodes[index], nodes[sibling]) if index < sibling else node_hash(nodes[sibling], nodes[index])
+            index //= 2
+            level += 1
+            if level == len(self.levels):
+                self.levels.append([])
+
+    def proof(self, index: int) -> list:
+        """
+        Siblings from the leaf at index to the root, with the side
+        on which they are concatenated.
+        """
+
+        path = []
+        for nodes in self.levels[:-1]:
+            sibling = index ^ 1
+            if sibling < len(nodes):
+                path.append({"side": "left" if sibling < index else "right", "hash": nodes[sibling].hex()})
+            index //= 2
+        return path
+
+
+class ElectionTree(object):
+    """
+    Merkle tree of an election with the positions of its leaves
+    by cast vote id and by leaf hash, and the election status it
+    was last refreshed with.
+    """
+
+    def __init__(self, rows: list) -> None:
+        self.status = None
+        leaves = [leaf_hash(row.encrypted_ballot_hash) for row in rows]
+        self.tree = MerkleTree.from_leaves(leaves)
+        self.index_by_id = {row.id: index for index, row in enumerate(rows)}
+        self.index_by_leaf = {leaf: index for index, leaf in enumerate(leaves)}
+        self.last_id = rows[-1].id if rows else 0
+        self.last_cast_at = max((row.cast_at for row in rows), default=None)
+        self.refreshed_at = time.monotonic()
+
+    def apply(self, rows: list) -> bool:
+        """
+        Applies new and changed cast votes, returns False if a new
+        one would not be the last leaf (the tree must be rebuilt).
+        """
+
+        for row in rows:
+            index = self.index_by_id.get(row.id)
+            if index is None:
+                if row.id < self.last_id:
+                    return False
+                index = len(self.tree)
+                self.index_by_id[row.id] = index
+                self.last_id = row.id
+            else:
+                self.index_by_leaf.pop(self.tree.levels[0][index], None)
+
+            leaf = leaf_hash(row.encrypted_ballot_hash)
+            self.tree.set(index, leaf)
+            self.index_by_leaf[leaf] = index
+            if self.last_cast_at is None or row.cast_at > self.last_cast_at:
+                self.last_cast_at = row.cast_at
+
+        self.refreshed_at = time.monotonic()
+        return True
+
+    def summary(self) -> dict:
+        return _summary(self.tree)
+
+    def inclusion_proof(self, tracker: str) -> dict | None:
+        index = self.index_by_leaf.get(leaf_hash(tracker))
+        if index is None:
+            return None
+        return {
+            "hash": tracker,
+            "leaf": self.tree.levels[0][index].hex(),
+            "index": index,
+            "proof": self.tree.proof(index),
+            **self.summary(),
+        }
+
+
+class MerkleTrees(object):
+    """
+    In-memory Merkle trees of the elections, refreshed at most
+    every ttl seconds while the election is started.
+    """
+
+    def __init__(self, ttl: float, maxsize: int) -> None:
+        self.ttl = ttl
+        self._trees = LRUCache(maxsize, TREE_IDLE_TTL)
+        self._locks = {}
+
+    async def _build(self, session, election_id: int) -> ElectionTree:
+        rows = await crud.get_cast_vote_leaves_by_election_id(session=session, election_id=election_id)
+        return await asyncio.to_thread(ElectionTree, rows)
+
+    async def _refresh(self, session, election_id: int, election_tree: ElectionTree) -> ElectionTree:
+        rows = await crud.get_cast_vote_leaves_by_election_id(
+            session=session,
+            election_id=election_id,
+            after_id=election_tree.last_id,
+            changed_since=election_tree.last_cast_at
+        )
+        total = await crud.get_total_cast_votes_by_election_id(session=session, election_id=election_id)
+        if not election_tree.apply(rows) or len(election_tree.tree) != total:
+            return await self._build(session, election_id)
+        return election_tree
+
+    def _fresh(self, election_tree: ElectionTree | None, status: str) -> bool:
+        return election_tree is not None and election_tree.status == status and (
+            status != ElectionStatusEnum.started or time.monotonic() - election_tree.refreshed_at < self.ttl
+        )
+
+    async def get(self, session, election_id: int, status: str) -> ElectionTree:
+        election_tree = self._trees.get(election_id)
+        if self._fresh(election_tree, status):
+            return election_tree
+
+        lock = self._locks.setdefault(election_id, asyncio.Lock())
+        async with lock:
+            election_tree = self._trees.get(election_id)
+            if self._fresh(election_tree, status):
+                return election_tree
+            # The rebuild reads every cast vote, it gets its own budget
+            token = statement_timeout.set(STATEMENT_TIMEOUT_BACKGROUND)
+            try:
+                if election_tree is None:
+                    election_tree = await self._build(session, election_id)
+                else:
+                    election_tree = await self._refresh(session, election_id, election_tree)
+            finally:
+                statement_timeout.reset(token)
+            election_tree.status = status
+            self._trees.set(election_id, election_tree)
+        return election_tree
+
+
+merkle_trees = MerkleTrees(MERKLE_REFRESH_TTL, MERKLE_MAX_TREES)
@@ -75,6 +75,7 @@ class Bundle(BaseModel):
     votes: list
     result: object | None
     trustees: list[TrusteeBundle] = []
+    merkle_root: dict | None = None
 
     class Config:
         orm_mode = True
@@ -5,20 +5,42 @@ CRUD utils for Psifos
 01/08/2022
 """
 
+import pytz
+
+from datetime import datetime, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.psifos.model import models
-from sqlalchemy import select, func, distinct
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, func, distinct, inspect, case
+from sqlalchemy.orm import selectinload, load_only
+from app.config import TIMEZONE
 from app.database import db_handler
-from sqlalchemy import and_
+from app.psifos.pagination import keyset
+from sqlalchemy import and_, or_
 
 
 ELECTION_QUERY_OPTIONS = [
     selectinload(models.Election.public_key),
 ]
 
+# Election of the sharded bundle, its voters and votes are
+# read by ranges (see app.psifos.shards)
+BUNDLE_ELECTION_QUERY_OPTIONS = [
+    selectinload(models.Election.trustees),
+    selectinload(models.Election.public_key),
+    selectinload(models.Election.questions),
+]
+
+# Relationships of schemas.ElectionOut, for the election page
+# (app.psifos.page) which does not return voters or ballots
+PAGE_ELECTION_QUERY_OPTIONS = [
+    selectinload(models.Election.trustees),
+    selectinload(models.Election.public_key),
+    selectinload(models.Election.questions),
+    selectinload(models.Election.result),
+]
+
 COMPLETE_ELECTION_QUERY_OPTIONS = [
     selectinload(models.Election.trustees),
     selectinload(models.Election.sharedpoints),
@@ -33,22 +55,113 @@ VOTER_QUERY_OPTIONS = [selectinload(
     models.Voter.cast_vote
 )]
 
+# Columns of the streaming exports
+VOTER_EXPORT_COLUMNS = [
+    models.Voter.username,
+    models.Voter.name,
+    models.Voter.weight_init,
+    models.Voter.weight_end,
+    models.Voter.group,
+]
+
+CAST_VOTE_EXPORT_COLUMNS = [
+    models.Voter.username,
+    models.CastVote.encrypted_ballot,
+    models.CastVote.encrypted_ballot_hash,
+    models.CastVote.is_valid,
+    models.CastVote.cast_at,
+]
+
+# Cast votes of the ballot box sync (app.psifos.sync), the
+# encrypted ballot is only read when it is requested
+CAST_VOTE_SYNC_COLUMNS = [
+    models.CastVote.id,
+    models.Voter.username,
+    models.CastVote.encrypted_ballot_hash,
+    models.CastVote.is_valid,
+    models.CastVote.cast_at,
+]
+
+# Keyset pagination keys (see app.psifos.pagination)
+ELECTION_KEYSET = (models.Election.id,)
+VOTER_KEYSET = (models.Voter.election_id, models.Voter.id)
+TRUSTEE_KEYSET = (models.Trustee.id,)
+CAST_VOTE_KEYSET = (models.CastVote.id,)
+
+
+def fields_query_options(model, fields: dict, key_columns: tuple = ()):
+    """
+    Builds the loader options that restrict a query over
+    model to the columns requested in a sparse fieldset
+    (see utils.parse_fields), plus the keyset columns the
+    next cursor is read from (pagination.next_cursor).
+    """
+
+    mapper = inspect(model)
+    columns = [getattr(model, name) for name in fields if name in mapper.column_attrs]
+    columns += [column for column in key_columns if column.key not in fields]
+    query_options = [load_only(*(columns or [model.id]))]
+
+    for name, sub_fields in fields.items():
+        if name not in mapper.relationships:
+            continue
+        loader = selectinload(getattr(model, name))
+        related_mapper = mapper.relationships[name].mapper
+        related_columns = [_column_attribute(related_mapper, sub_name) for sub_name in sub_fields]
+        # Nested fields that are not columns (e.g. properties) may
+        # read any column, the related rows are then loaded whole
+        if related_columns and all(column is not None for column in related_columns):
+            loader = loader.load_only(*related_columns)
+        query_options.append(loader)
+
+    return query_options
+
+
+def _column_attribute(mapper, name: str):
+    """
+    Column attribute of mapper named name, by attribute key or by
+    column name (e.g. PublicKey.y is the property of the y column,
+    mapped as PublicKey._y).
+    """
+
+    for attr in mapper.column_attrs:
+        if attr.key == name or attr.columns[0].name == name:
+            return getattr(mapper.class_, attr.key)
+    return None
+
+
 # ----- Voter CRUD Utils -----
 
 
-async def get_voters_by_election_id(session: Session | AsyncSession, election_id: int, page=0, page_size=None, simple: bool = False):
+async def get_voters_by_election_id(session: Session | AsyncSession, election_id: int, page=0, page_size=None, simple: bool = False, fields: dict = None, after: tuple = None):
 
     query_options = [] if simple else VOTER_QUERY_OPTIONS
-    offset_value = page*page_size if page_size else None
+    query_options = fields_query_options(models.Voter, fields, VOTER_KEYSET) if fields else query_options
+    offset_value = page*page_size if page_size and after is None else None
     query = select(models.Voter).where(
         models.Voter.election_id == election_id
-    ).offset(offset_value).limit(page_size).options(
+    )
+    query = keyset(query, VOTER_KEYSET, after).offset(offset_value).limit(page_size).options(
         *query_options
     )
 
     result = await db_handler.execute(session, query)
     return result.scalars().all()
 
+async def get_bundle_voters_by_election_id(session: Session | AsyncSession, election_id: int, after_id: int = 0, up_to_id: int = None, limit: int = None):
+    query = select(
+        models.Voter.id, models.Voter.username, models.Voter.weight_end, models.Voter.name
+    ).where(
+        models.Voter.election_id == election_id,
+        models.Voter.id > after_id
+    )
+    if up_to_id is not None:
+        query = query.where(models.Voter.id <= up_to_id)
+
+    result = await db_handler.execute(session, query.order_by(models.Voter.id).limit(limit))
+    return result.all()
+
+
 async def get_voters_by_group_and_weight_initial(session: Session | AsyncSession, election_id: int):
     query = select(
         models.Voter.group,
@@ -96,43 +209,210 @@ async def get_voters_group_by_election_id(session: Session | AsyncSession, elect
     return result.scalars().all()
 
 
-async def get_voters_with_valid_vote(session: Session | AsyncSession, election_id: int, page=0, page_size=None):
-    offset_value = page*page_size if page_size else None
+async def get_voters_with_valid_vote(session: Session | AsyncSession, election_id: int, page=0, page_size=None, fields: dict = None, after: tuple = None):
+    query_options = fields_query_options(models.Voter, fields, VOTER_KEYSET) if fields else VOTER_QUERY_OPTIONS
+    offset_value = page*page_size if page_size and after is None else None
     query = select(models.Voter).outerjoin(models.CastVote).where(
         models.Voter.election_id == election_id, and_(
             models.CastVote.is_valid)
-    ).offset(offset_value).limit(page_size).options(
-        *VOTER_QUERY_OPTIONS
+    )
+    query = keyset(query, VOTER_KEYSET, after).offset(offset_value).limit(page_size).options(
+        *query_options
     )
 
     result = await db_handler.execute(session, query)
     return result.scalars().all()
 
 
-async def get_votes_by_ids(session: Session | AsyncSession, voters_id: list):
+async def get_votes_by_ids(session: Session | AsyncSession, voters_id: list, fields: dict = None):
+    query_options = fields_query_options(models.CastVote, fields) if fields else []
     query = select(models.CastVote).where(
-        models.CastVote.voter_id.in_(voters_id))
+        models.CastVote.voter_id.in_(voters_id)).order_by(models.CastVote.id).options(*query_options)
     result = await db_handler.execute(session, query)
     return result.scalars().all()
 
 
+async def stream_voters_by_election_id(election_id: int, chunk_size: int):
+    query = select(*VOTER_EXPORT_COLUMNS).where(
+        models.Voter.election_id == election_id
+    ).order_by(models.Voter.id)
+
+    async for partition in db_handler.stream(query, chunk_size):
+        yield partition
+
+
 # ----- CastVote CRUD Utils -----
 
-async def get_cast_vote_by_hash(session: Session | AsyncSession, hash_vote: str):
+async def get_cast_votes_by_election_id(session: Session | AsyncSession, election_id: int, page=0, page_size=None, fields: dict = None, after: tuple = None):
+    query_options = fields_query_options(models.CastVote, fields, CAST_VOTE_KEYSET) if fields else []
+    offset_value = page*page_size if page_size and after is None else None
+    query = select(models.CastVote).join(
+        models.Voter, models.Voter.id == models.CastVote.voter_id
+    ).where(
+        models.Voter.election_id == election_id
+    )
+    query = keyset(query, CAST_VOTE_KEYSET, after).offset(offset_value).limit(page_size).options(
+        *query_options
+    )
+
+    result = await db_handler.execute(session, query)
+    return result.scalars().all()
+
+
+async def get_total_cast_votes_by_election_id(session: Session | AsyncSession, election_id: int):
+    query = select(func.count(models.CastVote.id)).join(
+        models.Voter, models.Voter.id == models.CastVote.voter_id
+    ).where(
+        models.Voter.election_id == election_id
+    )
+    result = await db_handler.execute(session, query)
+    return result.scalar()
+
+
+async def stream_cast_votes_by_election_id(election_id: int, chunk_size: int):
+    query = select(*CAST_VOTE_EXPORT_COLUMNS).join(
+        models.Voter, models.Voter.id == models.CastVote.voter_id
+    ).where(
+        models.Voter.election_id == election_id
+    ).order_by(models.CastVote.id)
+
+    async for partition in db_handler.stream(query, chunk_size):
+        yield partition
+
+
+async def get_cast_vote_by_hash(session: Session | AsyncSession, hash_vote: str, election_id: int = None):
     query = select(models.CastVote).where(
         models.CastVote.encrypted_ballot_hash == hash_vote
     )
+    if election_id is not None:
+        query = query.join(
+            models.Voter, models.Voter.id == models.CastVote.voter_id
+        ).where(models.Voter.election_id == election_id)
+
     result = await db_handler.execute(session, query)
     return result.scalars().first()
 
 
-async def get_hashes_vote(session: Session | AsyncSession, voters_id: list):
-    query = select(models.CastVote.encrypted_ballot_hash).where(
-        models.CastVote.voter_id.in_(voters_id)
+async def get_cast_vote_hashes_by_election_id(session: Session | AsyncSession, election_id: int, hashes: list = None):
+    query = select(models.CastVote.encrypted_ballot_hash).join(
+        models.Voter, models.Voter.id == models.CastVote.voter_id
+    ).where(
+        models.Voter.election_id == election_id
     )
+    if hashes is not None:
+        query = query.where(models.CastVote.encrypted_ballot_hash.in_(hashes))
+
     result = await db_handler.execute(session, query)
     return result.scalars().all()
 
+
+async def get_bundle_votes_by_election_id(session: Session | AsyncSession, election_id: int, after_id: int = 0, up_to_id: int = None, limit: int = None):
+    query = select(
+        models.CastVote.id,
+        models.CastVote.encrypted_ballot,
+        models.CastVote.encrypted_ballot_hash,
+        models.CastVote.cast_at,
+        models.Voter.username
+    ).join(
+        models.Voter, models.Voter.id == models.CastVote.voter_id
+    ).where(
+        models.Voter.election_id == election_id,
+        models.CastVote.id > after_id
+    )
+    if up_to_id is not None:
+        query = query.where(models.CastVote.id <= up_to_id)
+
+    result = await db_handler.execute(session, query.order_by(models.CastVote.id).limit(limit))
+    return result.all()
+
+
+async def get_cast_vote_leaves_by_election_id(session: Session | AsyncSession, election_id: int, after_id: int = None, changed_since=None):
+    """
+    (id, encrypted_ballot_hash, cast_at) of the cast votes of an
+    election ordered by id, the leaves of its Merkle tree. With
+    after_id only the new ones and those cast since changed_since.
+    """
+
+    query = select(
+        models.CastVote.id, models.CastVote.encrypted_ballot_hash, models.CastVote.cast_at
+    ).join(
+        models.Voter, models.Voter.id == models.CastVote.voter_id
+    ).where(
+        models.Voter.election_id == election_id
+    )
+    if after_id is not None:
+        changed = models.CastVote.id > after_id
+        if changed_since is not None:
+            changed = or_(changed, models.CastVote.cast_at >= changed_since)
+        query = query.where(changed)
+
+    result = await db_handler.execute(session, query.order_by(models.CastVote.id))
+    return result.all()
+
+
+async def get_cast_votes_after_id(session: Session | AsyncSession, election_id: int, after_id: int, limit: int, include_ballot: bool = True):
+    columns = CAST_VOTE_SYNC_COLUMNS + [models.CastVote.encrypted_ballot] if include_ballot else CAST_VOTE_SYNC_COLUMNS
+    query = select(*columns).join(
+        models.Voter, models.Voter.id == models.CastVote.voter_id
+    ).where(
+        models.Voter.election_id == election_id,
+        models.CastVote.id > after_id
+    ).order_by(models.CastVote.id).limit(limit)
+
+    result = await db_handler.execute(session, query)
+    return result.all()
+
+
+async def get_recast_votes(session: Session | AsyncSession, election_id: int, up_to_id: int, since, include_ballot: bool = True):
+    columns = CAST_VOTE_SYNC_COLUMNS + [models.CastVote.encrypted_ballot] if include_ballot else CAST_VOTE_SYNC_COLUMNS
+    query = select(*columns).join(
+        models.Voter, models.Voter.id == models.CastVote.voter_id
+    ).where(
+        models.Voter.election_id == election_id,
+        models.CastVote.id <= up_to_id,
+        models.CastVote.cast_at >= since
+    ).order_by(models.CastVote.id)
+
+    result = await db_handler.execute(session, query)
+    return result.all()
+
+
+async def get_invalid_cast_vote_ids(session: Session | AsyncSession, election_id: int, up_to_id: int):
+    query = select(models.CastVote.id).join(
+        models.Voter, models.Voter.id == models.CastVote.voter_id
+    ).where(
+        models.Voter.election_id == election_id,
+        models.CastVote.id <= up_to_id,
+        models.CastVote.is_valid == False
+    ).order_by(models.CastVote.id)
+
+    result = await db_handler.execute(session, query)
+    return result.scalars().all()
+
+
+async def get_last_cast_at(session: Session | AsyncSession, election_id: int):
+    query = select(func.max(models.CastVote.cast_at)).join(
+        models.Voter, models.Voter.id == models.CastVote.voter_id
+    ).where(
+        models.Voter.election_id == election_id
+    )
+    result = await db_handler.execute(session, query)
+    return result.scalar()
+
+
+async def get_voter_position(session: Session | AsyncSession, election_id: int, voter_id: int, only_with_valid_vote: bool = False):
+    query = select(func.count(models.Voter.id)).where(
+        models.Voter.election_id == election_id,
+        models.Voter.id < voter_id
+    )
+    if only_with_valid_vote:
+        query = query.join(
+            models.CastVote, models.CastVote.voter_id == models.Voter.id
+        ).where(models.CastVote.is_valid == True)
+
+    result = await db_handler.execute(session, query)
+    return result.scalar()
+
 async def has_valid_vote(session: Session | AsyncSession, voter_id: int):
     query = select(models.CastVote).where(
         models.CastVote.voter_id == voter_id, models.CastVote.is_valid == True
@@ -153,33 +433,147 @@ async def get_trustee_by_uuid(session: Session | AsyncSession, trustee_uuid: str
     return result.scalars().first()
 
 
-async def get_trustees_by_election_id(session: Session | AsyncSession, election_id: int, page=0, page_size=0):
-    offset_value = page*page_size if page_size else None
-    query = select(models.Trustee).where(
-        models.Trustee.election_id == election_id
-    ).offset(offset_value).limit(page_size)
+async def get_trustees_by_election_id(session: Session | AsyncSession, election_id: int, page=0, page_size=None, after: tuple = None):
+    offset_value = page*page_size if page_size and after is None else None
+    query = select(models.Trustee).join(
+        models.TrusteeCrypto, models.TrusteeCrypto.trustee_id == models.Trustee.id
+    ).where(
+        models.TrusteeCrypto.election_id == election_id
+    )
+    query = keyset(query, TRUSTEE_KEYSET, after).offset(offset_value).limit(page_size)
 
     result = await db_handler.execute(session, query)
 
     return result.scalars().all()
 
+async def get_trustee_overview_rows(session: Session | AsyncSession, election_id: int, include_crypto: bool = False):
+    """
+    One row per trustee of an election with its identity and
+    TrusteeCrypto state, the crypto blobs only if include_crypto.
+    """
+
+    columns = [
+        models.Trustee.id.label("trustee_id"),
+        models.Trustee.name,
+        models.Trustee.username,
+        models.TrusteeCrypto.id.label("trustee_crypto_id"),
+        models.TrusteeCrypto.trustee_election_id,
+        models.TrusteeCrypto.current_step,
+        models.TrusteeCrypto.public_key_id,
+        models.TrusteeCrypto.public_key_hash,
+    ]
+    if include_crypto:
+        columns += [
+            models.TrusteeCrypto.certificate,
+            models.TrusteeCrypto.coefficients,
+            models.TrusteeCrypto.acknowledgements,
+        ]
+
+    query = select(*columns).join(
+        models.TrusteeCrypto, models.TrusteeCrypto.trustee_id == models.Trustee.id
+    ).where(
+        models.TrusteeCrypto.election_id == election_id
+    ).order_by(models.TrusteeCrypto.trustee_election_id)
+    result = await db_handler.execute(session, query)
+    return result.all()
+
+async def count_decryptions_by_trustee_crypto_ids(session: Session | AsyncSession, decryption_model, trustee_crypto_ids: list):
+    query = select(
+        decryption_model.trustee_crypto_id, func.count(decryption_model.id)
+    ).where(
+        decryption_model.trustee_crypto_id.in_(trustee_crypto_ids)
+    ).group_by(decryption_model.trustee_crypto_id)
+    result = await db_handler.execute(session, query)
+    return dict(result.all())
+
+async def get_decryptions_by_trustee_crypto_ids(session: Session | AsyncSession, decryption_model, trustee_crypto_ids: list):
+    query = select(
+        decryption_model.trustee_crypto_id,
+        decryption_model.question_id,
+        decryption_model.group,
+        decryption_model.decryption_factors,
+        decryption_model.decryption_proofs,
+    ).where(
+        decryption_model.trustee_crypto_id.in_(trustee_crypto_ids)
+    ).order_by(decryption_model.id)
+    result = await db_handler.execute(session, query)
+    return result.all()
+
+async def get_public_keys_by_ids(session: Session | AsyncSession, public_key_ids: list):
+    query = select(models.PublicKey).where(models.PublicKey.id.in_(public_key_ids))
+    result = await db_handler.execute(session, query)
+    return result.scalars().all()
+
 # ----- SharedPoint CRUD Utils -----
 
 
 # ----- Election CRUD Utils -----
 
 
-async def get_elections(session: Session | AsyncSession, page: int = 0, page_size: int = 0):
-    offset_value = page*page_size if page_size else None
-    query = select(models.Election).offset(offset_value).limit(page_size).options(
-        *ELECTION_QUERY_OPTIONS
+async def get_elections(session: Session | AsyncSession, page: int = 0, page_size: int = None, fields: dict = None, after: tuple = None):
+    query_options = fields_query_options(models.Election, fields, ELECTION_KEYSET) if fields else ELECTION_QUERY_OPTIONS
+    offset_value = page*page_size if page_size and after is None else None
+    query = keyset(select(models.Election), ELECTION_KEYSET, after).offset(offset_value).limit(page_size).options(
+        *query_options
     )
     result = await db_handler.execute(session, query)
     return result.scalars().all()
 
 
-async def get_election_by_short_name(session: Session | AsyncSession, short_name: str, simple: bool = False):
+# Orderings of the election listing, "-" prefix for descending
+ELECTION_ORDERINGS = {
+    "id": models.Election.id,
+    "short_name": models.Election.short_name,
+    "long_name": models.Election.long_name,
+    "status": models.Election.status,
+}
+
+
+async def get_election_ids(session: Session | AsyncSession, statuses: list = None, types: list = None,
+                           login_types: list = None, search: str = None, order_by: str = "id"):
+    """
+    Ids of the elections matching the listing filters, in the
+    requested order (ties broken by id).
+    """
+
+    query = select(models.Election.id)
+    if statuses:
+        query = query.where(models.Election.status.in_(statuses))
+    if types:
+        query = query.where(models.Election.type.in_(types))
+    if login_types:
+        query = query.where(models.Election.voters_login_type.in_(login_types))
+    if search:
+        pattern = "%" + search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        query = query.where(or_(
+            models.Election.short_name.ilike(pattern, escape="\\"),
+            models.Election.long_name.ilike(pattern, escape="\\"),
+        ))
+
+    column = ELECTION_ORDERINGS[order_by.lstrip("-")]
+    query = query.order_by(column.desc() if order_by.startswith("-") else column, models.Election.id)
+    result = await db_handler.execute(session, query)
+    return result.scalars().all()
+
+
+async def get_elections_by_ids(session: Session | AsyncSession, election_ids: list, fields: dict = None):
+    """
+    Elections of election_ids, in the same order.
+    """
+
+    if not election_ids:
+        return []
+
+    query_options = fields_query_options(models.Election, fields) if fields else ELECTION_QUERY_OPTIONS
+    query = select(models.Election).where(models.Election.id.in_(election_ids)).options(*query_options)
+    result = await db_handler.execute(session, query)
+    elections = {e.id: e for e in result.scalars().all()}
+    return [elections[i] for i in election_ids if i in elections]
+
+
+async def get_election_by_short_name(session: Session | AsyncSession, short_name: str, simple: bool = False, fields: dict = None):
     query_options = ELECTION_QUERY_OPTIONS if simple else COMPLETE_ELECTION_QUERY_OPTIONS
+    query_options = fields_query_options(models.Election, fields) if fields else query_options
     query = select(models.Election).where(
         models.Election.short_name == short_name
     ).options(
@@ -189,6 +583,24 @@ async def get_election_by_short_name(session: Session | AsyncSession, short_name
     result = await db_handler.execute(session, query)
     return result.scalars().first()
 
+async def get_bundle_election_by_short_name(session: Session | AsyncSession, short_name: str):
+    query = select(models.Election).where(
+        models.Election.short_name == short_name
+    ).options(
+        *BUNDLE_ELECTION_QUERY_OPTIONS
+    )
+    result = await db_handler.execute(session, query)
+    return result.scalars().first()
+
+async def get_page_election_by_short_name(session: Session | AsyncSession, short_name: str):
+    query = select(models.Election).where(
+        models.Election.short_name == short_name
+    ).options(
+        *PAGE_ELECTION_QUERY_OPTIONS
+    )
+    result = await db_handler.execute(session, query)
+    return result.scalars().first()
+
 async def get_election_options_by_name(session: Session | AsyncSession, short_name: str, options: list):
     query = select(*options).where(
         models.Election.short_name == short_name
@@ -204,6 +616,44 @@ async def get_election_status_by_short_name(session: Session | AsyncSession, sho
     result = await db_handler.execute(session, query)
     return result.scalars().first()
 
+async def get_elections_by_status(session: Session | AsyncSession, status: str):
+    query = select(models.Election.id, models.Election.short_name).where(
+        models.Election.status == status
+    )
+    result = await db_handler.execute(session, query)
+    return result.all()
+
+async def get_results_by_election_id(session: Session | AsyncSession, election_id: int):
+    query = select(
+        models.Results.id,
+        models.Results.election_id,
+        models.Results.total_result,
+        models.Results.grouped_result
+    ).where(
+        models.Results.election_id == election_id
+    )
+    result = await db_handler.execute(session, query)
+    return result.first()
+
+async def get_election_statuses(session: Session | AsyncSession):
+    query = select(models.Election.id, models.Election.status)
+    result = await db_handler.execute(session, query)
+    return result.all()
+
+async def get_elections_by_short_names(session: Session | AsyncSession, short_names: list):
+    query = select(models.Election.id, models.Election.short_name, models.Election.status).where(
+        models.Election.short_name.in_(short_names)
+    )
+    result = await db_handler.execute(session, query)
+    return result.all()
+
+async def get_election_status_by_id(session: Session | AsyncSession, election_id: int):
+    query = select(models.Election.status).where(
+        models.Election.id == election_id
+    )
+    result = await db_handler.execute(session, query)
+    return result.scalars().first()
+
 async def get_election_id_by_short_name(session: Session | AsyncSession, short_name: str):
     query = select(models.Election.id).where(
         models.Election.short_name == short_name
@@ -225,14 +675,115 @@ async def get_total_trustees_by_election_id(session: Session | AsyncSession, ele
     result = await db_handler.execute(session, query)
     return result.scalar()
 
+async def get_election_watermark(session: Session | AsyncSession, election_id: int):
+    """
+    Cheap change detection for an election: a single row with its
+    status, the last cast vote (id and cast_at, the latter also
+    moves when a voter votes again), the count and id sum of the
+    valid cast votes (is_valid has no timestamp), the number and
+    last id of the voters, the last log id and the results version.
+    If the row did not change neither did the public data derived
+    from them.
+    """
+
+    cast_votes = select(
+        func.max(models.CastVote.id),
+        func.max(models.CastVote.cast_at),
+        func.count(case((models.CastVote.is_valid, 1))),
+        func.sum(case((models.CastVote.is_valid, models.CastVote.id), else_=0)),
+    ).join(
+        models.Voter, models.Voter.id == models.CastVote.voter_id
+    ).where(
+        models.Voter.election_id == election_id
+    ).subquery()
+
+    voters = select(func.count(models.Voter.id), func.max(models.Voter.id)).where(
+        models.Voter.election_id == election_id
+    ).subquery()
+
+    last_log_id = select(func.max(models.ElectionLog.id)).where(
+        models.ElectionLog.election_id == election_id
+    ).scalar_subquery()
+
+    results_version = select(models.Results.id).where(
+        models.Results.election_id == election_id
+    ).scalar_subquery()
+
+    query = select(
+        models.Election.status,
+        *cast_votes.c,
+        *voters.c,
+        last_log_id,
+        results_version,
+    ).where(
+        models.Election.id == election_id
+    )
+    result = await db_handler.execute(session, query)
+    return result.first()
+
+async def get_trustees_watermark(session: Session | AsyncSession, election_id: int):
+    """
+    Change detection for the trustees of an election: a row per
+    trustee with its step, its key and the number of decryptions
+    it has uploaded.
+    """
+
+    def uploaded(model):
+        return select(func.count(model.decryption_factors)).where(
+            model.trustee_crypto_id == models.TrusteeCrypto.id
+        ).scalar_subquery()
+
+    query = select(
+        models.TrusteeCrypto.id,
+        models.TrusteeCrypto.current_step,
+        models.TrusteeCrypto.public_key_id,
+        models.TrusteeCrypto.public_key_hash,
+        uploaded(models.HomomorphicDecryption),
+        uploaded(models.MixnetDecryption),
+    ).where(
+        models.TrusteeCrypto.election_id == election_id
+    ).order_by(models.TrusteeCrypto.id)
+    result = await db_handler.execute(session, query)
+    return [tuple(row) for row in result.all()]
+
 # ----- ElectionLogs CRUD Utils -----
 
 
-async def get_election_logs(session: Session | AsyncSession, election_id: int):
+def _log_created_at(value: datetime) -> str:
+    """
+    Formats value like ElectionLog.created_at, which holds str()
+    of the TIMEZONE local time of the log (utils.tz_now), e.g.
+    "2024-01-01 10:00:00.250000-03:00": the local wall time, its
+    microseconds only when not zero, then the UTC offset. Naive
+    values are taken as TIMEZONE local times. The offset is left
+    out, so that comparing the strings compares the wall times.
+    """
+
+    if value.tzinfo is not None:
+        value = value.astimezone(pytz.timezone(TIMEZONE)).replace(tzinfo=None)
+    return str(value)
+
 
+async def get_election_logs(session: Session | AsyncSession, election_id: int, events: list = None, since_id: int = None,
+                            since: datetime = None, until: datetime = None, page=0, page_size=None):
+
+    offset_value = page*page_size if page_size else None
     query = select(models.ElectionLog).where(
         models.ElectionLog.election_id == election_id
     )
+    if events is not None:
+        query = query.where(models.ElectionLog.event.in_(events))
+    if since_id is not None:
+        query = query.where(models.ElectionLog.id > since_id)
+    # created_at is a string, see _log_created_at
+    if since is not None:
+        query = query.where(models.ElectionLog.created_at >= _log_created_at(since))
+    if until is not None:
+        # A log of the very until instant is longer than its bound
+        # (offset suffix), the bound is the next microsecond instead
+        query = query.where(models.ElectionLog.created_at < _log_created_at(until + timedelta(microseconds=1)))
+
+    query = query.order_by(models.ElectionLog.id).offset(offset_value).limit(page_size)
     result = await db_handler.execute(session, query)
     return result.scalars().all()
 
@@ -251,9 +802,27 @@ async def get_num_casted_votes(session: Session | AsyncSession, election_id: int
         .where(models.Voter.election_id == election_id)
         .where(models.CastVote.is_valid == True)
     )
-    
-    result = await session.scalar(query)    
-    return result or 0
+
+    result = await db_handler.execute(session, query)
+    return result.scalar() or 0
+
+async def get_total_voters_by_election_ids(session: Session | AsyncSession, election_ids: list):
+    query = select(models.Voter.election_id, func.count(models.Voter.id)).where(
+        models.Voter.election_id.in_(election_ids)
+    ).group_by(models.Voter.election_id)
+    result = await db_handler.execute(session, query)
+    return dict(result.all())
+
+async def get_num_casted_votes_by_election_ids(session: Session | AsyncSession, election_ids: list):
+    query = (
+        select(models.Voter.election_id, func.count(distinct(models.CastVote.voter_id)))
+        .join(models.Voter, models.Voter.id == models.CastVote.voter_id)
+        .where(models.Voter.election_id.in_(election_ids))
+        .where(models.CastVote.is_valid == True)
+        .group_by(models.Voter.election_id)
+    )
+    result = await db_handler.execute(session, query)
+    return dict(result.all())
 
 async def get_num_casted_votes_group(session: Session | AsyncSession, election_id: int, group: str):
     voters = await get_voters_group_by_election_id(session=session, election_id=election_id, group=group)
@@ -313,3 +882,54 @@ async def get_questions_params_by_election_id(session: Session | AsyncSession, e
     )
     result = await db_handler.execute(session, query)
     return result.all()
+
+# ----- Tally CRUD Utils -----
+
+async def get_tally_groups_by_election_id(session: Session | AsyncSession, election_id: int):
+    query = select(distinct(models.Tally.group)).join(
+        models.AbstractQuestion, models.AbstractQuestion.id == models.Tally.question_id
+    ).where(
+        models.AbstractQuestion.election_id == election_id
+    ).order_by(models.Tally.group)
+    result = await db_handler.execute(session, query)
+    return result.scalars().all()
+
+async def get_tallies_by_election_id(session: Session | AsyncSession, election_id: int, groups: list = None, question_index: int = None):
+    """
+    Tallies of an election without their encrypted_tally, only
+    its size (in characters).
+    """
+
+    query = select(
+        models.Tally.id,
+        models.AbstractQuestion.index.label("question_index"),
+        models.Tally.group,
+        models.Tally.tally_type,
+        models.Tally.with_votes,
+        models.Tally.computed,
+        models.Tally.num_tallied,
+        func.char_length(models.Tally.encrypted_tally).label("size")
+    ).join(
+        models.AbstractQuestion, models.AbstractQuestion.id == models.Tally.question_id
+    ).where(
+        models.AbstractQuestion.election_id == election_id
+    ).order_by(models.Tally.group, models.AbstractQuestion.index)
+
+    if groups is not None:
+        query = query.where(models.Tally.group.in_(groups))
+    if question_index is not None:
+        query = query.where(models.AbstractQuestion.index == question_index)
+
+    result = await db_handler.execute(session, query)
+    return result.all()
+
+async def get_tally_chunk(session: Session | AsyncSession, tally_id: int, start: int, length: int):
+    """
+    Characters [start, start + length) of an encrypted tally, start is 1-based.
+    """
+
+    query = select(func.substr(models.Tally.encrypted_tally, start, length)).where(
+        models.Tally.id == tally_id
+    )
+    result = await db_handler.execute(session, query)
+    return result.scalar()
@@ -17,6 +17,7 @@ from sqlalchemy import (
     Enum,
     DateTime,
     JSON,
+    Index,
 )
 from sqlalchemy.dialects.mysql import LONGTEXT
 
@@ -106,6 +107,10 @@ class Voter(Base):
 
 class CastVote(Base):
     __tablename__ = "psifos_cast_vote"
+    __table_args__ = (
+        # Ballot tracker lookups only need a short prefix of the hash
+        Index("ix_psifos_cast_vote_hash_prefix", "encrypted_ballot_hash", mysql_length=16),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     voter_id = Column(
@@ -201,7 +206,13 @@ class SharedPoint(Base):
 
 class ElectionLog(Base):
     __tablename__ = "election_logs"
-    
+    __table_args__ = (
+        # created_at is a string, the local time of the log and its
+        # UTC offset (see crud._log_created_at): range filters compare
+        # the strings, which follows the order of the wall times
+        Index("ix_election_logs_election_created_at", "election_id", "created_at"),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     election_id = Column(Integer, ForeignKey("psifos_election.id", onupdate="CASCADE", ondelete="CASCADE"))
     
@@ -237,6 +237,7 @@ class UrnaOut(BaseModel):
 
 class ElectionLogOut(BaseModel):
 
+    id: int | None
     election_id: int
     log_level: str
     event: str
@@ -0,0 +1,61 @@
+"""
+Composite public election page for Psifos.
+
+Gathers in a single response what the election page used to
+request from eight routes. The independent parts run
+concurrently, each one on its own pooled session.
+
+19-10-2026
+"""
+
+import asyncio
+
+from fastapi.encoders import jsonable_encoder
+
+from app.database import db_handler
+from app.psifos.model import crud, schemas
+from app.psifos.snapshots import get_dashboard_view
+
+
+async def _election(session, short_name: str):
+    election = await crud.get_page_election_by_short_name(session=session, short_name=short_name)
+    return jsonable_encoder(schemas.ElectionOut.from_orm(election)) if election is not None else None
+
+
+async def _totals(session, short_name: str):
+    election_id = await crud.get_election_id_by_short_name(session=session, short_name=short_name)
+    return {
+        "total_voters": await crud.get_total_voters_by_election_id(session=session, election_id=election_id),
+        "total_trustees": await crud.get_total_trustees_by_election_id(session=session, election_id=election_id),
+    }
+
+
+async def election_page(short_name: str):
+    """
+    Returns the election, its stats, questions and totals or
+    None if the election does not exist.
+    """
+
+    parts = await asyncio.gather(
+        db_handler.func_with_session(_election)(short_name),
+        db_handler.func_with_session(get_dashboard_view)(short_name, "stats"),
+        db_handler.func_with_session(get_dashboard_view)(short_name, "questions"),
+        db_handler.func_with_session(_totals)(short_name),
+        return_exceptions=True,
+    )
+    election, stats, questions, totals = parts
+    if election is None:
+        return None
+    for part in parts:
+        if isinstance(part, BaseException):
+            raise part
+
+    return {
+        "election": election,
+        "stats": stats,
+        "questions": questions["questions"],
+        **totals,
+        "election_has_questions": len(questions["questions"]) > 0,
+        "election_has_trustees": totals["total_trustees"] > 0,
+        "election_has_voters": totals["total_voters"] > 0,
+    }
@@ -0,0 +1,80 @@
+"""
+Election results for Psifos.
+
+Only the Results row of the election is read. Once the results
+are released they no longer change, so they are cached for
+RESULTS_CACHE_TTL seconds; before that they are read every time.
+
+19-10-2026
+"""
+
+from fastapi import HTTPException
+
+from app.config import RESULTS_CACHE_TTL
+from app.psifos.cache import cache
+from app.psifos.listing import observe_election_status
+from app.psifos.model import crud, models
+from app.psifos.model.enums import ElectionStatusEnum
+
+
+async def _read_results(session, election_id: int):
+    results = await crud.get_results_by_election_id(session=session, election_id=election_id)
+    return dict(results._mapping) if results is not None else None
+
+
+async def load_election_results(session, short_name: str):
+    """
+    Returns the results of an election (None if there are none yet).
+    """
+
+    election = await crud.get_election_options_by_name(
+        session=session,
+        short_name=short_name,
+        options=[models.Election.id, models.Election.status]
+    )
+    if election is None:
+        raise HTTPException(status_code=404, detail="Election not found")
+    await observe_election_status(election.id, election.status)
+
+    if election.status != ElectionStatusEnum.results_released:
+        return await _read_results(session, election.id)
+
+    return await cache.get_or_set(
+        f"results:{election.id}",
+        lambda: _read_results(session, election.id),
+        ttl=RESULTS_CACHE_TTL
+    )
+
+
+def slice_results(results: dict | None, group: str | None = None, question: int | None = None):
+    """
+    Restricts the results to a group (grouped_result only holds
+    that group) and/or to a question (every result list is
+    replaced by the result of that question).
+    """
+
+    if results is None:
+        return None
+
+    total_result = results["total_result"]
+    grouped_result = results["grouped_result"] or []
+
+    if group is not None:
+        grouped_result = [g for g in grouped_result if g.get("group") == group]
+        if not grouped_result:
+            raise HTTPException(status_code=404, detail=f"Group not found: {group}")
+
+    if question is not None:
+        if not isinstance(total_result, list) or not 0 <= question < len(total_result):
+            raise HTTPException(status_code=404, detail=f"Question not found: {question}")
+        total_result = total_result[question]
+        grouped_result = [
+            {**g, "result": g["result"][question] if question < len(g.get("result") or []) else None}
+            for g in grouped_result
+        ]
+
+    return {
+        **results,
+        "total_result": total_result,
+        "grouped_result": grouped_result if results["grouped_result"] is not None else None,
+    }
@@ -1,12 +1,34 @@
-from app.psifos.utils import paginate, tz_now, from_json
-from fastapi import APIRouter, Depends
+from app.psifos.utils import paginate, tz_now, parse_fields, serialize_fields, sparse_response, msgpack_response, cached_count, serve_stale
+from app.psifos.pagination import cursor_params, set_next_cursor, TOTAL_COUNT_HEADER
+from app.psifos.admission import admission_control
+from app.psifos.bundle import build_bundle
+from app.psifos.shards import get_manifest, get_shard
+from app.psifos.jobs import job_queue, public_job, JobStatus, JOB_KINDS, JOB_PARAMS
+from app.psifos.export import export_chunks, export_media_type
+from app.psifos.encoding import accepts_msgpack
+from app.psifos.trackers import verify_trackers
+from app.psifos.merkle import merkle_trees
+from app.psifos.sync import ballot_box_changes
+from app.psifos.live import turnout_events
+from app.psifos.snapshots import get_dashboard_view
+from app.psifos.page import election_page
+from app.psifos.results import load_election_results, slice_results
+from app.psifos.trustees import trustees_overview
+from app.psifos.tallies import get_tally_election, list_tallies, get_tally, tally_chunks, IMMUTABLE_CACHE_CONTROL
+from app.psifos.listing import (
+    election_index, election_filters, observe_election_status, observe_listed_statuses, ELECTION_LIST_FIELDS
+)
+from app.psifos import stats
+from app.config import EXPORT_CHUNK_SIZE, TRACKER_VERIFY_MAX_HASHES, BATCH_STATS_MAX_ELECTIONS, SYNC_MAX_PAGE_SIZE
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from app.dependencies import get_session
 from app.psifos.model import crud, schemas
 from app.psifos.model import bundle_schemas
 from sqlalchemy.orm import Session
 from urllib.parse import unquote
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.psifos.model.enums import ElectionPublicEventEnum, TrusteeStepEnum, ElectionStatusEnum, ElectionLoginTypeEnum
+from app.psifos.model.enums import ElectionPublicEventEnum
 from datetime import timedelta
 from app.psifos.model import models
 
@@ -22,83 +44,226 @@ api_router = APIRouter()
 
 
 @api_router.post("/elections", response_model=list[schemas.ElectionOut], status_code=200)
-async def get_elections(data: dict = {}, session: Session | AsyncSession = Depends(get_session)):
+@serve_stale("elections")
+@admission_control("list")
+async def get_elections(response: Response, data: dict = {}, session: Session | AsyncSession = Depends(get_session)):
 
     """
     POST
 
-    This route gets all the elections that exist in the system.
-    It has an optional parameter in the body to page them:
+    This route gets the elections that exist in the system.
+    It has optional parameters in the body to filter and page them:
 
     {
+      status: Status, or list of statuses, e.g. "Started"
+      type: Election type, or list of them
+      voters_login_type: Login type, or list of them
+      search: Text searched in the short and long names
+      order_by: id (default), short_name, long_name or status, "-" prefix for descending
       page: The page number you want to get
       page_size: Number of elements to display per page
+      cursor: Keyset pagination, null for the first page and then
+              the value of the X-Next-Cursor response header
+      fields: Optional list of fields to return, e.g. ["status", "long_name"]
+      include_public_key: Include the public key (omitted by default)
     }
 
+    The total number of matching elections is returned in the X-Total-Count header.
+
     """
 
+    data = data or {}
     page, page_size = paginate(data)
-    return await crud.get_elections(session=session, page=page, page_size=page_size)
+    keyset_mode, after = cursor_params(data)
+    fields = parse_fields(data.get("fields"), schemas.ElectionOut, models.Election)
+    if not fields:
+        fields = {**ELECTION_LIST_FIELDS, **({"public_key": {}} if data.get("include_public_key") else {})}
+
+    filters = election_filters(data)
+    election_ids = await election_index(session, filters)
+    if keyset_mode and after is not None:
+        if after[0] not in election_ids:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        start = election_ids.index(after[0]) + 1
+    else:
+        start = page * page_size
+    page_ids = election_ids[start:start + page_size]
+
+    elections = await crud.get_elections_by_ids(session=session, election_ids=page_ids, fields=fields)
+    if "status" in fields:
+        await observe_listed_statuses(elections, filters)
+    response = sparse_response(elections, fields, schemas.ElectionOut)
+    response.headers[TOTAL_COUNT_HEADER] = str(len(election_ids))
+    if keyset_mode:
+        set_next_cursor(response, elections, crud.ELECTION_KEYSET, page_size)
+    return response
 
 
 @api_router.get("/election/{short_name}", response_model=schemas.ElectionOut, status_code=200)
-async def get_election(short_name: str, session: Session | AsyncSession = Depends(get_session)):
+@serve_stale("election", schemas.ElectionOut)
+async def get_election(short_name: str, fields: str | None = None, session: Session | AsyncSession = Depends(get_session)):
+
+    """
+    GET
+
+    This route delivers all public data of an election,
+    the optional query parameter fields (comma separated)
+    restricts the returned attributes.
+
+    """
+
+    fields = parse_fields(fields, schemas.ElectionOut, models.Election)
+    election = await crud.get_election_by_short_name(session=session, short_name=short_name, fields=fields)
+    if election is not None and (not fields or "status" in fields):
+        await observe_election_status(election.id, election.status)
+    if fields:
+        return sparse_response(election, fields, schemas.ElectionOut)
+    return election
+
+
+@api_router.get("/election/{short_name}/page", status_code=200)
+@serve_stale("page")
+@admission_control("list")
+async def get_election_page(short_name: str):
 
     """
     GET
 
-    This route delivers all public data of an election
+    This route delivers in a single response everything the public
+    election page needs: the election, its stats, questions, total
+    voters and trustees and the election-has-* flags.
 
     """
 
-    return await crud.get_election_by_short_name(session=session, short_name=short_name)
+    page = await election_page(short_name)
+    if page is None:
+        raise HTTPException(status_code=404, detail="Election not found")
+    return page
 
 
 @api_router.get("/election/{short_name}/result", status_code=200)
-async def get_election_results(short_name: str, session: Session | AsyncSession = Depends(get_session)):
+@serve_stale("result")
+async def get_election_results(short_name: str, group: str | None = None, question: int | None = None,
+                               session: Session | AsyncSession = Depends(get_session)):
 
     """
     GET
 
-    This route delivers the results of an election
+    This route delivers the results of an election, the optional
+    query parameters group and question slice them.
+
+    """
+
+    results = await load_election_results(session, short_name)
+    return slice_results(results, group=group, question=question)
+
+
+@api_router.get("/election/{short_name}/tallies", status_code=200)
+@serve_stale("tallies")
+async def get_election_tallies(short_name: str, page: int = 0, page_size: int | None = None,
+                               session: Session | AsyncSession = Depends(get_session)):
+
+    """
+    GET
+
+    This route lists the encrypted tallies of an election (question
+    index, group, type, number of tallied votes and size), paginated
+    by group. The content of every tally is served by the tally route.
+
+    """
+
+    page, page_size = paginate({"page": page, "page_size": page_size or 10})
+    election_id, final = await get_tally_election(session, short_name)
+    return await list_tallies(session, election_id, final, page, page_size)
+
+
+@api_router.get("/election/{short_name}/tally/{question_index}", status_code=200)
+@admission_control("heavy")
+async def get_election_tally(short_name: str, question_index: int, group: str,
+                             session: Session | AsyncSession = Depends(get_session)):
+
+    """
+    GET
+
+    This route streams the encrypted tally of a question
+    and group (query parameter) of an election.
 
     """
-    election = await crud.get_election_by_short_name(session=session, short_name=short_name)
-    return election.result
+
+    election_id, final = await get_tally_election(session, short_name)
+    tally = await get_tally(session, election_id, question_index, group)
+    return StreamingResponse(
+        tally_chunks(tally.id, tally.size),
+        media_type="application/json",
+        headers={"Cache-Control": IMMUTABLE_CACHE_CONTROL if final else "no-cache"}
+    )
 
 
 @api_router.get("/get-election-stats/{short_name}", status_code=200)
+@serve_stale("stats")
 async def get_election_stats(short_name: str, session: Session | AsyncSession = Depends(get_session)):
     """
     Route for getting the stats of a specific election.
     """
 
-    query_options = [
-        models.Election.id,
-        models.Election.status,
-        models.Election.short_name
-    ]
+    return await get_dashboard_view(session, short_name, "stats")
 
-    election = await crud.get_election_options_by_name(session=session, short_name=short_name, options=query_options)
-    total_voters = await crud.get_total_voters_by_election_id(session=session, election_id=election.id)
-    return {
-        "num_casted_votes": await crud.get_num_casted_votes(
-            session=session,
-            election_id=election.id
-        ),
-        "total_voters": total_voters,
-        "status": election.status,
-        "name": election.short_name
+
+@api_router.post("/get-elections-stats", status_code=200)
+@serve_stale("batch_stats")
+@admission_control("list")
+async def get_elections_stats(data: dict = {}, session: Session | AsyncSession = Depends(get_session)):
+    """
+    POST
+
+    Route for getting the stats of several elections at once:
+
+    {
+      short_names: List of election short names
     }
 
+    Returns the stats keyed by short name, unknown elections are left out.
+    """
+
+    short_names = data.get("short_names")
+    if not isinstance(short_names, list) or not all(isinstance(s, str) for s in short_names):
+        raise HTTPException(status_code=400, detail="short_names must be a list of strings")
+    if len(short_names) > BATCH_STATS_MAX_ELECTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_STATS_MAX_ELECTIONS} elections per request")
+
+    return await stats.elections_stats(session, sorted(set(short_names)))
+
+
+@api_router.get("/election/{short_name}/live-stats", status_code=200)
+async def get_election_live_stats(short_name: str, session: Session | AsyncSession = Depends(get_session)):
+    """
+    GET
+
+    Server-Sent Events stream with the turnout of an election
+    (num_casted_votes, total_voters, status and the delta of
+    votes since the previous event), shared by all viewers.
+    """
+
+    election_id = await crud.get_election_id_by_short_name(session=session, short_name=short_name)
+    if election_id is None:
+        raise HTTPException(status_code=404, detail="Election not found")
+
+    return StreamingResponse(
+        turnout_events(election_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 
 @api_router.post("/get-election-group-stats/{short_name}", status_code=200)
+@admission_control("list")
 async def get_election_group_stats(short_name: str, data: dict = {}, session: Session | AsyncSession = Depends(get_session)):
     """
     Route for getting the stats of a specific election.
     """
     group = data.get("group")
     election = await crud.get_election_by_short_name(session=session, short_name=short_name)
+    await observe_election_status(election.id, election.status)
     group_voters = await crud.get_voters_group_by_election_id(session=session, election_id=election.id, group=group)
     return {
         "num_casted_votes": await crud.get_num_casted_votes_group(
@@ -112,18 +277,16 @@ async def get_election_group_stats(short_name: str, data: dict = {}, session: Se
     }
 
 @api_router.get("/{short_name}/get-questions", status_code=200)
+@serve_stale("questions")
 async def get_questions(short_name: str, session: Session | AsyncSession = Depends(get_session)):
     """
     Route for get the questions of an election
     """
-    election_params = [models.Election.id]
-    election = await crud.get_election_options_by_name(session=session, short_name=short_name, options=election_params)
-    questions = await crud.get_questions_by_election_id(session=session, election_id=election.id)
-    return {
-        "questions": [schemas.QuestionBase.from_orm(q) for q in questions]
-    }
+    return await get_dashboard_view(session, short_name, "questions")
 
 @api_router.post("/{short_name}/count-dates", status_code=200)
+@serve_stale("count_dates")
+@admission_control("heavy")
 async def get_count_votes_by_date(short_name: str, data: dict = {}, session: Session | AsyncSession = Depends(get_session)):
     """
     Return the number of votes per deltaTime from the start of the election until it ends
@@ -131,6 +294,7 @@ async def get_count_votes_by_date(short_name: str, data: dict = {}, session: Ses
     """
 
     election = await crud.get_election_by_short_name(session=session, short_name=short_name)
+    await observe_election_status(election.id, election.status)
 
     states_without_data = ["Setting up", "Ready for key generation", "Ready for opening"]
     if election.status in states_without_data:
@@ -157,6 +321,7 @@ async def get_count_votes_by_date(short_name: str, data: dict = {}, session: Ses
     return count_cast_votes
 
 @api_router.get("/{short_name}/total-voters", status_code=200)
+@serve_stale("total_voters")
 async def get_total_voters(short_name: str, session: Session | AsyncSession = Depends(get_session)):
     """
     Route for get the total voters of an election
@@ -168,6 +333,7 @@ async def get_total_voters(short_name: str, session: Session | AsyncSession = De
     }
 
 @api_router.get("/{short_name}/total-trustees", status_code=200)
+@serve_stale("total_trustees")
 async def get_total_trustees(short_name: str, session: Session | AsyncSession = Depends(get_session)):
     """
     Route for get the total trustees of an election
@@ -178,167 +344,126 @@ async def get_total_trustees(short_name: str, session: Session | AsyncSession =
     }
 
 @api_router.get("/{short_name}/election-has-questions", status_code=200)
+@serve_stale("has_questions")
 async def election_has_questions(short_name: str, session: Session | AsyncSession = Depends(get_session)):
     election = await crud.get_election_by_short_name(session=session, short_name=short_name)
     return {"result": bool(election.questions)}
 
 @api_router.get("/{short_name}/election-has-trustees", status_code=200)
+@serve_stale("has_trustees")
 async def election_has_trustees(short_name: str, session: Session | AsyncSession = Depends(get_session)):
     election = await crud.get_election_by_short_name(session=session, short_name=short_name)
     return {"result": bool(election.trustees)}
 
 @api_router.get("/{short_name}/election-has-voters", status_code=200)
+@serve_stale("has_voters")
 async def election_has_voters(short_name: str, session: Session | AsyncSession = Depends(get_session)):
     election = await crud.get_election_by_short_name(session=session, short_name=short_name)
     return {"result": bool(election.voters)}
 
 @api_router.get("/{short_name}/voters-by-weight-init", status_code=200)
+@serve_stale("voters_by_weight_init")
 async def get_voters_by_weight_init(short_name: str, session: Session | AsyncSession = Depends(get_session)):
 
-    election_params = [
-        models.Election.id,
-        models.Election.max_weight
-    ]
-
-    election = await crud.get_election_options_by_name(session=session, short_name=short_name, options=election_params)
-    voters = await crud.get_voters_by_group_and_weight_initial(session=session, election_id=election.id)
-
-    normalized_weights = {}
-    voters_by_weight_init = {}
-    for v in voters:
-        v_group, v_weight_init, total_voters = v
-        v_w = v_weight_init / election.max_weight
-        normalized_weights.setdefault(v_group, []).extend([v_w] * total_voters)
-        voters_by_weight_init[v_w] = voters_by_weight_init.get(v_w, 0) + total_voters
-
-    voters_by_weight_init_grouped = [
-        {"group": group, "weights": {
-            str(w): weights_group.count(w) for w in weights_group}}
-        for group, weights_group in normalized_weights.items()
-    ]
-
-    return {
-        "voters_by_weight_init": voters_by_weight_init,
-        "voters_by_weight_init_grouped": voters_by_weight_init_grouped
-    }
+    return await get_dashboard_view(session, short_name, "voters_by_weight_init")
 
 @api_router.get("/{short_name}/votes-by-weight-init", status_code=200)
+@serve_stale("votes_by_weight_init")
 async def get_votes_by_weight_init(short_name: str, session: Session | AsyncSession = Depends(get_session)):
     """
     Route for get a resume election
     """
 
-    election_params = [
-        models.Election.id,
-        models.Election.max_weight
-    ]
-
-    election = await crud.get_election_options_by_name(session=session, short_name=short_name, options=election_params)
-    voters = await crud.get_voters_by_group_and_weight_valid(session=session, election_id=election.id)
-
-    voters_group = {}
-    votes_election = {}
-
-    for v in voters:
-        v_group, v_weight_init, _, total_voters = v
-        normalized_weight = v_weight_init / election.max_weight
-        voters_group.setdefault(v_group, []).extend([normalized_weight] * total_voters)
-        votes_election[normalized_weight] = votes_election.get(
-            normalized_weight, 0) + total_voters
-
-    votes_by_weight = [{"group": group, "weights": {str(w): value.count(
-        w) for w in value}} for group, value in voters_group.items()]
-
-    return {
-        "votes_by_weight": votes_election,
-        "votes_by_weight_grouped": votes_by_weight
-    }
+    return await get_dashboard_view(session, short_name, "votes_by_weight_init")
 
 
 @api_router.get("/{short_name}/votes-by-weight-end", status_code=200)
+@serve_stale("votes_by_weight_end")
 async def get_votes_by_weight_end(short_name: str, session: Session | AsyncSession = Depends(get_session)):
 
-    election_params = [
-        models.Election.id,
-        models.Election.max_weight
-    ]
-    election = await crud.get_election_options_by_name(session=session, short_name=short_name, options=election_params)
-    voters = await crud.get_voters_by_group_and_weight_valid(session=session, election_id=election.id)
-
-    votes_by_weight_end = {}
-    normalized_weights = {}
-    for v in voters:
-        v_group, _, v_weight_end, total_voters = v
-        v_w = v_weight_end / election.max_weight
-        normalized_weights.setdefault(v_group, []).extend([v_w] * total_voters)
-        votes_by_weight_end[v_w] = votes_by_weight_end.get(v_w, 0) + total_voters
-
-    votes_by_weight_end_grouped = [
-        {"group": group, "weights": {
-            str(w): weights_group.count(w) for w in weights_group}}
-        for group, weights_group in normalized_weights.items()
-    ]
-
-    return {
-        "votes_by_weight_end": votes_by_weight_end,
-        "votes_by_weight_end_grouped": votes_by_weight_end_grouped
-    }
+    return await get_dashboard_view(session, short_name, "votes_by_weight_end")
 
 @api_router.get("/election/{short_name}/election-logs", response_model=list[schemas.ElectionLogOut], status_code=200)
-async def election_logs(short_name: str, session: Session | AsyncSession = Depends(get_session)):
+@serve_stale("election_logs", schemas.ElectionLogOut)
+@admission_control("list")
+async def election_logs(short_name: str, since_id: int | None = None, since: datetime.datetime | None = None,
+                        until: datetime.datetime | None = None, page: int = 0, page_size: int | None = None,
+                        session: Session | AsyncSession = Depends(get_session)):
     """
     GET
 
-    Is used to obtain the different logs of an election
+    Is used to obtain the different (public) logs of an election.
+    Optional query parameters:
+
+      since_id: Only logs after this id, used by pollers to get the new entries
+      since / until: Range of creation dates
+      page / page_size: Pagination over the log stream
 
     """
 
+    if page_size is not None:
+        page, page_size = paginate({"page": page, "page_size": page_size})
+
     election_id = await crud.get_election_id_by_short_name(session=session, short_name=short_name)
-    election_logs = await crud.get_election_logs(session=session, election_id=election_id)
-    election_logs = list(filter(
-        lambda log: ElectionPublicEventEnum.has_member_key(log.event), election_logs))
-    return election_logs
+    return await crud.get_election_logs(
+        session=session,
+        election_id=election_id,
+        events=[event.value for event in ElectionPublicEventEnum],
+        since_id=since_id,
+        since=since,
+        until=until,
+        page=page,
+        page_size=page_size
+    )
 
 
 @api_router.get("/election/{short_name}/bundle-file", response_model=bundle_schemas.Bundle, status_code=200)
-async def election_bundle_file(short_name: str, session: Session | AsyncSession = Depends(get_session)):
+@admission_control("heavy")
+async def election_bundle_file(short_name: str, request: Request, session: Session | AsyncSession = Depends(get_session)):
     """
     GET
 
     It is used to get all the necessary values ​​for the bundle file.
+    With "Accept: application/msgpack" it is sent as MessagePack.
 
     """
 
-    election = await crud.get_election_by_short_name(session=session, short_name=short_name)
-    election.public_key = from_json(election.public_key)
-    election.questions = from_json(election.questions)
-    voters = [bundle_schemas.VoterBundle.from_orm(v) for v in election.voters]
-    voters_id = [v.id for v in election.voters]
-
-    # Get votes by uuid and voter uuid
-    votes = await crud.get_votes_by_ids(session=session, voters_id=voters_id)
-    votes = [bundle_schemas.VoteBundle.from_orm(v) for v in votes]
-    votes = list(map(lambda v: {"vote": from_json(v.encrypted_ballot), "vote_hash": v.encrypted_ballot_hash,
-                 "cast_at": v.cast_at, "voter_login_id": v.psifos_voter.username}, votes))
-
-    # Lets decode string to json
-    trustee_out = []
-    for t in election.trustees:
-        t.public_key = await crud.get_public_key_by_id(session=session, public_key_id=t.public_key_id)
-        t.decryptions = await crud.get_decryption_by_trustee_id(session=session, trustee_crypto_id=t.id)
-        t.certificate = from_json(t.certificate)
-        t.coefficients = from_json(t.coefficients)
-        t.acknowledgements = from_json(t.acknowledgements)
-        trustee_out.append(t)
-
-    return bundle_schemas.Bundle(election=bundle_schemas.ElectionBundle.from_orm(election),
-                                 voters=voters,
-                                 votes=votes,
-                                 result=from_json(election.result),
-                                 trustees=trustee_out)
+    bundle = await build_bundle(session, short_name)
+    return msgpack_response(bundle) if accepts_msgpack(request) else bundle
+
+
+@api_router.get("/election/{short_name}/bundle/manifest", status_code=200)
+@admission_control("heavy")
+async def election_bundle_manifest(short_name: str, session: Session | AsyncSession = Depends(get_session)):
+    """
+    GET
+
+    Manifest of the sharded bundle file: the election, trustees and
+    result parts and the vote and voter shards, each one with the
+    SHA-256 of its content.
+
+    """
+
+    return await get_manifest(session, short_name)
+
+
+@api_router.get("/election/{short_name}/bundle/shards/{name}", status_code=200)
+@admission_control("list")
+async def election_bundle_shard(short_name: str, name: str, session: Session | AsyncSession = Depends(get_session)):
+    """
+    GET
+
+    A part of the sharded bundle file by its name in the manifest
+    (e.g. "election" or "votes-3"), its SHA-256 is sent as ETag.
+
+    """
+
+    content, sha256 = await get_shard(session, short_name, name)
+    return Response(content=content, media_type="application/json", headers={"ETag": f'"{sha256}"'})
 
 
 @api_router.get("/election/{short_name}/get_status", status_code=200)
+@serve_stale("status")
 async def get_election_status(short_name: str, session: Session | AsyncSession = Depends(get_session)):
     """
     GET
@@ -356,7 +481,8 @@ async def get_election_status(short_name: str, session: Session | AsyncSession =
 
 
 @api_router.post("/election/{short_name}/voters", response_model=list[schemas.VoterOut], status_code=200)
-async def get_voters(short_name: str, data: dict = {}, session: Session | AsyncSession = Depends(get_session)):
+@admission_control("list")
+async def get_voters(short_name: str, response: Response, data: dict = {}, session: Session | AsyncSession = Depends(get_session)):
     """
     POST
 
@@ -366,18 +492,58 @@ async def get_voters(short_name: str, data: dict = {}, session: Session | AsyncS
     {
       page: The page number you want to get
       page_size: Number of elements to display per page
+      cursor: Keyset pagination, null for the first page and then
+              the value of the X-Next-Cursor response header
+      fields: Optional list of fields to return, e.g. ["username", "name"]
     }
     """
     page, page_size = paginate(data)
+    keyset_mode, after = cursor_params(data)
+    fields = parse_fields(data.get("fields"), schemas.VoterOut, models.Voter)
 
-    election = await crud.get_election_by_short_name(session=session, short_name=short_name)
-    return await crud.get_voters_by_election_id(session=session, election_id=election.id, page=page, page_size=page_size)
+    election_id = await crud.get_election_id_by_short_name(session=session, short_name=short_name)
+    voters = await crud.get_voters_by_election_id(session=session, election_id=election_id, page=page, page_size=page_size, fields=fields, after=after)
+    if fields:
+        response = sparse_response(voters, fields, schemas.VoterOut)
+    if keyset_mode:
+        set_next_cursor(response, voters, crud.VOTER_KEYSET, page_size)
+    return response if fields else voters
+
+
+@api_router.get("/election/{short_name}/export/voters", status_code=200)
+@admission_control("heavy")
+async def export_voters(short_name: str, request: Request, format: str = None, session: Session | AsyncSession = Depends(get_session)):
+    """
+    GET
+
+    Streams the whole electoral roll of an election in a single
+    request, format can be ndjson (default), csv or msgpack (also
+    chosen with "Accept: application/msgpack").
+    """
+
+    return await _export_response(short_name, format, request, "voters", crud.stream_voters_by_election_id, crud.VOTER_EXPORT_COLUMNS, session)
+
+
+async def _export_response(short_name: str, export_format: str | None, request: Request, name: str, stream_rows, columns: list, session):
+    export_format = export_format or ("msgpack" if accepts_msgpack(request) else "ndjson")
+    media_type = export_media_type(export_format)
+    election_id = await crud.get_election_id_by_short_name(session=session, short_name=short_name)
+    if election_id is None:
+        raise HTTPException(status_code=404, detail="Election not found")
+
+    partitions = stream_rows(election_id=election_id, chunk_size=EXPORT_CHUNK_SIZE)
+    return StreamingResponse(
+        export_chunks(partitions, export_format, [c.key for c in columns]),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{short_name}_{name}.{export_format}"'}
+    )
 
 
 # ----- Trustee routes -----
 
 @api_router.post("/election/{short_name}/trustees", status_code=200)
-async def get_trustees_election(short_name: str, data: dict = None, session: Session | AsyncSession = Depends(get_session)):
+@admission_control("list")
+async def get_trustees_election(short_name: str, response: Response, data: dict = None, session: Session | AsyncSession = Depends(get_session)):
     """
     POST
 
@@ -387,13 +553,37 @@ async def get_trustees_election(short_name: str, data: dict = None, session: Ses
     {
       page: The page number you want to get
       page_size: Number of elements to display per page
+      cursor: Keyset pagination, null for the first page and then
+              the value of the X-Next-Cursor response header
     }
     """
 
     page, page_size = paginate(data)
+    keyset_mode, after = cursor_params(data)
 
-    election = await crud.get_election_by_short_name(session=session, short_name=short_name)
-    return await crud.get_trustees_by_election_id(session=session, election_id=election.id, page=page, page_size=page_size)
+    election_id = await crud.get_election_id_by_short_name(session=session, short_name=short_name)
+    trustees = await crud.get_trustees_by_election_id(session=session, election_id=election_id, page=page, page_size=page_size, after=after)
+    if keyset_mode:
+        set_next_cursor(response, trustees, crud.TRUSTEE_KEYSET, page_size)
+    return trustees
+
+
+@api_router.get("/election/{short_name}/trustees/overview", status_code=200)
+@serve_stale("trustees_overview")
+async def get_trustees_overview(short_name: str, include_crypto: bool = False, session: Session | AsyncSession = Depends(get_session)):
+    """
+    GET
+
+    This route delivers an overview of the trustees of an election:
+    step progress, public key hash and decryptions of each one. The
+    crypto blobs (public key, certificate, coefficients, acknowledgements
+    and decryptions) are only included with include_crypto=true.
+    """
+
+    election_id = await crud.get_election_id_by_short_name(session=session, short_name=short_name)
+    if election_id is None:
+        raise HTTPException(status_code=404, detail="Election not found")
+    return await trustees_overview(session, election_id, include_crypto=include_crypto)
 
 
 @api_router.get("/trustee/{trustee_uuid}", response_model=schemas.TrusteeOut, status_code=200)
@@ -410,7 +600,8 @@ async def get_trustee(trustee_uuid: str, session: Session | AsyncSession = Depen
 # ----- CastVote routes -----
 
 @api_router.post("/election/{short_name}/cast-votes", response_model=list[schemas.CastVoteOut], status_code=200)
-async def get_cast_votes(short_name: str, data: dict = {}, session: Session | AsyncSession = Depends(get_session)):
+@admission_control("list")
+async def get_cast_votes(short_name: str, request: Request, response: Response, data: dict = {}, session: Session | AsyncSession = Depends(get_session)):
 
     """
     This route delivers all the cast votes of an election
@@ -419,16 +610,81 @@ async def get_cast_votes(short_name: str, data: dict = {}, session: Session | As
     {
       page: The page number you want to get
       page_size: Number of elements to display per page
+      cursor: Keyset pagination, null for the first page and then
+              the value of the X-Next-Cursor response header
+      fields: Optional list of fields to return, e.g. ["encrypted_ballot_hash"]
+      total: If true, the (cached) number of cast votes is returned in X-Total-Count
     }
 
+    With "Accept: application/msgpack" the cast votes are sent as MessagePack.
+
     """
 
     page, page_size = paginate(data)
+    keyset_mode, after = cursor_params(data)
+    fields = parse_fields(data.get("fields"), schemas.CastVoteOut, models.CastVote)
 
-    election = await crud.get_election_by_short_name(session=session, short_name=short_name)
-    voters = await crud.get_voters_by_election_id(session=session, election_id=election.id, page=page, page_size=page_size)
-    voters_id = [v.id for v in voters]
-    return await crud.get_votes_by_ids(session=session, voters_id=voters_id)
+    election_id = await crud.get_election_id_by_short_name(session=session, short_name=short_name)
+    votes = await crud.get_cast_votes_by_election_id(session=session, election_id=election_id, page=page, page_size=page_size, fields=fields, after=after)
+    binary = accepts_msgpack(request)
+    if binary:
+        response = msgpack_response(
+            [serialize_fields(v, fields, schemas.CastVoteOut) for v in votes] if fields else [schemas.CastVoteOut.from_orm(v) for v in votes]
+        )
+    elif fields:
+        response = sparse_response(votes, fields, schemas.CastVoteOut)
+    if keyset_mode:
+        set_next_cursor(response, votes, crud.CAST_VOTE_KEYSET, page_size)
+    if data.get("total"):
+        total_votes = await cached_count(
+            f"cast_votes:{election_id}",
+            lambda: crud.get_total_cast_votes_by_election_id(session=session, election_id=election_id)
+        )
+        response.headers[TOTAL_COUNT_HEADER] = str(total_votes)
+    return response if fields or binary else votes
+
+
+@api_router.post("/election/{short_name}/cast-votes/changes", status_code=200)
+@admission_control("list")
+async def get_cast_vote_changes(short_name: str, data: dict = {}, session: Session | AsyncSession = Depends(get_session)):
+
+    """
+    POST
+
+    Incremental sync of the ballot box for mirrors:
+
+    {
+      cursor: null for the first sync and then the cursor of the last response
+      page_size: Number of new cast votes per response (at most SYNC_MAX_PAGE_SIZE)
+      include_ballot: If false the encrypted ballots are left out (default true)
+    }
+
+    Returns the cast votes after the cursor ("votes"), and once there
+    are no more ("has_more" is false) the older ones that were cast
+    again ("recast") and the ids of the invalid cast votes if they
+    changed ("invalid_ids", null if they did not).
+
+    """
+
+    page_size = data.get("page_size", SYNC_MAX_PAGE_SIZE)
+    if not isinstance(page_size, int) or not 0 < page_size <= SYNC_MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"page_size must be between 1 and {SYNC_MAX_PAGE_SIZE}")
+
+    include_ballot = data.get("include_ballot", True)
+    if not isinstance(include_ballot, bool):
+        raise HTTPException(status_code=400, detail="include_ballot must be a boolean")
+
+    election_id = await crud.get_election_id_by_short_name(session=session, short_name=short_name)
+    if election_id is None:
+        raise HTTPException(status_code=404, detail="Election not found")
+
+    return await ballot_box_changes(
+        session=session,
+        election_id=election_id,
+        token=data.get("cursor"),
+        page_size=page_size,
+        include_ballot=include_ballot
+    )
 
 
 @api_router.get("/election/{short_name}/cast-vote/{hash_vote:path}", response_model=schemas.CastVoteOut, status_code=200)
@@ -439,17 +695,121 @@ async def get_vote_by_hash(short_name: str, hash_vote, session: Session | AsyncS
 
     """
     hash_vote = unquote(unquote(hash_vote))
-    return await crud.get_cast_vote_by_hash(session=session, hash_vote=hash_vote)
+    election_id = await crud.get_election_id_by_short_name(session=session, short_name=short_name)
+    if election_id is None:
+        raise HTTPException(status_code=404, detail="Election not found")
+    cast_vote = await crud.get_cast_vote_by_hash(session=session, hash_vote=hash_vote, election_id=election_id)
+    if cast_vote is None:
+        raise HTTPException(status_code=404, detail="Cast vote not found")
+    return cast_vote
+
+
+@api_router.post("/election/{short_name}/cast-votes/verify", status_code=200)
+@admission_control("heavy")
+async def verify_cast_votes(short_name: str, data: dict = {}, session: Session | AsyncSession = Depends(get_session)):
+
+    """
+    POST
+
+    Verifies a batch of ballot trackers (vote hashes) in one request:
+
+    {
+      hashes: List of vote hashes (at most TRACKER_VERIFY_MAX_HASHES)
+    }
+
+    """
+
+    hashes = data.get("hashes") or []
+    if not isinstance(hashes, list) or len(hashes) > TRACKER_VERIFY_MAX_HASHES:
+        raise HTTPException(status_code=400, detail=f"hashes must be a list of at most {TRACKER_VERIFY_MAX_HASHES} elements")
+
+    election_params = [models.Election.id, models.Election.status]
+    election = await crud.get_election_options_by_name(session=session, short_name=short_name, options=election_params)
+    if election is None:
+        raise HTTPException(status_code=404, detail="Election not found")
+    await observe_election_status(election.id, election.status)
+
+    hashes = [unquote(str(h)) for h in hashes]
+    found = await verify_trackers(session=session, election_id=election.id, status=election.status, hashes=hashes)
+    return {
+        "found": [h for h in hashes if h in found],
+        "missing": [h for h in hashes if h not in found]
+    }
+
+
+@api_router.get("/election/{short_name}/merkle-root", status_code=200)
+@serve_stale("merkle_root")
+async def get_merkle_root(short_name: str, session: Session | AsyncSession = Depends(get_session)):
+
+    """
+    GET
+
+    Root of the Merkle tree over the cast vote hashes of the
+    election (ordered by cast vote id) and its number of leaves.
+
+    """
+
+    election_params = [models.Election.id, models.Election.status]
+    election = await crud.get_election_options_by_name(session=session, short_name=short_name, options=election_params)
+    if election is None:
+        raise HTTPException(status_code=404, detail="Election not found")
+    await observe_election_status(election.id, election.status)
+
+    election_tree = await merkle_trees.get(session, election.id, election.status)
+    return election_tree.summary()
+
+
+@api_router.get("/election/{short_name}/merkle-proof/{hash_vote:path}", status_code=200)
+async def get_merkle_proof(short_name: str, hash_vote, session: Session | AsyncSession = Depends(get_session)):
+
+    """
+    GET
+
+    Inclusion proof of a cast vote hash in the Merkle tree of the
+    election: the siblings from its leaf to the root, with the root
+    they lead to.
+
+    """
+
+    hash_vote = unquote(unquote(hash_vote))
+    election_params = [models.Election.id, models.Election.status]
+    election = await crud.get_election_options_by_name(session=session, short_name=short_name, options=election_params)
+    if election is None:
+        raise HTTPException(status_code=404, detail="Election not found")
+    await observe_election_status(election.id, election.status)
+
+    election_tree = await merkle_trees.get(session, election.id, election.status)
+    proof = election_tree.inclusion_proof(hash_vote)
+    if proof is None:
+        raise HTTPException(status_code=404, detail="Cast vote not found")
+    return proof
+
+
+@api_router.get("/election/{short_name}/export/cast-votes", status_code=200)
+@admission_control("heavy")
+async def export_cast_votes(short_name: str, request: Request, format: str = None, session: Session | AsyncSession = Depends(get_session)):
+    """
+    GET
+
+    Streams all the cast votes of an election in a single
+    request, format can be ndjson (default), csv or msgpack (also
+    chosen with "Accept: application/msgpack").
+    """
+
+    return await _export_response(short_name, format, request, "cast_votes", crud.stream_cast_votes_by_election_id, crud.CAST_VOTE_EXPORT_COLUMNS, session)
 
 
 @api_router.post("/election/{short_name}/votes", response_model=schemas.UrnaOut, status_code=200)
-async def get_votes(short_name: str, data: dict = {}, session: Session | AsyncSession = Depends(get_session)):
+@admission_control("heavy")
+async def get_votes(short_name: str, response: Response, data: dict = {}, session: Session | AsyncSession = Depends(get_session)):
 
     """
     POST
 
     This route delivers a list of voters according to the hash of the corresponding vote,
-    it is used to display the electronic ballot box
+    it is used to display the electronic ballot box. The optional body parameter
+    fields restricts the voter attributes, e.g. ["username", "cast_vote.encrypted_ballot_hash"]
+    and cursor enables keyset pagination (see X-Next-Cursor).
 
     """
 
@@ -458,76 +818,140 @@ async def get_votes(short_name: str, data: dict = {}, session: Session | AsyncSe
     vote_hash = data.get("vote_hash", "")
     voter_name = data.get("voter_name", "")
     only_with_valid_vote = data.get("only_with_valid_vote")
+    keyset_mode, after = cursor_params(data)
+    fields = parse_fields(data.get("fields"), schemas.VoterCastVote, models.Voter)
     election = await crud.get_election_by_short_name(session=session, short_name=short_name, simple=True)
 
-    if only_with_valid_vote:
-        voters = await crud.get_voters_with_valid_vote(session=session, election_id=election.id)
-    else:
-        voters = await crud.get_voters_by_election_id(session=session, election_id=election.id)
-
     if voter_name:
+        if only_with_valid_vote:
+            voters = await crud.get_voters_with_valid_vote(session=session, election_id=election.id)
+        else:
+            voters = await crud.get_voters_by_election_id(session=session, election_id=election.id)
+
         voters = [
             v for v in voters
             if unidecode(voter_name.lower()) in unidecode(v.name.lower()) or
                unidecode(voter_name.lower()) in unidecode(v.username.lower())
         ]
+        if fields:
+            return JSONResponse(content={
+                "voters": [serialize_fields(v, fields, schemas.VoterCastVote) for v in voters],
+                "position": 0, "more_votes": False, "total_votes": len(voters)
+            })
         return schemas.UrnaOut(voters=voters, position=0, more_votes=False, total_votes=len(voters))
 
-    if vote_hash:
-        voters_id = [v.id for v in voters]
-        hash_votes = await crud.get_hashes_vote(session=session, voters_id=voters_id)
-
-        if (vote_hash,) in hash_votes:
-            index_hash = hash_votes.index((vote_hash,))
-            page = index_hash - (index_hash % page_size)
-
     if only_with_valid_vote:
-        voters_page = await crud.get_voters_with_valid_vote(session=session, election_id=election.id, page=page, page_size=page_size)
-        voters_next_page = await crud.get_voters_with_valid_vote(session=session, election_id=election.id, page=page + 1, page_size=page_size)
+        total_votes = await cached_count(
+            f"valid_votes:{election.id}",
+            lambda: crud.get_num_casted_votes(session=session, election_id=election.id)
+        )
     else:
-        voters_page = await crud.get_voters_by_election_id(session=session, election_id=election.id, page=page, page_size=page_size)
-        voters_next_page = await crud.get_voters_by_election_id(session=session, election_id=election.id, page=page + 1, page_size=page_size)
+        total_votes = await cached_count(
+            f"voters:{election.id}",
+            lambda: crud.get_total_voters_by_election_id(session=session, election_id=election.id)
+        )
+
+    if vote_hash:
+        cast_vote = await crud.get_cast_vote_by_hash(session=session, hash_vote=vote_hash, election_id=election.id)
+        if cast_vote is not None:
+            index_hash = await crud.get_voter_position(
+                session=session, election_id=election.id, voter_id=cast_vote.voter_id, only_with_valid_vote=only_with_valid_vote
+            )
+            page = index_hash // page_size
+
+    get_voters_page = crud.get_voters_with_valid_vote if only_with_valid_vote else crud.get_voters_by_election_id
+    if keyset_mode:
+        voters_page = await get_voters_page(session=session, election_id=election.id, page_size=page_size + 1, fields=fields, after=after)
+        more_votes = len(voters_page) > page_size
+        voters_page = voters_page[:page_size]
+    else:
+        voters_page = await get_voters_page(session=session, election_id=election.id, page=page, page_size=page_size, fields=fields)
+        voters_next_page = await get_voters_page(session=session, election_id=election.id, page=page + 1, page_size=page_size, fields=fields)
+        more_votes = len(voters_next_page) != 0
+
+    if fields:
+        response = JSONResponse(content={
+            "voters": [serialize_fields(v, fields, schemas.VoterCastVote) for v in voters_page],
+            "position": page, "more_votes": more_votes, "total_votes": total_votes
+        })
+    if keyset_mode and more_votes:
+        set_next_cursor(response, voters_page, crud.VOTER_KEYSET, page_size)
+    if fields:
+        return response
 
     voters_page = [schemas.VoterCastVote.from_orm(v) for v in voters_page]
-    more_votes = len(voters_next_page) != 0
 
-    return schemas.UrnaOut(voters=voters_page, position=page, more_votes=more_votes, total_votes=len(voters))
+    return schemas.UrnaOut(voters=voters_page, position=page, more_votes=more_votes, total_votes=total_votes)
 
 @api_router.get("/{short_name}/check-status", status_code=200)
+@serve_stale("check_status")
 async def check_election_status(short_name: str, session: Session | AsyncSession = Depends(get_session)):
     """
     GET
 
     Returns the status of an election
     """
-    election = await crud.get_election_by_short_name(session=session, short_name=short_name, simple=True)
-    voters = await crud.get_voters_by_election_id(session=session, election_id=election.id)
-
-    trustee_params = [models.TrusteeCrypto.id, models.TrusteeCrypto.current_step]
-    trustees = await crud.get_trustee_crypto_params_by_election_id(session=session, election_id=election.id, params=trustee_params)
+    return await get_dashboard_view(session, short_name, "check_status")
 
-    questions_params = [models.AbstractQuestion.id]
-    questions = await crud.get_questions_params_by_election_id(session=session, election_id=election.id, params=questions_params)
 
-    waiting_decryptions = filter(lambda t: t.current_step == TrusteeStepEnum.waiting_decryptions, trustees)
-    decryptions_uploaded = filter(lambda t: t.current_step == TrusteeStepEnum.decryptions_sent, trustees)
+# ----- Job routes -----
 
-    can_combine_decryptions = election.status == ElectionStatusEnum.decryptions_uploaded or (election.status == ElectionStatusEnum.tally_computed and len(list(decryptions_uploaded)) >= len(trustees) // 2 + 1)
-    opening_ready = len(list(waiting_decryptions)) == len(trustees) and election.status == ElectionStatusEnum.ready_key_generation
 
-    total_trustees = len(trustees)
-    total_voters = len(voters)
-    add_questions = len(questions) == 0 and election.status == ElectionStatusEnum.setting_up
-    add_voters = len(voters) == 0 and election.voters_login_type == ElectionLoginTypeEnum.close_p and election.status == ElectionStatusEnum.setting_up
-    add_trustees = len(trustees) == 0 and election.status == ElectionStatusEnum.setting_up
+@api_router.post("/jobs", status_code=202)
+async def submit_job(data: dict = {}):
+    """
+    POST
 
-    key_generation_ready = election.status == ElectionStatusEnum.setting_up and (total_voters > 0 or election.voters_login_type != ElectionLoginTypeEnum.close_p) and total_trustees > 0 and not add_questions
+    Submits a heavy computation as an asynchronous job:
 
-    return {
-        "add_voters": add_voters,
-        "add_trustees": add_trustees,
-        "add_questions": add_questions,
-        "opening_ready": opening_ready,
-        "can_combine_decryptions": can_combine_decryptions,
-        "key_generation_ready": key_generation_ready,
+    {
+      kind: "bundle", "weight_histograms", "export_voters" or "export_cast_votes"
+      short_name: Short name of the election
     }
+
+    An identical live job is returned instead of queueing a new one.
+    """
+
+    kind = data.get("kind")
+    if kind not in JOB_KINDS:
+        raise HTTPException(status_code=400, detail=f"Unknown job kind: {kind}")
+
+    params = {name: data.get(name) for name in JOB_PARAMS}
+    if not all(isinstance(value, str) and value for value in params.values()):
+        raise HTTPException(status_code=400, detail=f"Missing job parameters: {', '.join(JOB_PARAMS)}")
+
+    return public_job(await job_queue.submit(kind, params))
+
+
+@api_router.get("/jobs/{job_id}", status_code=200)
+async def get_job(job_id: str):
+    """
+    GET
+
+    Returns the status of a job.
+    """
+
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return public_job(job)
+
+
+@api_router.get("/jobs/{job_id}/result", status_code=200)
+async def get_job_result(job_id: str):
+    """
+    GET
+
+    Returns the result of a finished job, 409 while it is
+    queued or running or if it failed. The result of an export
+    is streamed from the job store.
+    """
+
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] != JobStatus.DONE:
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    if job.get("chunked"):
+        return StreamingResponse(job_queue.read_result(job_id), media_type="application/json")
+    return job["result"]
@@ -0,0 +1,187 @@
+"""
+Sharded bundle file of a Psifos election.
+
+The bundle (app.psifos.bundle) is split into parts that can be
+downloaded in parallel and verified one by one: the election
+header, the trustees and the result, plus the votes and the
+voters in shards of BUNDLE_SHARD_SIZE rows. A manifest lists
+every part with the SHA-256 of its content:
+
+    {
+      "short_name": ..., "format": ..., "shard_size": ...,
+      "merkle_root": {...},
+      "parts": [
+        {"name": "election", "sha256": ..., "size": ...},
+        {"name": "votes-0", "sha256": ..., "size": ..., "count": ..., "first_id": ..., "last_id": ...},
+        ...
+      ]
+    }
+
+A shard holds the rows of an id range (votes by cast vote id,
+voters by voter id), so it is read again with an index range
+when it is requested. The Merkle root of the manifest is computed
+from the votes of its shards.
+
+Once voting is over the manifest is cached for as long as the
+election watermark (crud.get_election_watermark) and the trustees
+watermark (crud.get_trustees_watermark) do not move. While the
+election is started every vote moves the watermark, so the manifest
+is a snapshot rebuilt every BUNDLE_MANIFEST_LIVE_TTL seconds instead.
+Shards are checked against the cached manifest and never rebuild
+it: when it is gone, or the shard changed since, the client is
+asked to fetch the manifest again (409).
+
+19-10-2026
+"""
+
+import asyncio
+import hashlib
+import itertools
+import json
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+
+from app.config import BUNDLE_SHARD_SIZE, BUNDLE_MANIFEST_TTL, BUNDLE_MANIFEST_LIVE_TTL
+from app.psifos.bundle import bundle_vote, bundle_election, bundle_trustees
+from app.psifos.cache import cache
+from app.psifos.merkle import merkle_summary
+from app.psifos.model import crud, models, bundle_schemas
+from app.psifos.model.enums import ElectionStatusEnum
+
+MANIFEST_FORMAT = "psifos-bundle-shards/2"
+
+HEADER_PARTS = ("election", "trustees", "result")
+
+# shard kind -> (rows of an id range, bundle item of a row)
+SHARD_KINDS = {
+    "votes": (
+        crud.get_bundle_votes_by_election_id,
+        lambda row: bundle_vote(row.encrypted_ballot, row.encrypted_ballot_hash, row.cast_at, row.username),
+    ),
+    "voters": (
+        crud.get_bundle_voters_by_election_id,
+        lambda row: bundle_schemas.VoterBundle.from_orm(row),
+    ),
+}
+
+
+def encode_part(data) -> bytes:
+    return json.dumps(jsonable_encoder(data), separators=(",", ":")).encode("utf-8")
+
+
+def _part_entry(name: str, content: bytes) -> dict:
+    return {"name": name, "sha256": hashlib.sha256(content).hexdigest(), "size": len(content)}
+
+
+async def _header_part(session, election, name: str):
+    if name == "election":
+        return bundle_election(election)
+    if name == "trustees":
+        return await bundle_trustees(session, election)
+
+    results = await crud.get_results_by_election_id(session=session, election_id=election.id)
+    return {"total_result": results.total_result, "grouped_result": results.grouped_result} if results is not None else None
+
+
+async def _shard_content(session, election_id: int, kind: str, after_id: int, up_to_id: int = None, limit: int = None):
+    fetch, to_item = SHARD_KINDS[kind]
+    rows = await fetch(session=session, election_id=election_id, after_id=after_id, up_to_id=up_to_id, limit=limit)
+    return rows, encode_part([to_item(row) for row in rows])
+
+
+async def _build_manifest(session, short_name: str) -> dict:
+    election = await crud.get_bundle_election_by_short_name(session=session, short_name=short_name)
+
+    parts = []
+    trackers = []
+    for name in HEADER_PARTS:
+        parts.append(_part_entry(name, encode_part(await _header_part(session, election, name))))
+
+    for kind in SHARD_KINDS:
+        after_id = 0
+        for index in itertools.count():
+            rows, content = await _shard_content(session, election.id, kind, after_id, limit=BUNDLE_SHARD_SIZE)
+            if not rows:
+                break
+            parts.append({
+                **_part_entry(f"{kind}-{index}", content),
+                "count": len(rows),
+                "first_id": rows[0].id,
+                "last_id": rows[-1].id,
+            })
+            if kind == "votes":
+                trackers.extend(row.encrypted_ballot_hash for row in rows)
+            after_id = rows[-1].id
+            if len(rows) < BUNDLE_SHARD_SIZE:
+                break
+
+    merkle_root = await asyncio.to_thread(merkle_summary, trackers)
+    return {
+        "short_name": short_name,
+        "format": MANIFEST_FORMAT,
+        "shard_size": BUNDLE_SHARD_SIZE,
+        "merkle_root": merkle_root,
+        "parts": parts,
+    }
+
+
+# Manifest builds in progress, one per election
+_manifest_locks = {}
+
+
+async def _manifest_key(session, short_name: str) -> tuple:
+    """
+    Returns (election id, cache key, ttl) of the manifest.
+    """
+
+    election = await crud.get_election_options_by_name(
+        session=session, short_name=short_name, options=[models.Election.id, models.Election.status]
+    )
+    if election is None:
+        raise HTTPException(status_code=404, detail="Election not found")
+
+    if election.status == ElectionStatusEnum.started:
+        return election.id, f"bundle:manifest:{election.id}:live", BUNDLE_MANIFEST_LIVE_TTL
+
+    watermark = await crud.get_election_watermark(session=session, election_id=election.id)
+    trustees = await crud.get_trustees_watermark(session=session, election_id=election.id)
+    tag = hashlib.sha1(repr((tuple(watermark), trustees)).encode()).hexdigest()
+    return election.id, f"bundle:manifest:{election.id}:{tag}", BUNDLE_MANIFEST_TTL
+
+
+async def get_manifest(session, short_name: str) -> dict:
+    election_id, key, ttl = await _manifest_key(session, short_name)
+    manifest = await cache.get(key)
+    if manifest is not None:
+        return manifest
+
+    async with _manifest_locks.setdefault(election_id, asyncio.Lock()):
+        return await cache.get_or_set(key, lambda: _build_manifest(session, short_name), ttl=ttl)
+
+
+async def get_shard(session, short_name: str, name: str) -> tuple:
+    """
+    Returns the content of a part of the cached manifest and its
+    SHA-256.
+    """
+
+    election_id, key, _ = await _manifest_key(session, short_name)
+    manifest = await cache.get(key)
+    if manifest is None:
+        raise HTTPException(status_code=409, detail="The bundle changed, fetch the manifest again")
+
+    entry = next((p for p in manifest["parts"] if p["name"] == name), None)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Part not found: {name}")
+
+    if name in HEADER_PARTS:
+        election = await crud.get_bundle_election_by_short_name(session=session, short_name=short_name)
+        content = encode_part(await _header_part(session, election, name))
+    else:
+        kind = name.rsplit("-", 1)[0]
+        _, content = await _shard_content(session, election_id, kind, entry["first_id"] - 1, up_to_id=entry["last_id"])
+
+    if hashlib.sha256(content).hexdigest() != entry["sha256"]:
+        raise HTTPException(status_code=409, detail="The bundle changed, fetch the manifest again")
+    return content, entry["sha256"]
@@ -0,0 +1,142 @@
+"""
+Background refresher of hot election snapshots for Psifos.
+
+While an election is started its public dashboard (stats,
+weight histograms, check-status and questions) is requested
+constantly. A background task of every worker keeps a
+precomputed snapshot of those views for the started elections
+and the routes read it instead of running the queries.
+
+Every view has its own refresh interval, jittered so that
+the workers do not hit the database at the same time.
+
+19-10-2026
+"""
+
+import asyncio
+import random
+import time
+
+from app.config import SNAPSHOT_FAST_INTERVAL, SNAPSHOT_SLOW_INTERVAL, SNAPSHOT_JITTER, STATEMENT_TIMEOUT_BACKGROUND
+from app.database import db_handler
+from app.database.handler import statement_timeout
+from app.logger import logger
+from app.psifos import stats
+from app.psifos.listing import invalidate_election_index, observe_election_status
+from app.psifos.model import crud
+from app.psifos.model.enums import ElectionStatusEnum
+
+# view name -> (computation, refresh interval in seconds)
+DASHBOARD_VIEWS = {
+    "stats": (stats.election_stats, SNAPSHOT_FAST_INTERVAL),
+    "questions": (stats.election_questions, SNAPSHOT_SLOW_INTERVAL),
+    "voters_by_weight_init": (stats.voters_by_weight_init, SNAPSHOT_SLOW_INTERVAL),
+    "votes_by_weight_init": (stats.votes_by_weight_init, SNAPSHOT_FAST_INTERVAL),
+    "votes_by_weight_end": (stats.votes_by_weight_end, SNAPSHOT_FAST_INTERVAL),
+    "check_status": (stats.check_status, SNAPSHOT_SLOW_INTERVAL),
+}
+
+# Views that only change when the election watermark moves
+# (crud.get_election_watermark), check_status also depends on
+# the trustees steps so it is always recomputed.
+WATERMARKED_VIEWS = {"stats", "voters_by_weight_init", "votes_by_weight_init", "votes_by_weight_end"}
+
+
+class SnapshotRefresher(object):
+    """
+    Keeps the snapshots of the dashboard views of the started elections.
+    """
+
+    def __init__(self, views: dict, jitter: float) -> None:
+        self.views = views
+        self.jitter = jitter
+        self._snapshots = {}
+        self._due = {}
+        self._watermarks = {}
+        self._started = None
+        self._task = None
+
+    def get(self, short_name: str, view: str):
+        return self._snapshots.get(short_name, {}).get(view)
+
+    def set(self, short_name: str, view: str, data):
+        self._snapshots.setdefault(short_name, {})[view] = data
+
+    def _next_due(self, interval: float) -> float:
+        return time.monotonic() + interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    async def refresh(self, session):
+        """
+        Refreshes the views that are due and drops the snapshots
+        of the elections that are no longer started. When the set
+        of started elections or the status of one of them changes
+        the listing index is invalidated.
+        """
+
+        elections = await crud.get_elections_by_status(session=session, status=ElectionStatusEnum.started)
+        short_names = [e.short_name for e in elections]
+        if self._started is not None and self._started != set(short_names):
+            await invalidate_election_index()
+        self._started = set(short_names)
+        for short_name in set(self._snapshots) - set(short_names):
+            self._snapshots.pop(short_name, None)
+            self._due.pop(short_name, None)
+            self._watermarks.pop(short_name, None)
+
+        now = time.monotonic()
+        for election in elections:
+            await observe_election_status(election.id, ElectionStatusEnum.started)
+            short_name = election.short_name
+            due = self._due.setdefault(short_name, {})
+            watermarks = self._watermarks.setdefault(short_name, {})
+            watermark = await crud.get_election_watermark(session=session, election_id=election.id)
+            for view, (compute, interval) in self.views.items():
+                if due.get(view, 0) > now:
+                    continue
+                unchanged = watermark is not None and watermarks.get(view) == watermark
+                if not (unchanged and view in WATERMARKED_VIEWS and self.get(short_name, view) is not None):
+                    self.set(short_name, view, await compute(session, short_name))
+                    # The watermark the view was computed at
+                    watermarks[view] = watermark
+                due[view] = self._next_due(interval)
+
+    async def _run(self):
+        statement_timeout.set(STATEMENT_TIMEOUT_BACKGROUND)
+        tick = min(interval for _, interval in self.views.values())
+        while True:
+            try:
+                await db_handler.func_with_session(self.refresh)()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"election snapshot refresh failed: {e}")
+            await asyncio.sleep(tick * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+election_snapshots = SnapshotRefresher(DASHBOARD_VIEWS, SNAPSHOT_JITTER)
+
+
+async def get_dashboard_view(session, short_name: str, view: str):
+    """
+    Returns the snapshot of a dashboard view, or computes it
+    if the election has none (e.g. it is not started).
+    """
+
+    data = election_snapshots.get(short_name, view)
+    if data is None:
+        compute, _ = DASHBOARD_VIEWS[view]
+        data = await compute(session, short_name)
+    return data
@@ -0,0 +1,168 @@
+"""
+Public dashboard computations for Psifos.
+
+These are shared by the routes and by the background
+snapshot refresher (app.psifos.snapshots), every function
+returns JSON serializable data.
+
+19-10-2026
+"""
+
+from fastapi.encoders import jsonable_encoder
+
+from app.psifos.listing import observe_election_status
+from app.psifos.model import crud, models, schemas
+from app.psifos.model.enums import TrusteeStepEnum, ElectionStatusEnum, ElectionLoginTypeEnum
+
+
+def _weights_histogram(rows, max_weight: int, weight_index: int):
+    """
+    Counts the voters by normalized weight, in total and by group.
+    rows are (group, weight..., total_voters) tuples.
+    """
+
+    by_weight = {}
+    by_group = {}
+    for row in rows:
+        group, total_voters = row[0], row[-1]
+        weight = row[weight_index] / max_weight
+        by_weight[weight] = by_weight.get(weight, 0) + total_voters
+        group_weights = by_group.setdefault(group, {})
+        group_weights[str(weight)] = group_weights.get(str(weight), 0) + total_voters
+
+    grouped = [{"group": group, "weights": weights} for group, weights in by_group.items()]
+    return by_weight, grouped
+
+
+async def election_stats(session, short_name: str):
+    query_options = [
+        models.Election.id,
+        models.Election.status,
+        models.Election.short_name
+    ]
+
+    election = await crud.get_election_options_by_name(session=session, short_name=short_name, options=query_options)
+    await observe_election_status(election.id, election.status)
+    total_voters = await crud.get_total_voters_by_election_id(session=session, election_id=election.id)
+    return {
+        "num_casted_votes": await crud.get_num_casted_votes(
+            session=session,
+            election_id=election.id
+        ),
+        "total_voters": total_voters,
+        "status": election.status,
+        "name": election.short_name
+    }
+
+
+async def elections_stats(session, short_names: list):
+    """
+    Stats of several elections with one grouped query per
+    metric, keyed by short name (unknown elections are left out).
+    """
+
+    elections = await crud.get_elections_by_short_names(session=session, short_names=short_names)
+    for e in elections:
+        await observe_election_status(e.id, e.status)
+    election_ids = [e.id for e in elections]
+    total_voters = await crud.get_total_voters_by_election_ids(session=session, election_ids=election_ids) if election_ids else {}
+    casted_votes = await crud.get_num_casted_votes_by_election_ids(session=session, election_ids=election_ids) if election_ids else {}
+    return {
+        e.short_name: {
+            "num_casted_votes": casted_votes.get(e.id, 0),
+            "total_voters": total_voters.get(e.id, 0),
+            "status": e.status,
+            "name": e.short_name
+        }
+        for e in elections
+    }
+
+
+async def election_questions(session, short_name: str):
+    election_params = [models.Election.id]
+    election = await crud.get_election_options_by_name(session=session, short_name=short_name, options=election_params)
+    questions = await crud.get_questions_by_election_id(session=session, election_id=election.id)
+    return {
+        "questions": jsonable_encoder([schemas.QuestionBase.from_orm(q) for q in questions])
+    }
+
+
+async def voters_by_weight_init(session, short_name: str):
+    election_params = [
+        models.Election.id,
+        models.Election.max_weight
+    ]
+
+    election = await crud.get_election_options_by_name(session=session, short_name=short_name, options=election_params)
+    voters = await crud.get_voters_by_group_and_weight_initial(session=session, election_id=election.id)
+    by_weight, grouped = _weights_histogram(voters, election.max_weight, 1)
+
+    return {
+        "voters_by_weight_init": by_weight,
+        "voters_by_weight_init_grouped": grouped
+    }
+
+
+async def votes_by_weight_init(session, short_name: str):
+    election_params = [
+        models.Election.id,
+        models.Election.max_weight
+    ]
+
+    election = await crud.get_election_options_by_name(session=session, short_name=short_name, options=election_params)
+    voters = await crud.get_voters_by_group_and_weight_valid(session=session, election_id=election.id)
+    by_weight, grouped = _weights_histogram(voters, election.max_weight, 1)
+
+    return {
+        "votes_by_weight": by_weight,
+        "votes_by_weight_grouped": grouped
+    }
+
+
+async def votes_by_weight_end(session, short_name: str):
+    election_params = [
+        models.Election.id,
+        models.Election.max_weight
+    ]
+
+    election = await crud.get_election_options_by_name(session=session, short_name=short_name, options=election_params)
+    voters = await crud.get_voters_by_group_and_weight_valid(session=session, election_id=election.id)
+    by_weight, grouped = _weights_histogram(voters, election.max_weight, 2)
+
+    return {
+        "votes_by_weight_end": by_weight,
+        "votes_by_weight_end_grouped": grouped
+    }
+
+
+async def check_status(session, short_name: str):
+    election = await crud.get_election_by_short_name(session=session, short_name=short_name, simple=True)
+    total_voters = await crud.get_total_voters_by_election_id(session=session, election_id=election.id)
+
+    trustee_params = [models.TrusteeCrypto.id, models.TrusteeCrypto.current_step]
+    trustees = await crud.get_trustee_crypto_params_by_election_id(session=session, election_id=election.id, params=trustee_params)
+
+    questions_params = [models.AbstractQuestion.id]
+    questions = await crud.get_questions_params_by_election_id(session=session, election_id=election.id, params=questions_params)
+
+    waiting_decryptions = filter(lambda t: t.current_step == TrusteeStepEnum.waiting_decryptions, trustees)
+    decryptions_uploaded = filter(lambda t: t.current_step == TrusteeStepEnum.decryptions_sent, trustees)
+
+    can_combine_decryptions = election.status == ElectionStatusEnum.decryptions_uploaded or (election.status == ElectionStatusEnum.tally_computed and len(list(decryptions_uploaded)) >= len(trustees) // 2 + 1)
+    opening_ready = len(list(waiting_decryptions)) == len(trustees) and election.status == ElectionStatusEnum.ready_key_generation
+
+    total_trustees = len(trustees)
+    add_questions = len(questions) == 0 and election.status == ElectionStatusEnum.setting_up
+    add_voters = total_voters == 0 and election.voters_login_type == ElectionLoginTypeEnum.close_p and election.status == ElectionStatusEnum.setting_up
+    add_trustees = len(trustees) == 0 and election.status == ElectionStatusEnum.setting_up
+
+    key_generation_ready = election.status == ElectionStatusEnum.setting_up and (total_voters > 0 or election.voters_login_type != ElectionLoginTypeEnum.close_p) and total_trustees > 0 and not add_questions
+
+    return {
+        "add_voters": add_voters,
+        "add_trustees": add_trustees,
+        "add_questions": add_questions,
+        "opening_ready": opening_ready,
+        "can_combine_decryptions": can_combine_decryptions,
+        "key_generation_ready": key_generation_ready,
+    }
@@ -0,0 +1,91 @@
+"""
+Incremental ballot box sync for Psifos.
+
+Mirrors of the ballot box keep a cursor and only ask for what
+changed since it:
+
+    - the cast votes after the last CastVote.id they have,
+      read with an index seek (id > :last_id ORDER BY id),
+    - once they are caught up, the rows they already have that
+      were cast again (a voter that votes again replaces its
+      row, moving cast_at) and, if it changed, the set of invalid
+      cast votes (is_valid has no timestamp, so the cursor keeps
+      a digest of that set instead).
+
+The cast_at watermark is compared with >= so that no vote cast
+in the same instant is lost, the votes cast at the watermark are
+delivered again and mirrors apply them idempotently (by id).
+
+The cursor is opaque to the client (app.psifos.pagination).
+
+19-10-2026
+"""
+
+import datetime
+import hashlib
+
+from fastapi import HTTPException
+
+from app.psifos.pagination import encode_cursor, decode_cursor
+from app.psifos.model import crud
+
+
+def _validity_digest(invalid_ids: list) -> str:
+    return hashlib.sha256(",".join(map(str, invalid_ids)).encode()).hexdigest()[:16]
+
+
+def parse_sync_cursor(token: str | None) -> tuple:
+    """
+    (last id, cast_at watermark, validity digest) of a sync cursor,
+    (0, None, None) for the first sync.
+    """
+
+    if not token:
+        return 0, None, None
+
+    values = decode_cursor(token)
+    if len(values) != 3 or not isinstance(values[0], int):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    try:
+        since = datetime.datetime.fromisoformat(values[1]) if values[1] else None
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from e
+    return values[0], since, values[2]
+
+
+async def ballot_box_changes(session, election_id: int, token: str | None, page_size: int, include_ballot: bool = True) -> dict:
+    last_id, since, digest = parse_sync_cursor(token)
+    if not token:
+        # Votes cast again while the first sync is paging are
+        # caught by the cast_at watermark taken before it starts
+        since = await crud.get_last_cast_at(session=session, election_id=election_id)
+
+    votes = await crud.get_cast_votes_after_id(
+        session=session, election_id=election_id, after_id=last_id, limit=page_size, include_ballot=include_ballot
+    )
+    has_more = len(votes) == page_size
+    next_id = votes[-1].id if votes else last_id
+
+    recast = []
+    invalid_ids = None
+    if not has_more:
+        if since is not None and last_id:
+            recast = await crud.get_recast_votes(
+                session=session, election_id=election_id, up_to_id=last_id, since=since, include_ballot=include_ballot
+            )
+
+        current_invalid = await crud.get_invalid_cast_vote_ids(session=session, election_id=election_id, up_to_id=next_id)
+        if _validity_digest(current_invalid) != digest:
+            invalid_ids = current_invalid
+        digest = _validity_digest(current_invalid)
+
+        since = max([since] + [v.cast_at for v in votes + recast], key=lambda at: at or datetime.datetime.min)
+
+    cursor = encode_cursor((next_id, since.isoformat() if since else None, digest))
+    return {
+        "votes": [dict(v._mapping) for v in votes],
+        "recast": [dict(v._mapping) for v in recast],
+        "invalid_ids": invalid_ids,
+        "cursor": cursor,
+        "has_more": has_more,
+    }
@@ -0,0 +1,101 @@
+"""
+Public encrypted tallies for Psifos.
+
+An encrypted tally (Tally.encrypted_tally) is a LONGTEXT per
+question and group. It is streamed to the client in chunks of
+TALLY_CHUNK_SIZE characters read with SUBSTRING, so it is never
+materialized whole in the worker.
+
+Once the tally is computed it does not change: the listing is
+cached for TALLY_CACHE_TTL seconds and the tallies are served
+as immutable HTTP responses.
+
+19-10-2026
+"""
+
+from fastapi import HTTPException
+
+from app.config import TALLY_CHUNK_SIZE, TALLY_CACHE_TTL
+from app.database import db_handler
+from app.psifos.cache import cache
+from app.psifos.listing import observe_election_status
+from app.psifos.model import crud, models
+from app.psifos.model.enums import ElectionStatusEnum
+
+# Statuses in which the tallies are final
+TALLY_FINAL_STATUSES = {
+    ElectionStatusEnum.tally_computed,
+    ElectionStatusEnum.decryptions_uploaded,
+    ElectionStatusEnum.decryptions_combined,
+    ElectionStatusEnum.results_released,
+}
+
+IMMUTABLE_CACHE_CONTROL = f"public, max-age={TALLY_CACHE_TTL}, immutable"
+
+
+async def get_tally_election(session, short_name: str):
+    """
+    Returns the election id and whether its tallies are final.
+    """
+
+    election = await crud.get_election_options_by_name(
+        session=session,
+        short_name=short_name,
+        options=[models.Election.id, models.Election.status]
+    )
+    if election is None:
+        raise HTTPException(status_code=404, detail="Election not found")
+    await observe_election_status(election.id, election.status)
+    return election.id, election.status in TALLY_FINAL_STATUSES
+
+
+async def _list_tallies(session, election_id: int, page: int, page_size: int):
+    groups = await crud.get_tally_groups_by_election_id(session=session, election_id=election_id)
+    page_groups = groups[page * page_size:(page + 1) * page_size]
+    tallies = await crud.get_tallies_by_election_id(session=session, election_id=election_id, groups=page_groups) if page_groups else []
+    return {
+        "total_groups": len(groups),
+        "groups": page_groups,
+        "tallies": [dict(t._mapping) for t in tallies],
+    }
+
+
+async def list_tallies(session, election_id: int, final: bool, page: int, page_size: int):
+    """
+    Tallies (without their content) of a page of groups.
+    """
+
+    if not final:
+        return await _list_tallies(session, election_id, page, page_size)
+
+    return await cache.get_or_set(
+        f"tallies:{election_id}:{page}:{page_size}",
+        lambda: _list_tallies(session, election_id, page, page_size),
+        ttl=TALLY_CACHE_TTL
+    )
+
+
+async def get_tally(session, election_id: int, question_index: int, group: str):
+    tallies = await crud.get_tallies_by_election_id(
+        session=session,
+        election_id=election_id,
+        groups=[group],
+        question_index=question_index
+    )
+    if not tallies:
+        raise HTTPException(status_code=404, detail="Tally not found")
+    return tallies[0]
+
+
+async def tally_chunks(tally_id: int, size: int, chunk_size: int = TALLY_CHUNK_SIZE):
+    """
+    Streams an encrypted tally in chunks, every chunk is read
+    with its own pooled session so that the stream can outlive
+    the request.
+    """
+
+    for start in range(1, size + 1, chunk_size):
+        chunk = await db_handler.func_with_session(crud.get_tally_chunk)(tally_id, start, chunk_size)
+        if not chunk:
+            break
+        yield chunk
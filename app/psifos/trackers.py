@@ -0,0 +1,76 @@
+"""
+Ballot tracker (vote hash) lookups for Psifos.
+
+While an election is open voters check their trackers all the
+time, so every worker keeps the set of hashes of the started
+elections in memory and only asks the database for the hashes
+it does not know yet (e.g. votes cast after the last refresh).
+
+19-10-2026
+"""
+
+import asyncio
+import time
+
+from app.config import TRACKER_SET_TTL
+from app.psifos.model import crud
+from app.psifos.model.enums import ElectionStatusEnum
+
+
+class TrackerSet(object):
+    """
+    In-memory set of the ballot trackers of the active elections,
+    reloaded from the database every ttl seconds.
+    """
+
+    def __init__(self, ttl: int) -> None:
+        self.ttl = ttl
+        self._hashes = {}
+        self._locks = {}
+
+    def _fresh(self, election_id: int):
+        entry = self._hashes.get(election_id)
+        if entry and time.monotonic() - entry[0] < self.ttl:
+            return entry[1]
+        return None
+
+    async def get(self, session, election_id: int) -> set:
+        hashes = self._fresh(election_id)
+        if hashes is not None:
+            return hashes
+
+        lock = self._locks.setdefault(election_id, asyncio.Lock())
+        async with lock:
+            hashes = self._fresh(election_id)
+            if hashes is None:
+                hashes = set(await crud.get_cast_vote_hashes_by_election_id(session=session, election_id=election_id))
+                self._hashes[election_id] = (time.monotonic(), hashes)
+        return hashes
+
+    def discard(self, election_id: int):
+        self._hashes.pop(election_id, None)
+        self._locks.pop(election_id, None)
+
+
+tracker_set = TrackerSet(TRACKER_SET_TTL)
+
+
+async def verify_trackers(session, election_id: int, status: str, hashes: list) -> set:
+    """
+    Returns the subset of hashes that belong to cast votes of the
+    election, with at most one IN (...) query for the unknown ones.
+    """
+
+    pending = list(dict.fromkeys(hashes))
+    found = set()
+
+    if status == ElectionStatusEnum.started:
+        active_hashes = await tracker_set.get(session, election_id)
+        found = {h for h in pending if h in active_hashes}
+        pending = [h for h in pending if h not in active_hashes]
+    else:
+        tracker_set.discard(election_id)
+
+    if pending:
+        found.update(await crud.get_cast_vote_hashes_by_election_id(session=session, election_id=election_id, hashes=pending))
+    return found
@@ -0,0 +1,95 @@
+"""
+Trustee overview of a Psifos election.
+
+Every trustee of the election with its step progress, public
+key hash and decryption presence, built with a constant number
+of queries whatever the number of trustees: the trustees with
+their TrusteeCrypto and one grouped count per decryption table.
+With include_crypto the public keys, certificates, coefficients,
+acknowledgements and decryptions are added (three more queries).
+
+19-10-2026
+"""
+
+from fastapi.encoders import jsonable_encoder
+
+from app.psifos.model import crud, models, schemas
+from app.psifos.model.enums import TrusteeStepEnum
+from app.psifos.utils import from_json
+
+DECRYPTION_MODELS = {
+    "homomorphic": models.HomomorphicDecryption,
+    "mixnet": models.MixnetDecryption,
+}
+
+LAST_STEP = max(TrusteeStepEnum)
+
+
+async def trustees_overview(session, election_id: int, include_crypto: bool = False) -> dict:
+    rows = await crud.get_trustee_overview_rows(session=session, election_id=election_id, include_crypto=include_crypto)
+    crypto_ids = [row.trustee_crypto_id for row in rows]
+
+    counts = {}
+    decryptions = {}
+    for kind, decryption_model in DECRYPTION_MODELS.items():
+        if not crypto_ids:
+            break
+        counts[kind] = await crud.count_decryptions_by_trustee_crypto_ids(
+            session=session, decryption_model=decryption_model, trustee_crypto_ids=crypto_ids
+        )
+        if include_crypto:
+            for d in await crud.get_decryptions_by_trustee_crypto_ids(
+                session=session, decryption_model=decryption_model, trustee_crypto_ids=crypto_ids
+            ):
+                decryptions.setdefault(d.trustee_crypto_id, []).append({
+                    "type": kind,
+                    "question_id": d.question_id,
+                    "group": d.group,
+                    "decryption_factors": from_json(d.decryption_factors),
+                    "decryption_proofs": from_json(d.decryption_proofs),
+                })
+
+    public_keys = {}
+    public_key_ids = [row.public_key_id for row in rows if row.public_key_id is not None]
+    if include_crypto and public_key_ids:
+        for public_key in await crud.get_public_keys_by_ids(session=session, public_key_ids=public_key_ids):
+            public_keys[public_key.id] = jsonable_encoder(schemas.PublicKeyBase.from_orm(public_key))
+
+    trustees = []
+    for row in rows:
+        step = TrusteeStepEnum(row.current_step or 0)
+        decryption_counts = {kind: counts.get(kind, {}).get(row.trustee_crypto_id, 0) for kind in DECRYPTION_MODELS}
+        trustee = {
+            "trustee_id": row.trustee_id,
+            "trustee_election_id": row.trustee_election_id,
+            "name": row.name,
+            "username": row.username,
+            "current_step": step.value,
+            "step_name": step.name,
+            "last_step": LAST_STEP.value,
+            "key_generation_done": step >= TrusteeStepEnum.waiting_decryptions,
+            "has_public_key": row.public_key_id is not None,
+            "public_key_hash": row.public_key_hash,
+            "decryptions": decryption_counts,
+            "has_decryptions": any(decryption_counts.values()),
+        }
+        if include_crypto:
+            trustee.update({
+                "public_key": public_keys.get(row.public_key_id),
+                "certificate": from_json(row.certificate),
+                "coefficients": from_json(row.coefficients),
+                "acknowledgements": from_json(row.acknowledgements),
+                "decryptions_data": decryptions.get(row.trustee_crypto_id, []),
+            })
+        trustees.append(trustee)
+
+    by_step = {}
+    for trustee in trustees:
+        by_step[trustee["step_name"]] = by_step.get(trustee["step_name"], 0) + 1
+
+    return {
+        "total_trustees": len(trustees),
+        "by_step": by_step,
+        "with_decryptions": sum(1 for t in trustees if t["has_decryptions"]),
+        "trustees": trustees,
+    }
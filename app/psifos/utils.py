@@ -4,7 +4,9 @@ Utilities for Psifos.
 08-04-2022
 """
 
+import hashlib
 import json
+import time
 
 import pydantic
 import pytz
@@ -12,17 +14,20 @@ import pytz
 from app.psifos.model.enums import ElectionLoginTypeEnum
 
 from datetime import datetime
-from app.config import TIMEZONE, REDIS_URL
+from app.config import TIMEZONE, COUNT_CACHE_TTL, STALE_CACHE_MAXSIZE, STALE_CACHE_REFRESH
+from app.database.circuit_breaker import CircuitOpenError
+from app.psifos.cache import cache, stale_cache, LRUCache
+from app.psifos import encoding
+from app.psifos.pagination import NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER
 from functools import reduce, wraps
-from aiocache import Cache, AIOCACHE_CACHES
-from fastapi import HTTPException
-from app.psifos.model import schemas
+from fastapi import HTTPException, Response
+from fastapi.responses import JSONResponse
 from fastapi.encoders import jsonable_encoder
+from sqlalchemy import inspect, exc
 
 from pyinstrument import Profiler
 from pyinstrument.renderers.html import HTMLRenderer
 from pyinstrument.renderers.speedscope import SpeedscopeRenderer
-from functools import wraps
 
 
 # -- JSON manipulation --
@@ -88,18 +93,118 @@ def tz_now():
 
 def paginate(data_json: dict):
     """
-    Handles pagination
-    
+    Handles pagination, returns the page number and the
+    (capped) page size, the offset is computed by the crud layer.
+
     """
 
+    data_json = data_json or {}
     page = data_json.get("page", 0)
 
     page_size = data_json.get("page_size", 500)
     page_size = page_size if page_size <= 50 else 50
-    page = page_size * page
 
     return page, page_size
 
+# -- Sparse fieldsets --
+
+
+def _nested_schema(schema, name: str):
+    """
+    Schema of the values of a field (of its items for a list),
+    None if the field is untyped.
+    """
+
+    field = schema.__fields__.get(name)
+    nested = field.type_ if field is not None else None
+    return nested if isinstance(nested, type) and issubclass(nested, pydantic.BaseModel) else None
+
+
+def parse_fields(raw_fields, schema, model):
+    """
+    Parses a sparse fieldset selector into a nested dict of
+    attribute names, e.g. "username,cast_vote.encrypted_ballot_hash"
+    -> {"username": {}, "cast_vote": {"encrypted_ballot_hash": {}}}
+
+    raw_fields can be a comma separated string or a list. Names
+    must belong to the response schema, nested names to the schema
+    of the field (or, if it is untyped, be columns of the related
+    model).
+    """
+
+    if not raw_fields:
+        return {}
+
+    if isinstance(raw_fields, str):
+        raw_fields = raw_fields.split(",")
+
+    mapper = inspect(model)
+    fields = {}
+    for path in raw_fields:
+        names = [name.strip() for name in str(path).split(".") if name.strip()]
+        if not names:
+            continue
+
+        valid_path = names[0] in schema.__fields__
+        if valid_path and len(names) > 1:
+            relationship = mapper.relationships[names[0]] if names[0] in mapper.relationships else None
+            nested_schema = _nested_schema(schema, names[0])
+            valid_path = len(names) == 2 and relationship is not None and (
+                names[1] in nested_schema.__fields__ if nested_schema is not None else names[1] in relationship.mapper.column_attrs
+            )
+        if not valid_path:
+            raise HTTPException(status_code=400, detail=f"Unknown field: {path}")
+
+        node = fields
+        for name in names:
+            node = node.setdefault(name, {})
+
+    return fields
+
+
+def serialize_fields(instance, fields: dict, schema=None):
+    """
+    Serializes only the selected fields of an ORM instance,
+    values are validated against the schema fields.
+    """
+
+    serialized = {}
+    for name, sub_fields in fields.items():
+        value = getattr(instance, name, None)
+        if sub_fields and value is not None:
+            nested = _nested_schema(schema, name) if schema is not None else None
+            value = [serialize_fields(v, sub_fields, nested) for v in value] if isinstance(value, list) else serialize_fields(value, sub_fields, nested)
+        elif schema is not None:
+            value, _ = schema.__fields__[name].validate(value, {}, loc=name)
+        serialized[name] = value
+
+    return jsonable_encoder(serialized)
+
+
+def sparse_response(instances, fields: dict, schema):
+    """
+    Returns a JSONResponse with the sparse serialization of one
+    instance or a list of them, bypassing the route response_model.
+    """
+
+    if isinstance(instances, list):
+        return JSONResponse(content=[serialize_fields(i, fields, schema) for i in instances])
+    return JSONResponse(content=serialize_fields(instances, fields, schema))
+
+
+def msgpack_response(content):
+    """
+    Returns the MessagePack (app.psifos.encoding) of the JSON
+    serialization of content, bypassing the route response_model.
+    """
+
+    return Response(
+        content=encoding.packb(jsonable_encoder(content)),
+        media_type=encoding.MSGPACK_MEDIA_TYPE,
+        headers={"Vary": "Accept"}
+    )
+
+
 def profile_route(profile_format: str = "html"):
     """Decorador para perfilar rutas específicas."""
     def decorator(func):
@@ -128,45 +233,88 @@ def profile_route(profile_format: str = "html"):
 
     return decorator
 
-## -- Handle cache --
-# Example for caching election route
-def cache_election_response(ttl: int = 60, namespace: str = "main"):
+## -- Watermarks --
+
+
+def watermark_tag(watermark) -> str | None:
+    """
+    Turns an election watermark (crud.get_election_watermark)
+    into a short opaque tag, usable e.g. as an ETag.
+    """
+
+    if watermark is None:
+        return None
+    raw = "|".join(str(value) for value in watermark)
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+## -- Cached counts --
+
+
+async def cached_count(key: str, count, ttl: int = COUNT_CACHE_TTL):
+    """
+    Returns the cached value of an expensive COUNT query,
+    count is an awaitable factory only called on a miss.
+    """
+
+    return await cache.get_or_set(f"count:{key}", count, ttl=ttl)
+
+
+## -- Stale responses --
+
+STALE_HEADER = "X-Psifos-Stale"
+
+# Headers of the stored responses replayed with their stale copy
+STALE_REPLAYED_HEADERS = (TOTAL_COUNT_HEADER, NEXT_CURSOR_HEADER)
+
+# Keys stored less than STALE_CACHE_REFRESH seconds ago
+_stale_stored = LRUCache(STALE_CACHE_MAXSIZE, STALE_CACHE_REFRESH)
+
+
+def serve_stale(namespace: str, schema=None):
     """
-    Caching decorator for FastAPI endpoints.
+    Keeps the last good response of a public read route and
+    serves it, flagged as stale, when the database fails or
+    its circuit is open. Without a stored copy it answers 503.
 
-    ttl: Time to live for the cache in seconds.
-    namespace: Namespace for cache keys in Redis.
+    namespace: Namespace for cache keys.
+    schema: Pydantic schema of ORM responses (response_model).
     """
     def decorator(func):
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            element_id = kwargs.get('short_name')  # Assuming the element ID is the first argument 
-            cache_key = f"{namespace}:{element_id}"
-
-            # cache = Cache.REDIS(endpoint="redis", port=6379, namespace=namespace)
-            cache = Cache.from_url(REDIS_URL)
-
-            # Try to retrieve data from cache
-            cached_value = await cache.get(cache_key)
-            if cached_value:
-                return cached_value  # Return cached data
-
-            # Call the actual function if cache is not hit
-            response = await func(*args, **kwargs)
-            response_serialized = jsonable_encoder(response)
-            print(response_serialized)
-            response_serialized["public_key"]["p"] = response_serialized["public_key"]["_p"]
-            response_serialized["public_key"]["y"] = response_serialized["public_key"]["_y"]
-            response_serialized["public_key"]["g"] = response_serialized["public_key"]["_g"]
-            response_serialized["public_key"]["q"] = response_serialized["public_key"]["_q"]
-            response_as_schema = schemas.ElectionOut.parse_obj(response_serialized).json()
-            
-            try:
-                # Store the response in Redis with a TTL
-                await cache.set(cache_key, json.loads(response_as_schema), ttl=ttl)
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=f"Error caching data: {e}")
+            params = {k: v for k, v in kwargs.items() if k not in ("session", "response")}
+            cache_key = f"stale:{namespace}:{to_json(jsonable_encoder(params))}"
 
+            try:
+                response = await func(*args, **kwargs)
+            except (CircuitOpenError, exc.OperationalError, exc.TimeoutError) as e:
+                stored = await stale_cache.get(cache_key)
+                retry_after = getattr(e, "retry_after", STALE_CACHE_REFRESH)
+                if stored is None:
+                    raise HTTPException(status_code=503, detail="Service temporarily unavailable",
+                                        headers={"Retry-After": str(int(retry_after))})
+                age = int(time.time() - stored["stored_at"])
+                return JSONResponse(content=stored["content"], headers={
+                    **stored.get("headers", {}),
+                    STALE_HEADER: "true",
+                    "Age": str(age),
+                    "Warning": '110 - "Response is Stale"',
+                })
+
+            storable = isinstance(response, JSONResponse) or not isinstance(response, Response)
+            if storable and _stale_stored.get(cache_key) is None:
+                _stale_stored.set(cache_key, True)
+                content = response
+                # List routes set their pagination headers on the response
+                # they return or on the one FastAPI injects
+                headers = response.headers if isinstance(response, JSONResponse) else getattr(kwargs.get("response"), "headers", {})
+                headers = {name: headers[name] for name in STALE_REPLAYED_HEADERS if name in headers}
+                if isinstance(response, JSONResponse):
+                    content = json.loads(response.body)
+                elif schema is not None and response is not None:
+                    content = [schema.from_orm(r) for r in response] if isinstance(response, list) else schema.from_orm(response)
+                await stale_cache.set(cache_key, {"stored_at": time.time(), "content": content, "headers": headers})
             return response
         return wrapper
     return decorator
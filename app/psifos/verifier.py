@@ -0,0 +1,503 @@
+"""
+Bundle verifier for Psifos.
+
+Checks the bundle file of an election (/election/{short_name}/bundle-file):
+
+    - every vote_hash is the hash of the text of its encrypted
+      ballot (vote, the ballot text as it was cast),
+    - every trustee decryption proof is a valid Chaum-Pedersen
+      proof (Fiat-Shamir challenge) that the decryption factor
+      was computed with the trustee key:
+
+          g^t = A * y^c mod p    and    alpha^t = B * factor^c mod p
+
+      where alpha is the first component of the tally ciphertext.
+
+The tally ciphertexts are not part of the bundle: they are read
+from the tally routes of the election when the bundle is given by
+URL, or from a file (--tallies). A proof without its ciphertext
+can only be checked on the public key side, it is reported as
+partially checked and the bundle is not ok.
+
+The bundle is parsed incrementally, the votes are handed to a
+process pool in chunks as they are read so that the bundle is
+never held whole in memory. Every key is parsed into integers
+once per process (parse_public_key is cached) instead of
+converting the decimal strings on every use.
+
+Usage:
+
+    python -m app.psifos.verifier bundle.json --tallies tallies.json
+    python -m app.psifos.verifier https://.../election/{short_name}/bundle-file
+    curl ... | python -m app.psifos.verifier - --tallies tallies.json
+
+The tallies file is a JSON list of {"question_index", "group", "tally"}.
+
+It does not depend on the rest of the application.
+
+19-10-2026
+"""
+
+import argparse
+import base64
+import hashlib
+import io
+import json
+import os
+import sys
+import urllib.request
+
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from urllib.parse import quote
+
+ElGamalKey = namedtuple("ElGamalKey", ["p", "g", "q", "y"])
+
+DEFAULT_CHUNK_SIZE = 500
+
+# Vote chunks waiting for the pool, per worker
+MAX_PENDING_CHUNKS = 2
+
+TALLIES_PAGE_SIZE = 50
+
+
+# -- Parsing --
+
+
+def _key_value(raw: dict, name: str) -> str:
+    value = raw.get(name, raw.get(f"_{name}"))
+    if value is None:
+        raise ValueError(f"public key without {name}")
+    return str(value)
+
+
+def key_strings(raw: dict) -> tuple:
+    """
+    (p, g, q, y) decimal strings of a bundle public key, whose
+    attributes may be named p or _p (PublicKey columns).
+    """
+    return tuple(_key_value(raw, name) for name in ElGamalKey._fields)
+
+
+@lru_cache(maxsize=None)
+def parse_public_key(strings: tuple) -> ElGamalKey:
+    return ElGamalKey(*(int(value) for value in strings))
+
+
+def _from_json(value):
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def _leaves(value):
+    """
+    Items of a (possibly nested) list of values, lists of
+    objects may be stored as {"instances": [...]}.
+    """
+
+    if isinstance(value, dict) and "instances" in value:
+        value = value["instances"]
+    if isinstance(value, list):
+        for item in value:
+            yield from _leaves(item)
+    elif value is not None:
+        yield value
+
+
+class BundleReader(object):
+    """
+    Incremental reader of the bundle JSON object: the items of
+    its votes are handed one by one to a callback and every other
+    value is returned.
+    """
+
+    WHITESPACE = " \t\r\n"
+
+    def __init__(self, stream, read_size: int = 1 << 16) -> None:
+        self.stream = stream
+        self.read_size = read_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.position = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        # Reads at least as much as is buffered, so that a big
+        # value is decoded again a logarithmic number of times
+        if self.eof:
+            return False
+        pending = self.buffer[self.position:]
+        more = self.stream.read(max(self.read_size, len(pending)))
+        if not more:
+            self.eof = True
+            return False
+        self.buffer = pending + more
+        self.position = 0
+        return True
+
+    def _peek(self) -> str:
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in self.WHITESPACE:
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self._fill():
+                raise ValueError("unexpected end of the bundle")
+
+    def _expect(self, character: str):
+        if self._peek() != character:
+            raise ValueError(f"invalid bundle: expected {character!r} at {self.position}")
+        self.position += 1
+
+    def _value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A number at the end of the buffer may go on
+            if end == len(self.buffer) and self._fill():
+                continue
+            self.position = end
+            return value
+
+    def _items(self):
+        self._expect("[")
+        if self._peek() == "]":
+            self.position += 1
+            return
+        while True:
+            yield self._value()
+            if self._peek() == "]":
+                self.position += 1
+                return
+            self._expect(",")
+
+    def read(self, on_vote) -> dict:
+        header = {}
+        self._expect("{")
+        if self._peek() == "}":
+            return header
+        while True:
+            key = self._value()
+            self._expect(":")
+            if key == "votes":
+                for vote in self._items():
+                    on_vote(vote)
+            else:
+                header[key] = self._value()
+            if self._peek() == "}":
+                return header
+            self._expect(",")
+
+
+# -- Ballot hashes --
+
+
+def hash_b64(value: str) -> str:
+    """
+    Base64 SHA-256 of value without padding, the hash
+    of the encrypted ballots (encrypted_ballot_hash).
+    """
+    return base64.b64encode(hashlib.sha256(value.encode("utf-8")).digest()).decode().rstrip("=")
+
+
+def ballot_text(vote: dict) -> str | None:
+    """
+    The text the hash of a vote was computed on, None if the
+    bundle does not carry it (older bundles hold the parsed ballot).
+    """
+
+    text = vote.get("vote")
+    return text if isinstance(text, str) else None
+
+
+def verify_vote_chunk(votes: list) -> tuple:
+    """
+    Returns the hashes of the votes of the chunk that do not
+    match and the number of votes without their text.
+    """
+
+    mismatches = []
+    unchecked = 0
+    for vote in votes:
+        text = ballot_text(vote)
+        if text is None:
+            unchecked += 1
+        elif hash_b64(text) != vote.get("vote_hash"):
+            mismatches.append(vote.get("vote_hash"))
+    return mismatches, unchecked
+
+
+# -- Decryption proofs --
+
+
+def fiat_shamir_challenge(commitment: dict) -> int:
+    raw = f"{commitment['A']},{commitment['B']}"
+    return int(hashlib.sha1(raw.encode("utf-8")).hexdigest(), 16)
+
+
+def verify_proof(key: ElGamalKey, proof: dict, alpha: int = None, factor: int = None) -> bool:
+    """
+    Checks a decryption proof, on the public key side only if
+    the ciphertext (alpha) is not given.
+    """
+
+    commitment = proof["commitment"]
+    A, B = int(commitment["A"]), int(commitment["B"])
+    challenge, response = int(proof["challenge"]), int(proof["response"])
+
+    if not 0 < A < key.p or not 0 < B < key.p:
+        return False
+    if challenge != fiat_shamir_challenge(commitment):
+        return False
+    if pow(key.g, response, key.p) != (A * pow(key.y, challenge, key.p)) % key.p:
+        return False
+    if alpha is None:
+        return True
+    if not 0 < alpha < key.p or not 0 < factor < key.p:
+        return False
+    return pow(alpha, response, key.p) == (B * pow(factor, challenge, key.p)) % key.p
+
+
+def verify_proof_chunk(strings: tuple, items: list) -> list:
+    """
+    items are (reference, proof, alpha, factor) of one trustee
+    key (alpha and factor are None without the tally), returns
+    the references of the invalid proofs.
+    """
+
+    key = parse_public_key(strings)
+    invalid = []
+    for reference, proof, alpha, factor in items:
+        try:
+            valid = verify_proof(
+                key,
+                proof,
+                int(alpha) if alpha is not None else None,
+                int(factor) if factor is not None else None,
+            )
+        except (KeyError, TypeError, ValueError):
+            valid = False
+        if not valid:
+            invalid.append(reference)
+    return invalid
+
+
+def _question_indexes(election: dict) -> dict:
+    questions = _from_json((election or {}).get("questions")) or []
+    return {question.get("id"): question.get("index") for question in questions}
+
+
+def _proof_items(trustee: dict, question_indexes: dict, tallies: dict):
+    """
+    Yields (reference, proof, alpha, factor) for the proofs of a
+    trustee, and (reference, None, None, None) for the decryptions
+    that do not match their tally.
+    """
+
+    for decryption in trustee.get("decryptions") or []:
+        proofs = list(_leaves(_from_json(decryption.get("decryption_proofs"))))
+        factors = list(_leaves(_from_json(decryption.get("decryption_factors"))))
+        ciphertexts = tallies.get((question_indexes.get(decryption.get("question_id")), decryption.get("group")))
+
+        def reference(index):
+            return {
+                "trustee_id": trustee.get("trustee_id"),
+                "question_id": decryption.get("question_id"),
+                "group": decryption.get("group"),
+                "index": index,
+            }
+
+        if ciphertexts is not None and not len(proofs) == len(factors) == len(ciphertexts):
+            yield reference(None), None, None, None
+            continue
+
+        for index, proof in enumerate(proofs):
+            if ciphertexts is None:
+                yield reference(index), proof, None, None
+            else:
+                yield reference(index), proof, ciphertexts[index].get("alpha"), factors[index]
+
+
+# -- Tallies --
+
+
+def _get_json(url: str):
+    with urllib.request.urlopen(url) as response:
+        return json.load(response)
+
+
+def fetch_tallies(election_url: str) -> list:
+    """
+    Reads the encrypted tallies of an election from its tally
+    routes, election_url is .../election/{short_name}.
+    """
+
+    tallies = []
+    page = 0
+    while True:
+        listing = _get_json(f"{election_url}/tallies?page={page}&page_size={TALLIES_PAGE_SIZE}")
+        if not listing["groups"]:
+            return tallies
+        for tally in listing["tallies"]:
+            content = _get_json(f"{election_url}/tally/{tally['question_index']}?group={quote(tally['group'])}")
+            tallies.append({"question_index": tally["question_index"], "group": tally["group"], "tally": content})
+        page += 1
+
+
+def tally_ciphertexts(tallies: list) -> dict:
+    """
+    (question index, group) -> ciphertexts of a list of tallies.
+    """
+    return {(t["question_index"], t["group"]): list(_leaves(_from_json(t["tally"]))) for t in tallies}
+
+
+# -- Bundle --
+
+
+def _chunks(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def open_bundle(source: str):
+    """
+    Opens a bundle from a file, an URL or stdin ("-") as text.
+    """
+
+    if source == "-":
+        return io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8")
+    if source.startswith(("http://", "https://")):
+        return io.TextIOWrapper(urllib.request.urlopen(source), encoding="utf-8")
+    return open(source, encoding="utf-8")
+
+
+def load_bundle(source: str) -> dict:
+    """
+    Reads a whole bundle from a file, an URL or stdin ("-").
+    """
+
+    votes = []
+    with open_bundle(source) as stream:
+        bundle = BundleReader(stream).read(votes.append)
+    bundle["votes"] = votes
+    return bundle
+
+
+class _VoteChecks(object):
+    """
+    Hands the votes to the pool in chunks, with a bounded
+    number of chunks waiting for it.
+    """
+
+    def __init__(self, pool, chunk_size: int, max_pending: int) -> None:
+        self.pool = pool
+        self.chunk_size = chunk_size
+        self.max_pending = max_pending
+        self.chunk = []
+        self.pending = deque()
+        self.checked = 0
+        self.unchecked = 0
+        self.mismatches = []
+
+    def _collect(self, future):
+        mismatches, unchecked = future.result()
+        self.mismatches += mismatches
+        self.unchecked += unchecked
+
+    def _submit(self):
+        if self.chunk:
+            self.pending.append(self.pool.submit(verify_vote_chunk, self.chunk))
+            self.checked += len(self.chunk)
+            self.chunk = []
+        while len(self.pending) > self.max_pending:
+            self._collect(self.pending.popleft())
+
+    def add(self, vote: dict):
+        self.chunk.append(vote)
+        if len(self.chunk) >= self.chunk_size:
+            self._submit()
+
+    def finish(self):
+        self._submit()
+        while self.pending:
+            self._collect(self.pending.popleft())
+
+
+def _verify(read, tallies: list = None, workers: int = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> dict:
+    ciphertexts = tally_ciphertexts(tallies or [])
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        votes = _VoteChecks(pool, chunk_size, MAX_PENDING_CHUNKS * (workers or os.cpu_count() or 1))
+        header = read(votes.add)
+        votes.finish()
+
+        question_indexes = _question_indexes(header.get("election"))
+        proof_futures = []
+        invalid_proofs = []
+        num_proofs = 0
+        partial = 0
+        for trustee in header.get("trustees") or []:
+            if not trustee.get("public_key"):
+                continue
+            strings = key_strings(_from_json(trustee["public_key"]))
+            items = []
+            for item in _proof_items(trustee, question_indexes, ciphertexts):
+                if item[1] is None:
+                    invalid_proofs.append(item[0])
+                    continue
+                items.append(item)
+                partial += item[2] is None
+            num_proofs += len(items)
+            proof_futures += [pool.submit(verify_proof_chunk, strings, chunk) for chunk in _chunks(items, chunk_size)]
+
+        invalid_proofs += [r for future in proof_futures for r in future.result()]
+
+    return {
+        "votes": {"checked": votes.checked, "mismatches": votes.mismatches, "unchecked": votes.unchecked},
+        "decryption_proofs": {"checked": num_proofs, "invalid": invalid_proofs, "partially_checked": partial},
+        "ok": not votes.mismatches and not votes.unchecked and not invalid_proofs and not partial,
+    }
+
+
+def verify_bundle(bundle: dict, tallies: list = None, workers: int = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> dict:
+    def read(on_vote):
+        for vote in bundle.get("votes") or []:
+            on_vote(vote)
+        return bundle
+
+    return _verify(read, tallies, workers, chunk_size)
+
+
+def verify_source(source: str, tallies: list = None, workers: int = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> dict:
+    with open_bundle(source) as stream:
+        return _verify(BundleReader(stream).read, tallies, workers, chunk_size)
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Verifies a Psifos election bundle file.")
+    parser.add_argument("source", help="bundle file, URL of the bundle-file route or - for stdin")
+    parser.add_argument("--tallies", default=None, help="tallies file (default: the tally routes of a bundle URL)")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="votes or proofs per task")
+    args = parser.parse_args(argv)
+
+    tallies = None
+    if args.tallies is not None:
+        with open(args.tallies, encoding="utf-8") as tallies_file:
+            tallies = json.load(tallies_file)
+    elif args.source.startswith(("http://", "https://")) and args.source.rstrip("/").endswith("/bundle-file"):
+        tallies = fetch_tallies(args.source.rstrip("/")[:-len("/bundle-file")])
+
+    report = verify_source(args.source, tallies, workers=args.workers, chunk_size=args.chunk_size)
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""
+Shared fixtures: an application backed by a seeded SQLite database
+(sync engine, no Redis) and a helper to run coroutines.
+
+19-10-2026
+"""
+
+import asyncio
+import contextlib
+import datetime
+import json
+import os
+
+os.environ.setdefault("USE_ASYNC_ENGINE", "0")
+os.environ.setdefault("CACHE_L2_ENABLED", "0")
+os.environ.setdefault("SNAPSHOT_REFRESH_ENABLED", "0")
+
+import pytest
+import pytz
+
+from sqlalchemy import Column, Integer, Table, create_engine, event
+from sqlalchemy.dialects.mysql import LONGTEXT
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session, sessionmaker
+
+from app import database
+from app.config import TIMEZONE
+from app.database import Base
+from app.psifos.model import models
+
+
+@compiles(LONGTEXT, "sqlite")
+def compile_longtext(type_, compiler, **kw):
+    return "TEXT"
+
+
+# Elections reference the users of the admin application
+if "auth_user" not in Base.metadata.tables:
+    Table("auth_user", Base.metadata, Column("id", Integer, primary_key=True))
+
+SEED_VOTERS = 30
+SEED_CAST_AT = datetime.datetime(2024, 1, 1, 10, 0, 0)
+
+
+def add_mysql_functions(dbapi_connection, connection_record):
+    dbapi_connection.create_function("char_length", 1, lambda value: None if value is None else len(value))
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+@contextlib.contextmanager
+def recorded_statements(session_local):
+    """
+    Collects the SQL statements run on the engine of session_local.
+    """
+
+    statements = []
+    engine = session_local.kw["bind"]
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def seed(session: Session):
+    """
+    "started": SEED_VOTERS voters, every third one without a vote and
+    every fifth vote invalid, one trustee and one question.
+    "setting_up": no voters.
+    """
+
+    election = models.Election(
+        short_name="started", long_name="Started election", description="", normalized=False, type="election",
+        status="started", voters_login_type="close_p", max_weight=1,
+        public_key=models.PublicKey(_y="5", _p="23", _g="2", _q="11"),
+    )
+    session.add_all([election, models.Election(
+        short_name="setting_up", long_name="Setting up election", type="election",
+        status="setting_up", voters_login_type="close_p", max_weight=1,
+    )])
+    session.flush()
+
+    for i in range(SEED_VOTERS):
+        voter = models.Voter(
+            election_id=election.id, username=f"u{i}", name=f"Name {i}", username_election_id=f"u{i}_{election.id}",
+            weight_init=1, weight_end=1, group=f"g{i % 2}",
+        )
+        session.add(voter)
+        session.flush()
+        if i % 3:
+            session.add(models.CastVote(
+                voter_id=voter.id, encrypted_ballot=json.dumps({"answers": [i]}), encrypted_ballot_hash=f"hash{i}",
+                is_valid=bool(i % 5), cast_at=SEED_CAST_AT + datetime.timedelta(minutes=i),
+            ))
+
+    for i, log_event in enumerate(["voting_started", "voter_login", "trustee_created"]):
+        session.add(models.ElectionLog(
+            election_id=election.id, log_level="info", event=log_event, event_params="",
+            created_at=str(pytz.timezone(TIMEZONE).localize(SEED_CAST_AT + datetime.timedelta(minutes=i))),
+        ))
+
+    trustee = models.Trustee(name="Trustee", username="t1", email="t1@example.com")
+    session.add(trustee)
+    session.flush()
+    session.add(models.TrusteeCrypto(
+        election_id=election.id, trustee_id=trustee.id, trustee_election_id=1, current_step=5,
+        public_key_hash="pkh", certificate="{}", coefficients="[]", acknowledgements="[]",
+    ))
+    session.add(models.AbstractQuestion(
+        election_id=election.id, index=0, type="CLOSED", title="Question", formal_options=["a", "b"],
+        max_answers=1, min_answers=0,
+    ))
+    session.commit()
+
+
+@pytest.fixture
+def session_local(tmp_path, monkeypatch):
+    """
+    Seeded database, also used by the background sessions of
+    db_handler. In-process caches start empty.
+    """
+
+    from app.psifos import listing, merkle, trackers, utils
+    from app.psifos.cache import LRUCache, cache, stale_cache
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'psifos.db'}", connect_args={"check_same_thread": False})
+    event.listen(engine, "connect", add_mysql_functions)
+    Base.metadata.create_all(engine)
+    session_local = sessionmaker(bind=engine, class_=Session, expire_on_commit=False)
+    with session_local() as session:
+        seed(session)
+
+    monkeypatch.setattr(database.db_handler, "session_local", session_local)
+    monkeypatch.setattr(listing, "_election_statuses", {})
+    monkeypatch.setattr(merkle.merkle_trees, "_trees", LRUCache(merkle.MERKLE_MAX_TREES, merkle.TREE_IDLE_TTL))
+    monkeypatch.setattr(trackers.tracker_set, "_hashes", {})
+    monkeypatch.setattr(utils, "_stale_stored", LRUCache(utils.STALE_CACHE_MAXSIZE, utils.STALE_CACHE_REFRESH))
+    cache.l1.clear()
+    stale_cache.l1.clear()
+    yield session_local
+    engine.dispose()
+
+
+@pytest.fixture
+def session(session_local):
+    with session_local() as session:
+        yield session
+
+
+@pytest.fixture
+def client(session_local):
+    from fastapi.testclient import TestClient
+
+    from app.dependencies import get_session
+    from app.main import app
+
+    def override_session():
+        with session_local() as session:
+            yield session
+
+    app.dependency_overrides[get_session] = override_session
+    yield TestClient(app)
+    app.dependency_overrides.pop(get_session, None)
@@ -0,0 +1,53 @@
+import asyncio
+import gc
+
+from fastapi.responses import StreamingResponse
+
+from app.psifos import admission
+from app.psifos.admission import RouteClass, admission_control
+from tests.conftest import run
+
+
+def make_endpoint(monkeypatch) -> tuple:
+    route_class = RouteClass("test", 1, 0, 0.1, 1, 0)
+    monkeypatch.setitem(admission.ROUTE_CLASSES, "test", route_class)
+
+    @admission_control("test")
+    async def endpoint():
+        return StreamingResponse(iter([b"a", b"b"]))
+
+    return route_class, endpoint
+
+
+def test_sent_response_releases_once(monkeypatch):
+    route_class, endpoint = make_endpoint(monkeypatch)
+    sent = []
+
+    async def send_response():
+        async def receive():
+            await asyncio.Event().wait()
+
+        async def send(message):
+            sent.append(message)
+
+        response = await endpoint()
+        assert route_class._semaphore.locked()
+        await response({"type": "http"}, receive, send)
+
+    run(send_response())
+    gc.collect()
+    assert b"".join(message.get("body", b"") for message in sent) == b"ab"
+    assert route_class._semaphore._value == 1
+
+
+def test_dropped_response_releases(monkeypatch):
+    route_class, endpoint = make_endpoint(monkeypatch)
+
+    async def drop_response():
+        response = await endpoint()
+        assert route_class._semaphore.locked()
+        del response
+        gc.collect()
+
+    run(drop_response())
+    assert route_class._semaphore._value == 1
@@ -0,0 +1,21 @@
+from app.psifos import routes
+from tests.conftest import SEED_VOTERS
+
+
+def test_batch_matches_single_election_stats(client):
+    response = client.post("/get-elections-stats", json={"short_names": ["started", "setting_up", "missing", "started"]})
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats.keys() == {"started", "setting_up"}
+
+    assert stats["started"] == client.get("/get-election-stats/started").json()
+    assert stats["started"]["num_casted_votes"] == len([i for i in range(SEED_VOTERS) if i % 3 and i % 5])
+    assert stats["started"]["total_voters"] == SEED_VOTERS
+    assert stats["setting_up"]["num_casted_votes"] == stats["setting_up"]["total_voters"] == 0
+
+
+def test_batch_validation(client, monkeypatch):
+    assert client.post("/get-elections-stats", json={"short_names": "started"}).status_code == 400
+    assert client.post("/get-elections-stats", json={"short_names": [1]}).status_code == 400
+    monkeypatch.setattr(routes, "BATCH_STATS_MAX_ELECTIONS", 1)
+    assert client.post("/get-elections-stats", json={"short_names": ["started", "setting_up"]}).status_code == 400
@@ -0,0 +1,127 @@
+import asyncio
+
+import fakeredis
+import fakeredis.aioredis
+
+from app.psifos.cache import LRUCache, TwoTierCache
+
+
+def make_caches(count: int = 2) -> list:
+    server = fakeredis.FakeServer()
+    return [
+        TwoTierCache("redis://fake", "test:invalidate", 16, 60, 60, redis_client=fakeredis.aioredis.FakeRedis(server=server))
+        for _ in range(count)
+    ]
+
+
+def counter(calls: list, value):
+    async def compute():
+        calls.append(value)
+        return value
+    return compute
+
+
+def test_lru_eviction_and_ttl():
+    lru = LRUCache(2, 60)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    lru.get("a")
+    lru.set("c", 3)
+    assert lru.get("b") is None and lru.get("a") == 1 and lru.evictions == 1
+
+    lru.set("d", 4, ttl=-1)
+    assert lru.get("d") is None
+
+
+def test_l1_hit():
+    cache, = make_caches(1)
+    calls = []
+
+    async def run():
+        first = await cache.get_or_set("k", counter(calls, {"n": 1}))
+        second = await cache.get_or_set("k", counter(calls, {"n": 2}))
+        return first, second
+
+    assert asyncio.run(run()) == ({"n": 1}, {"n": 1})
+    assert calls == [{"n": 1}]
+    assert cache.counters["l1_hits"] == 1 and cache.counters["misses"] == 1
+
+
+def test_l2_fallback():
+    writer, reader = make_caches()
+    calls = []
+
+    async def run():
+        await writer.get_or_set("k", counter(calls, [1, 2]))
+        return await reader.get_or_set("k", counter(calls, [3]))
+
+    assert asyncio.run(run()) == [1, 2]
+    assert calls == [[1, 2]]
+    assert reader.counters["l2_hits"] == 1
+    # Promoted to L1
+    assert reader.l1.get("k") == "[1, 2]"
+
+
+def test_pubsub_invalidation():
+    writer, reader = make_caches()
+
+    async def run():
+        reader.start()
+        await writer.set("k", "old")
+        assert await reader.get("k") == "old"
+
+        await asyncio.sleep(0.05)
+        await writer.invalidate("k")
+        for _ in range(50):
+            if reader.l1.get("k") is None:
+                break
+            await asyncio.sleep(0.02)
+        value = await reader.get("k")
+        await reader.stop()
+        return value
+
+    assert asyncio.run(run()) is None
+
+
+def test_l2_errors_fall_back_to_compute():
+    cache, = make_caches(1)
+
+    class BrokenRedis(object):
+        async def get(self, key):
+            raise ConnectionError("down")
+
+        async def set(self, key, value, ex=None):
+            raise ConnectionError("down")
+
+    cache._redis = BrokenRedis()
+    calls = []
+    value = asyncio.run(cache.get_or_set("k", counter(calls, "v")))
+    assert value == "v" and calls == ["v"]
+    assert cache.counters["l2_errors"] == 1
+    # L1 keeps serving while L2 backs off
+    assert asyncio.run(cache.get("k")) == "v"
+
+
+def test_cached_none_is_a_hit():
+    cache, = make_caches(1)
+    calls = []
+
+    async def run():
+        await cache.get_or_set("k", counter(calls, None))
+        return await cache.get_or_set("k", counter(calls, "computed again"))
+
+    assert asyncio.run(run()) is None
+    assert calls == [None]
+
+
+def test_hits_are_copies():
+    cache, = make_caches(1)
+
+    async def run():
+        first = await cache.get_or_set("k", counter([], {"ids": [1]}))
+        first["ids"].append(2)
+        second = await cache.get("k")
+        second["ids"].append(3)
+        return await cache.get("k")
+
+    assert asyncio.run(run()) == {"ids": [1]}
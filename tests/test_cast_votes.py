@@ -0,0 +1,25 @@
+from app.psifos.model import crud, models
+from tests.conftest import SEED_CAST_AT, SEED_VOTERS, recorded_statements, run
+
+
+def test_page_is_a_single_join_query(session_local, session):
+    other = models.Voter(election_id=2, username="other", name="Other", username_election_id="other_2", weight_init=1, weight_end=1)
+    session.add(other)
+    session.flush()
+    session.add(models.CastVote(voter_id=other.id, encrypted_ballot="{}", encrypted_ballot_hash="other", is_valid=True, cast_at=SEED_CAST_AT))
+    session.commit()
+
+    with recorded_statements(session_local) as statements:
+        votes = run(crud.get_cast_votes_by_election_id(session=session, election_id=1, page_size=8))
+    hashes = [vote.encrypted_ballot_hash for vote in votes]
+
+    assert len(statements) == 1 and "JOIN psifos_voter" in statements[0]
+    assert hashes == [f"hash{i}" for i in range(SEED_VOTERS) if i % 3][:8]
+
+
+def test_cast_votes_route_pages(client):
+    first = client.post("/election/started/cast-votes", json={"page": 0, "page_size": 5, "total": True})
+    second = client.post("/election/started/cast-votes", json={"page": 1, "page_size": 5})
+    hashes = [vote["encrypted_ballot_hash"] for vote in first.json() + second.json()]
+    assert hashes == [f"hash{i}" for i in range(SEED_VOTERS) if i % 3][:10]
+    assert first.headers["X-Total-Count"] == str(len([i for i in range(SEED_VOTERS) if i % 3]))
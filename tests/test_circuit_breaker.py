@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from sqlalchemy import exc
+
+from app.database.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.database.handler import AbstractHandler
+
+
+def make_breaker(open_seconds: float = 0) -> CircuitBreaker:
+    return CircuitBreaker(window=4, min_calls=2, error_rate=0.5, slow_call_seconds=10,
+                          slow_call_rate=1, open_seconds=open_seconds)
+
+
+def open_circuit(breaker: CircuitBreaker):
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+async def _ok():
+    return "ok"
+
+
+async def _cancelled():
+    raise asyncio.CancelledError()
+
+
+async def _broken():
+    raise ValueError("not a database error")
+
+
+async def _db_error():
+    raise exc.OperationalError("SELECT 1", {}, Exception("gone"))
+
+
+def test_opens_on_error_rate():
+    breaker = make_breaker(open_seconds=60)
+    open_circuit(breaker)
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_probe_success_closes():
+    breaker = make_breaker()
+    open_circuit(breaker)
+    handler = AbstractHandler(session_local=None, circuit_breaker=breaker)
+
+    assert asyncio.run(handler.guarded(_ok)) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_probe_db_error_reopens():
+    breaker = make_breaker()
+    open_circuit(breaker)
+    handler = AbstractHandler(session_local=None, circuit_breaker=breaker)
+
+    with pytest.raises(exc.OperationalError):
+        asyncio.run(handler.guarded(_db_error))
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+@pytest.mark.parametrize("run, error", [(_cancelled, asyncio.CancelledError), (_broken, ValueError)])
+def test_aborted_probe_is_released(run, error):
+    breaker = make_breaker()
+    open_circuit(breaker)
+    handler = AbstractHandler(session_local=None, circuit_breaker=breaker)
+
+    with pytest.raises(error):
+        asyncio.run(handler.guarded(run))
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker._probing
+
+    # The next probe goes through and closes the circuit
+    assert asyncio.run(handler.guarded(_ok)) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_abort_while_closed_is_not_counted():
+    breaker = make_breaker()
+    handler = AbstractHandler(session_local=None, circuit_breaker=breaker)
+
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            asyncio.run(handler.guarded(_broken))
+    assert breaker.state == CircuitBreaker.CLOSED
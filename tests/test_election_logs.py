@@ -0,0 +1,31 @@
+import datetime
+
+import pytz
+
+from app.config import TIMEZONE
+from app.psifos.model import crud, models
+from tests.conftest import SEED_CAST_AT, run
+
+
+def created_at(session, **kwargs) -> list:
+    logs = run(crud.get_election_logs(session=session, election_id=1, **kwargs))
+    return [log.created_at for log in logs]
+
+
+def test_range_bounds_are_inclusive(session):
+    # Seeded at SEED_CAST_AT + 0, 1 and 2 minutes
+    minute = datetime.timedelta(minutes=1)
+    assert len(created_at(session, since=SEED_CAST_AT + minute, until=SEED_CAST_AT + minute)) == 1
+    assert len(created_at(session, since=SEED_CAST_AT + minute)) == 2
+    assert len(created_at(session, until=SEED_CAST_AT + minute)) == 2
+
+
+def test_microseconds_and_aware_bounds(session):
+    local = pytz.timezone(TIMEZONE).localize(SEED_CAST_AT + datetime.timedelta(minutes=1, microseconds=500000))
+    session.add(models.ElectionLog(election_id=1, log_level="info", event="voter_login", event_params="", created_at=str(local)))
+    session.commit()
+
+    assert created_at(session, since=local, until=local) == [str(local)]
+    utc = local.astimezone(pytz.utc)
+    assert created_at(session, since=utc, until=utc) == [str(local)]
+    assert len(created_at(session, since=SEED_CAST_AT + datetime.timedelta(minutes=1), until=utc)) == 2
@@ -0,0 +1,47 @@
+import io
+import json
+
+import pytest
+
+msgpack = pytest.importorskip("msgpack")
+
+from app.psifos import encoding  # noqa: E402
+
+BALLOT = json.dumps({"answers": [{"choices": [{"alpha": str(7 ** 60), "beta": "12"}]}]})
+
+
+@pytest.mark.parametrize("value", [
+    str(7 ** 60),
+    "0" + str(7 ** 60),
+    BALLOT,
+    json.dumps({"a": [1, 2]}, separators=(",", ":")),
+    '{"a":  1}',
+    "{not json",
+    2 ** 70,
+    -(2 ** 70),
+    {"nested": [str(3 ** 50), BALLOT, None, True, 1.5]},
+])
+def test_round_trip_is_exact(value):
+    assert encoding.unpackb(encoding.packb(value)) == value
+
+
+def test_big_values_are_compact():
+    assert len(encoding.packb(BALLOT)) < len(BALLOT)
+    assert len(encoding.packb(str(7 ** 60))) < len(str(7 ** 60))
+
+
+def test_cast_votes_as_msgpack(client):
+    body = {"page_size": 5}
+    as_json = client.post("/election/started/cast-votes", json=body)
+    as_msgpack = client.post("/election/started/cast-votes", json=body, headers={"Accept": "application/msgpack"})
+    assert as_msgpack.headers["content-type"] == encoding.MSGPACK_MEDIA_TYPE
+    assert json.loads(encoding.to_json(as_msgpack.content)) == as_json.json()
+
+    ignored = client.post("/election/started/cast-votes", json=body, headers={"Accept": "application/msgpack;q=0"})
+    assert ignored.json() == as_json.json()
+
+
+def test_msgpack_export(client):
+    ndjson = client.get("/election/started/export/cast-votes").text.splitlines()
+    response = client.get("/election/started/export/cast-votes", headers={"Accept": "application/msgpack"})
+    assert list(encoding.iter_unpack(io.BytesIO(response.content))) == [json.loads(line) for line in ndjson]
@@ -0,0 +1,50 @@
+import csv
+import io
+import json
+
+from sqlalchemy import select
+
+from app.psifos import routes
+from app.psifos.export import export_chunks
+from app.psifos.model import crud
+from tests.conftest import SEED_VOTERS, run
+
+
+def test_voters_export_formats(client, monkeypatch):
+    monkeypatch.setattr(routes, "EXPORT_CHUNK_SIZE", 7)
+
+    response = client.get("/election/started/export/voters")
+    assert response.headers["content-type"] == "application/x-ndjson"
+    voters = [json.loads(line) for line in response.text.splitlines()]
+    assert [voter["username"] for voter in voters] == [f"u{i}" for i in range(SEED_VOTERS)]
+    assert voters[0].keys() == {column.key for column in crud.VOTER_EXPORT_COLUMNS}
+
+    response = client.get("/election/started/export/voters", params={"format": "csv"})
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0] == [column.key for column in crud.VOTER_EXPORT_COLUMNS]
+    assert [row[0] for row in rows[1:]] == [f"u{i}" for i in range(SEED_VOTERS)]
+
+
+def test_cast_votes_export(client):
+    response = client.get("/election/started/export/cast-votes")
+    votes = [json.loads(line) for line in response.text.splitlines()]
+    assert [vote["encrypted_ballot_hash"] for vote in votes] == [f"hash{i}" for i in range(SEED_VOTERS) if i % 3]
+    assert votes[0]["cast_at"] == "2024-01-01T10:01:00"
+
+
+def test_export_errors(client):
+    assert client.get("/election/started/export/voters", params={"format": "xml"}).status_code == 400
+    assert client.get("/election/missing/export/voters").status_code == 404
+
+
+def test_one_chunk_per_partition(session):
+    rows = session.execute(select(*crud.VOTER_EXPORT_COLUMNS)).all()
+
+    async def partitions():
+        for start in range(0, len(rows), 7):
+            yield rows[start:start + 7]
+
+    async def collect(export_format):
+        return [chunk async for chunk in export_chunks(partitions(), export_format, ["username"])]
+
+    assert len(run(collect("ndjson"))) == len(run(collect("csv"))) == -(-SEED_VOTERS // 7)
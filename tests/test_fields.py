@@ -0,0 +1,30 @@
+import pytest
+
+from fastapi import HTTPException
+
+from app.psifos.model import models, schemas
+from app.psifos.model.crud import _column_attribute
+from app.psifos.utils import parse_fields
+
+from sqlalchemy import inspect
+
+
+def test_nested_names_follow_the_response_schema():
+    fields = parse_fields("status,public_key.y,questions.title", schemas.ElectionOut, models.Election)
+    assert fields == {"status": {}, "public_key": {"y": {}}, "questions": {"title": {}}}
+
+    for raw in ("public_key._y", "questions.bogus", "status.value", "bogus"):
+        with pytest.raises(HTTPException):
+            parse_fields(raw, schemas.ElectionOut, models.Election)
+
+
+def test_untyped_nested_fields_use_the_model_columns():
+    fields = parse_fields(["username", "cast_vote.encrypted_ballot_hash"], schemas.VoterCastVote, models.Voter)
+    assert fields == {"username": {}, "cast_vote": {"encrypted_ballot_hash": {}}}
+
+
+def test_schema_names_map_to_columns():
+    mapper = inspect(models.PublicKey)
+    assert _column_attribute(mapper, "y") is models.PublicKey._y
+    assert _column_attribute(mapper, "id") is models.PublicKey.id
+    assert _column_attribute(mapper, "bogus") is None
@@ -0,0 +1,112 @@
+import asyncio
+import json
+import os
+
+import fakeredis.aioredis
+import pytest
+
+from app.psifos.jobs import JOB_KINDS, JobQueue, JobStatus, MemoryJobStore, RedisJobStore
+from tests.conftest import run
+
+
+def make_store(backend: str):
+    if backend == "memory":
+        return MemoryJobStore()
+    store = RedisJobStore("redis://localhost:6379/0", pending_ttl=60)
+    store.redis = fakeredis.aioredis.FakeRedis()
+    return store
+
+
+async def partitions(count: int, size: int):
+    for start in range(0, count, size):
+        yield [{"id": i, "name": f"voter {i}"} for i in range(start, min(start + size, count))]
+
+
+async def read_all(queue: JobQueue, job_id: str) -> str:
+    return "".join([piece async for piece in queue.read_result(job_id)])
+
+
+@pytest.mark.parametrize("backend", ["memory", "redis"])
+@pytest.mark.parametrize("count", [0, 1, 250])
+def test_chunked_result_round_trip(backend, count):
+    queue = JobQueue(make_store(backend), workers=1, result_ttl=60)
+
+    async def run():
+        await queue._write_chunked("job", partitions(count, 100))
+        return await read_all(queue, "job")
+
+    assert json.loads(asyncio.run(run())) == [{"id": i, "name": f"voter {i}"} for i in range(count)]
+
+
+@pytest.mark.parametrize("backend", ["memory", "redis"])
+def test_dropped_result_is_gone(backend):
+    store = make_store(backend)
+    queue = JobQueue(store, workers=1, result_ttl=60)
+
+    async def run():
+        await queue._write_chunked("job", partitions(10, 5))
+        path = store._results.get("job") if backend == "memory" else None
+        await store.drop_result("job")
+        return path, await read_all(queue, "job")
+
+    path, text = asyncio.run(run())
+    assert text == ""
+    assert path is None or not os.path.exists(path)
+
+
+def test_claim_retries_a_key_expired_after_set_nx():
+    store = make_store("redis")
+    get = store.redis.get
+    expired = []
+
+    async def get_after_expiry(name):
+        if not expired:
+            expired.append(name)
+            await store.redis.delete(name)
+        return await get(name)
+
+    async def run():
+        await store.redis.set(f"{store.PREFIX}:key:k", "old")
+        store.redis.get = get_after_expiry
+        claimed = await store.claim_key("k", "new")
+        return claimed, await get(f"{store.PREFIX}:key:k")
+
+    assert asyncio.run(run()) == (None, b"new")
+
+
+@pytest.mark.parametrize("backend", ["memory", "redis"])
+def test_submit_replaces_a_key_without_job(backend):
+    store = make_store(backend)
+    queue = JobQueue(store, workers=1, result_ttl=60)
+
+    async def run():
+        key = queue.job_key("bundle", {"short_name": "e"})
+        await store.claim_key(key, "expired")
+        job = await queue.submit("bundle", {"short_name": "e"})
+        again = await queue.submit("bundle", {"short_name": "e"})
+        await store.release_key(key, "expired")
+        return job, again, await store.claim_key(key, "other")
+
+    job, again, holder = asyncio.run(run())
+    assert job["id"] != "expired" and again["id"] == job["id"] and holder == job["id"]
+
+
+def test_sync_engine_computation_runs_on_a_thread(session_local, monkeypatch):
+    queue = JobQueue(make_store("memory"), workers=1, result_ttl=60)
+    loops = []
+    bundle_job = JOB_KINDS["bundle"]
+
+    async def recording_bundle_job(session, short_name):
+        loops.append(asyncio.get_running_loop())
+        return await bundle_job(session, short_name)
+
+    monkeypatch.setitem(JOB_KINDS, "bundle", recording_bundle_job)
+
+    async def run_job():
+        job = await queue.submit("bundle", {"short_name": "started"})
+        await queue._run(job)
+        return job, asyncio.get_running_loop()
+
+    job, loop = run(run_job())
+    assert job["status"] == JobStatus.DONE and job["result"]["election"]["short_name"] == "started"
+    assert loops and loops[0] is not loop
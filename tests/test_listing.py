@@ -0,0 +1,45 @@
+import asyncio
+
+from types import SimpleNamespace
+
+from app.psifos import listing
+from app.psifos.listing import ELECTION_LIST_FIELDS, observe_election_status, observe_listed_statuses
+from app.psifos.model.enums import ElectionStatusEnum
+
+
+def count_invalidations(monkeypatch) -> list:
+    invalidations = []
+
+    async def invalidate_election_index():
+        invalidations.append(True)
+
+    monkeypatch.setattr(listing, "invalidate_election_index", invalidate_election_index)
+    monkeypatch.setattr(listing, "_election_statuses", {})
+    return invalidations
+
+
+def test_status_change_invalidates(monkeypatch):
+    invalidations = count_invalidations(monkeypatch)
+
+    asyncio.run(observe_election_status(1, ElectionStatusEnum.setting_up))
+    asyncio.run(observe_election_status(1, ElectionStatusEnum.setting_up))
+    assert not invalidations
+
+    # Any transition, not only to or from Started
+    asyncio.run(observe_election_status(1, ElectionStatusEnum.ready_opening))
+    assert len(invalidations) == 1
+
+
+def test_listed_status_out_of_filter_invalidates(monkeypatch):
+    invalidations = count_invalidations(monkeypatch)
+    filters = {"statuses": [ElectionStatusEnum.started]}
+
+    asyncio.run(observe_listed_statuses([SimpleNamespace(id=1, status=ElectionStatusEnum.started)], filters))
+    assert not invalidations
+    asyncio.run(observe_listed_statuses([SimpleNamespace(id=2, status=ElectionStatusEnum.ended)], filters))
+    assert len(invalidations) == 1
+
+
+def test_list_fields_are_summary_columns():
+    assert {"questions", "trustees", "result", "public_key"}.isdisjoint(ELECTION_LIST_FIELDS)
+    assert {"id", "status", "short_name"} <= set(ELECTION_LIST_FIELDS)
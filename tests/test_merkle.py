@@ -0,0 +1,63 @@
+import asyncio
+import datetime
+
+from types import SimpleNamespace
+
+from app.psifos import merkle
+from app.psifos.merkle import ElectionTree, MerkleTree, MerkleTrees, leaf_hash, merkle_summary, node_hash
+from app.psifos.model.enums import ElectionStatusEnum
+
+START = datetime.datetime(2024, 1, 1, 10)
+
+
+def row(id: int, tracker: str, minute: int = None):
+    return SimpleNamespace(id=id, encrypted_ballot_hash=tracker, cast_at=START + datetime.timedelta(minutes=minute or id))
+
+
+def verify(tracker: str, proof: list, root: str) -> bool:
+    node = leaf_hash(tracker)
+    for step in proof:
+        sibling = bytes.fromhex(step["hash"])
+        node = node_hash(sibling, node) if step["side"] == "left" else node_hash(node, sibling)
+    return node.hex() == root
+
+
+def test_incremental_updates_match_rebuild():
+    rows = [row(i, f"hash{i}") for i in range(1, 8)]
+    tree = ElectionTree(rows[:3])
+    assert tree.apply(rows[3:])
+    assert tree.apply([row(2, "recast2", 30)])
+
+    rows[1] = row(2, "recast2", 30)
+    assert tree.summary() == merkle_summary([r.encrypted_ballot_hash for r in rows])
+    assert MerkleTree.from_leaves([]).root is None
+
+
+def test_inclusion_proofs():
+    tree = ElectionTree([row(i, f"hash{i}") for i in range(1, 12)])
+    root = tree.summary()["root"]
+    for i in range(1, 12):
+        proof = tree.inclusion_proof(f"hash{i}")
+        assert verify(f"hash{i}", proof["proof"], root)
+    assert tree.inclusion_proof("unknown") is None
+
+
+def test_status_change_refreshes_closed_tree(monkeypatch):
+    rows = [row(1, "hash1"), row(2, "hash2")]
+
+    async def get_cast_vote_leaves_by_election_id(session, election_id, after_id=None, changed_since=None):
+        return [r for r in rows if after_id is None or r.id > after_id or r.cast_at >= changed_since]
+
+    async def get_total_cast_votes_by_election_id(session, election_id):
+        return len(rows)
+
+    monkeypatch.setattr(merkle.crud, "get_cast_vote_leaves_by_election_id", get_cast_vote_leaves_by_election_id)
+    monkeypatch.setattr(merkle.crud, "get_total_cast_votes_by_election_id", get_total_cast_votes_by_election_id)
+
+    trees = MerkleTrees(ttl=3600, maxsize=4)
+    assert asyncio.run(trees.get(None, 1, ElectionStatusEnum.setting_up)).summary()["size"] == 2
+
+    # A vote cast before the status is seen to change
+    rows.append(row(3, "hash3"))
+    assert asyncio.run(trees.get(None, 1, ElectionStatusEnum.setting_up)).summary()["size"] == 2
+    assert asyncio.run(trees.get(None, 1, ElectionStatusEnum.ended)).summary()["size"] == 3
@@ -0,0 +1,70 @@
+import asyncio
+
+from app.middleware import CancelOnDisconnectMiddleware
+
+
+def make_receive(messages: list, client_gone: asyncio.Event):
+    queue = list(messages)
+
+    async def receive():
+        if queue:
+            return queue.pop(0)
+        await client_gone.wait()
+        return {"type": "http.disconnect"}
+
+    return receive
+
+
+async def _send(message):
+    pass
+
+
+def run_request(method: str, headers: list, messages: list, read_body: bool = False) -> dict:
+    outcome = {"cancelled": False, "body": None}
+
+    async def app(scope, receive, send):
+        if read_body:
+            outcome["body"] = b""
+            more_body = True
+            while more_body:
+                message = await receive()
+                outcome["body"] += message["body"]
+                more_body = message.get("more_body", False)
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            outcome["cancelled"] = True
+            raise
+
+    async def main():
+        client_gone = asyncio.Event()
+        scope = {"type": "http", "method": method, "headers": headers}
+        middleware = CancelOnDisconnectMiddleware(app)
+        task = asyncio.create_task(middleware(scope, make_receive(messages, client_gone), _send))
+        await asyncio.sleep(0.01)
+        client_gone.set()
+        await asyncio.wait_for(task, 1)
+
+    asyncio.run(main())
+    return outcome
+
+
+def test_get_is_cancelled_on_disconnect():
+    outcome = run_request("GET", [], [{"type": "http.request", "body": b"", "more_body": False}])
+    assert outcome["cancelled"]
+
+
+def test_get_body_is_still_readable():
+    outcome = run_request("GET", [], [{"type": "http.request", "body": b"", "more_body": False}], read_body=True)
+    assert outcome["body"] == b""
+    assert outcome["cancelled"]
+
+
+def test_post_is_cancelled_after_body():
+    messages = [
+        {"type": "http.request", "body": b"{}", "more_body": True},
+        {"type": "http.request", "body": b"", "more_body": False},
+    ]
+    outcome = run_request("POST", [(b"content-length", b"2")], messages, read_body=True)
+    assert outcome["body"] == b"{}"
+    assert outcome["cancelled"]
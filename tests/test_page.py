@@ -0,0 +1,22 @@
+from sqlalchemy import inspect
+
+from app.psifos.model import crud
+from tests.conftest import SEED_VOTERS, run
+
+
+def test_page_election_skips_voters_and_ballots(session):
+    election = run(crud.get_page_election_by_short_name(session=session, short_name="started"))
+    unloaded = inspect(election).unloaded
+    assert {"voters", "sharedpoints", "audited_ballots"} <= unloaded
+    assert not {"trustees", "public_key", "questions", "result"} & unloaded
+
+
+def test_election_page(client):
+    response = client.get("/election/started/page")
+    assert response.status_code == 200
+    page = response.json()
+    assert page["election"]["short_name"] == "started"
+    assert [question["title"] for question in page["election"]["questions"]] == ["Question"]
+    assert page["total_voters"] == SEED_VOTERS and page["election_has_trustees"]
+
+    assert client.get("/election/missing/page").status_code == 404
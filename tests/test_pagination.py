@@ -0,0 +1,68 @@
+import pytest
+
+from fastapi import HTTPException
+from sqlalchemy import inspect, select
+
+from app.psifos.model import crud, models
+from app.psifos.pagination import decode_cursor, encode_cursor, keyset, next_cursor
+from tests.conftest import SEED_VOTERS, run
+
+
+def test_cursor_round_trip():
+    token = encode_cursor((3, 41))
+    assert "=" not in token
+    assert decode_cursor(token) == (3, 41)
+
+    for token in ("%%%", encode_cursor(()), "bnVsbA"):
+        with pytest.raises(HTTPException) as e:
+            decode_cursor(token)
+        assert e.value.status_code == 400
+
+
+def test_keyset_seeks_after_the_key():
+    query = keyset(select(models.Voter.id), crud.VOTER_KEYSET, (1, 7))
+    compiled = str(query.compile(compile_kwargs={"literal_binds": True}))
+    assert "psifos_voter.election_id > 1 OR psifos_voter.election_id = 1 AND psifos_voter.id > 7" in compiled
+    assert compiled.endswith("ORDER BY psifos_voter.election_id, psifos_voter.id")
+
+    with pytest.raises(HTTPException):
+        keyset(select(models.Voter.id), crud.VOTER_KEYSET, (7,))
+
+
+def test_next_cursor_only_for_full_pages(session):
+    voters = run(crud.get_voters_by_election_id(session=session, election_id=1, page_size=10))
+    assert decode_cursor(next_cursor(voters, crud.VOTER_KEYSET, 10)) == (1, voters[-1].id)
+    assert next_cursor(voters[:5], crud.VOTER_KEYSET, 10) is None
+    assert next_cursor(voters, crud.VOTER_KEYSET, None) is None
+
+
+def test_sparse_fields_load_the_keyset(session):
+    fields = {"username": {}}
+    voters = run(crud.get_voters_by_election_id(session=session, election_id=1, page_size=10, fields=fields))
+    assert not {"election_id", "id"} & inspect(voters[-1]).unloaded
+    assert "name" in inspect(voters[-1]).unloaded
+
+
+def test_sparse_fields_with_cursor(client):
+    usernames, cursor = [], None
+    while True:
+        response = client.post("/election/started/voters", json={"cursor": cursor, "page_size": 7, "fields": ["username"]})
+        assert response.status_code == 200
+        assert all(voter.keys() == {"username"} for voter in response.json())
+        usernames += [voter["username"] for voter in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert usernames == [f"u{i}" for i in range(SEED_VOTERS)]
+
+
+def test_election_list_cursor(client):
+    first = client.post("/elections", json={"cursor": None, "page_size": 1})
+    second = client.post("/elections", json={"cursor": first.headers["X-Next-Cursor"], "page_size": 1})
+    assert [e["short_name"] for e in first.json() + second.json()] == ["started", "setting_up"]
+    assert "X-Next-Cursor" in second.headers
+
+    third = client.post("/elections", json={"cursor": second.headers["X-Next-Cursor"], "page_size": 1})
+    assert third.json() == [] and "X-Next-Cursor" not in third.headers
+    assert client.post("/elections", json={"cursor": "bogus", "page_size": 1}).status_code == 400
@@ -0,0 +1,57 @@
+import pytest
+
+from fastapi import HTTPException
+
+from app.psifos.model import models
+from app.psifos.results import slice_results
+
+RESULTS = {
+    "total_result": [{"ans_results": [3, 1]}, {"ans_results": [2, 2]}],
+    "grouped_result": [
+        {"group": "g0", "result": [{"ans_results": [2, 0]}, {"ans_results": [1, 1]}]},
+        {"group": "g1", "result": [{"ans_results": [1, 1]}]},
+    ],
+}
+
+
+def test_slice_by_group_and_question():
+    assert slice_results(RESULTS) == RESULTS
+    assert slice_results(RESULTS, group="g1")["grouped_result"] == [RESULTS["grouped_result"][1]]
+
+    sliced = slice_results(RESULTS, group="g0", question=1)
+    assert sliced["total_result"] == {"ans_results": [2, 2]}
+    assert sliced["grouped_result"] == [{"group": "g0", "result": {"ans_results": [1, 1]}}]
+    assert slice_results(RESULTS, question=1)["grouped_result"][1]["result"] is None
+
+    for kwargs in ({"group": "g9"}, {"question": 2}, {"question": -1}):
+        with pytest.raises(HTTPException) as e:
+            slice_results(RESULTS, **kwargs)
+        assert e.value.status_code == 404
+
+
+def test_no_results_yet():
+    assert slice_results(None, group="g0", question=0) is None
+    assert slice_results({**RESULTS, "grouped_result": None}, question=0)["grouped_result"] is None
+
+
+def test_result_route(client, session):
+    assert client.get("/election/started/result").json() is None
+    assert client.get("/election/missing/result").status_code == 404
+
+    session.add(models.Results(election_id=1, **RESULTS))
+    session.commit()
+    response = client.get("/election/started/result", params={"group": "g0", "question": 0})
+    assert response.status_code == 200
+    assert response.json()["total_result"] == {"ans_results": [3, 1]}
+    assert client.get("/election/started/result", params={"question": 5}).status_code == 404
+
+
+def test_released_results_are_cached(client, session):
+    session.query(models.Election).filter_by(short_name="started").update({"status": "results_released"})
+    session.add(models.Results(election_id=1, **RESULTS))
+    session.commit()
+    assert client.get("/election/started/result").json()["total_result"] == RESULTS["total_result"]
+
+    session.query(models.Results).update({"total_result": []})
+    session.commit()
+    assert client.get("/election/started/result").json()["total_result"] == RESULTS["total_result"]
@@ -0,0 +1,72 @@
+import hashlib
+import json
+
+from app.psifos import shards
+from app.psifos.merkle import merkle_summary
+from app.psifos.model import models
+from tests.conftest import SEED_VOTERS
+
+
+def count_builds(monkeypatch) -> list:
+    builds = []
+    build_manifest = shards._build_manifest
+
+    async def counting_build_manifest(session, short_name):
+        builds.append(short_name)
+        return await build_manifest(session, short_name)
+
+    monkeypatch.setattr(shards, "_build_manifest", counting_build_manifest)
+    return builds
+
+
+def test_shards_match_the_manifest(client, monkeypatch):
+    monkeypatch.setattr(shards, "BUNDLE_SHARD_SIZE", 7)
+    manifest = client.get("/election/started/bundle/manifest").json()
+    names = [part["name"] for part in manifest["parts"]]
+    assert names == ["election", "trustees", "result", "votes-0", "votes-1", "votes-2", "voters-0", "voters-1", "voters-2", "voters-3", "voters-4"]
+
+    items = {"votes": [], "voters": []}
+    for part in manifest["parts"]:
+        response = client.get(f"/election/started/bundle/shards/{part['name']}")
+        assert response.status_code == 200
+        assert hashlib.sha256(response.content).hexdigest() == part["sha256"] == response.headers["ETag"].strip('"')
+        if "count" in part:
+            items[part["name"].split("-")[0]] += response.json()
+
+    trackers = [f"hash{i}" for i in range(SEED_VOTERS) if i % 3]
+    assert [vote["vote_hash"] for vote in items["votes"]] == trackers
+    assert len(items["voters"]) == SEED_VOTERS
+    assert manifest["merkle_root"] == json.loads(json.dumps(merkle_summary(trackers)))
+
+
+def test_shards_do_not_rebuild_the_manifest(client, session, monkeypatch):
+    builds = count_builds(monkeypatch)
+    assert client.get("/election/started/bundle/shards/votes-0").status_code == 409
+
+    client.get("/election/started/bundle/manifest")
+    for _ in range(3):
+        assert client.get("/election/started/bundle/shards/votes-0").status_code == 200
+    assert builds == ["started"]
+
+    # A vote cast again, the snapshot is kept until it expires
+    vote = session.query(models.CastVote).first()
+    vote.encrypted_ballot, vote.encrypted_ballot_hash = '{"answers": []}', "recast"
+    session.commit()
+    client.get("/election/started/bundle/manifest")
+    assert builds == ["started"]
+    assert client.get("/election/started/bundle/shards/votes-0").status_code == 409
+
+
+def test_ended_election_manifest_follows_the_watermark(client, session, monkeypatch):
+    builds = count_builds(monkeypatch)
+    session.query(models.Election).filter_by(short_name="started").update({"status": "ended"})
+    session.commit()
+
+    client.get("/election/started/bundle/manifest")
+    client.get("/election/started/bundle/manifest")
+    assert builds == ["started"]
+
+    session.add(models.Voter(election_id=1, username="late", name="Late", username_election_id="late_1", weight_init=1, weight_end=1))
+    session.commit()
+    client.get("/election/started/bundle/manifest")
+    assert builds == ["started", "started"]
@@ -0,0 +1,58 @@
+import asyncio
+
+from types import SimpleNamespace
+
+from app.psifos import snapshots
+from app.psifos.snapshots import SnapshotRefresher
+
+
+def make_refresher(monkeypatch, watermark: list, computed: list) -> SnapshotRefresher:
+    election = SimpleNamespace(id=1, short_name="e1")
+
+    async def get_elections_by_status(session, status):
+        return [election]
+
+    async def get_election_watermark(session, election_id):
+        return watermark[0]
+
+    async def invalidate_election_index():
+        pass
+
+    monkeypatch.setattr(snapshots.crud, "get_elections_by_status", get_elections_by_status)
+    monkeypatch.setattr(snapshots.crud, "get_election_watermark", get_election_watermark)
+    monkeypatch.setattr(snapshots, "invalidate_election_index", invalidate_election_index)
+
+    def view(name):
+        async def compute(session, short_name):
+            computed.append(name)
+            return {"view": name, "watermark": watermark[0]}
+        return compute
+
+    # "stats" is due on every tick, "voters_by_weight_init" only when told
+    return SnapshotRefresher({"stats": (view("stats"), 0), "voters_by_weight_init": (view("voters_by_weight_init"), 3600)}, 0)
+
+
+def test_unchanged_watermark_skips_recompute(monkeypatch):
+    watermark, computed = [("Started", 1)], []
+    refresher = make_refresher(monkeypatch, watermark, computed)
+
+    asyncio.run(refresher.refresh(None))
+    asyncio.run(refresher.refresh(None))
+    assert computed == ["stats", "voters_by_weight_init"]
+
+
+def test_view_not_due_catches_up_with_watermark(monkeypatch):
+    watermark, computed = [("Started", 1)], []
+    refresher = make_refresher(monkeypatch, watermark, computed)
+    asyncio.run(refresher.refresh(None))
+
+    # The watermark moves while the slow view is not due
+    watermark[0] = ("Started", 2)
+    asyncio.run(refresher.refresh(None))
+    assert refresher.get("e1", "stats")["watermark"] == ("Started", 2)
+    assert refresher.get("e1", "voters_by_weight_init")["watermark"] == ("Started", 1)
+
+    # Once due, the slow view is recomputed at the new watermark
+    refresher._due["e1"]["voters_by_weight_init"] = 0
+    asyncio.run(refresher.refresh(None))
+    assert refresher.get("e1", "voters_by_weight_init")["watermark"] == ("Started", 2)
@@ -0,0 +1,21 @@
+from app import database
+from app.database.circuit_breaker import CircuitOpenError
+from app.psifos.utils import STALE_HEADER
+
+
+def test_stale_list_keeps_its_pagination_headers(client, monkeypatch):
+    body = {"cursor": None, "page_size": 1}
+    fresh = client.post("/elections", json=body)
+    assert fresh.status_code == 200 and fresh.headers["X-Total-Count"] == "2"
+
+    async def circuit_open(session, statement):
+        raise CircuitOpenError(retry_after=5)
+
+    monkeypatch.setattr(database.db_handler, "execute", circuit_open)
+    stale = client.post("/elections", json=body)
+    assert stale.status_code == 200 and stale.headers[STALE_HEADER] == "true"
+    assert stale.json() == fresh.json()
+    assert stale.headers["X-Total-Count"] == "2"
+    assert stale.headers["X-Next-Cursor"] == fresh.headers["X-Next-Cursor"]
+
+    assert client.post("/elections", json={"page_size": 2}).status_code == 503
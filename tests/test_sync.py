@@ -0,0 +1,59 @@
+import datetime
+
+from app.psifos.model import models
+from app.psifos.pagination import encode_cursor
+from tests.conftest import SEED_CAST_AT, SEED_VOTERS
+
+CAST = [i for i in range(SEED_VOTERS) if i % 3]
+
+
+def sync(client, cursor=None, **body):
+    response = client.post("/election/started/cast-votes/changes", json={"cursor": cursor, **body})
+    assert response.status_code == 200
+    return response.json()
+
+
+def catch_up(client, cursor=None, **body) -> tuple:
+    votes = []
+    while True:
+        changes = sync(client, cursor, **body)
+        votes += changes["votes"]
+        cursor = changes["cursor"]
+        if not changes["has_more"]:
+            return votes, changes
+
+
+def test_mirror_catches_up_and_follows_changes(client, session):
+    votes, changes = catch_up(client, page_size=7)
+    assert [vote["encrypted_ballot_hash"] for vote in votes] == [f"hash{i}" for i in CAST]
+    assert "encrypted_ballot" in votes[0]
+    invalid = {vote["id"] for vote in votes if not vote["is_valid"]}
+    assert set(changes["invalid_ids"]) == invalid
+
+    # The votes cast at the watermark are delivered again
+    unchanged = sync(client, changes["cursor"])
+    assert unchanged["votes"] == [] and unchanged["invalid_ids"] is None
+    assert [vote["id"] for vote in unchanged["recast"]] == [votes[-1]["id"]]
+
+    vote = session.get(models.CastVote, votes[0]["id"])
+    vote.encrypted_ballot_hash, vote.cast_at = "recast", SEED_CAST_AT + datetime.timedelta(days=1)
+    session.get(models.CastVote, votes[1]["id"]).is_valid = False
+    session.commit()
+
+    changed = sync(client, unchanged["cursor"])
+    assert [vote["encrypted_ballot_hash"] for vote in changed["recast"]] == ["recast", votes[-1]["encrypted_ballot_hash"]]
+    assert set(changed["invalid_ids"]) == invalid | {votes[1]["id"]}
+
+
+def test_ballots_can_be_left_out(client):
+    votes, _ = catch_up(client, include_ballot=False)
+    assert len(votes) == len(CAST) and "encrypted_ballot" not in votes[0]
+
+
+def test_sync_validation(client):
+    url = "/election/started/cast-votes/changes"
+    assert client.post(url, json={"cursor": encode_cursor(("x", None, None))}).status_code == 400
+    assert client.post(url, json={"cursor": encode_cursor((1, "not a date", None))}).status_code == 400
+    assert client.post(url, json={"page_size": 0}).status_code == 400
+    assert client.post(url, json={"include_ballot": "no"}).status_code == 400
+    assert client.post("/election/missing/cast-votes/changes", json={}).status_code == 404
@@ -0,0 +1,44 @@
+from app.psifos.model import models
+from app.psifos.tallies import IMMUTABLE_CACHE_CONTROL, tally_chunks
+from tests.conftest import run
+
+TALLY = '[{"alpha": "' + "7" * 100 + '", "beta": "3"}]'
+
+
+def add_tallies(session):
+    question = session.query(models.AbstractQuestion).one()
+    for group in ("g1", "g0"):
+        session.add(models.Tally(question_id=question.id, group=group, tally_type="HOMOMORPHIC", computed=True,
+                                 num_tallied=10, encrypted_tally=TALLY))
+    session.commit()
+
+
+def test_tally_listing(client, session):
+    add_tallies(session)
+    listing = client.get("/election/started/tallies", params={"page_size": 1}).json()
+    assert listing["total_groups"] == 2 and listing["groups"] == ["g0"]
+    assert [(t["question_index"], t["group"], t["size"]) for t in listing["tallies"]] == [(0, "g0", len(TALLY))]
+    assert client.get("/election/started/tallies", params={"page": 1, "page_size": 1}).json()["groups"] == ["g1"]
+
+
+def test_tally_is_streamed_in_chunks(client, session):
+    add_tallies(session)
+    tally_id = session.query(models.Tally.id).filter_by(group="g0").scalar()
+
+    async def collect():
+        return [chunk async for chunk in tally_chunks(tally_id, len(TALLY), chunk_size=16)]
+
+    chunks = run(collect())
+    assert len(chunks) == -(-len(TALLY) // 16) and "".join(chunks) == TALLY
+
+    response = client.get("/election/started/tally/0", params={"group": "g0"})
+    assert response.text == TALLY and response.headers["Cache-Control"] == "no-cache"
+    assert client.get("/election/started/tally/1", params={"group": "g0"}).status_code == 404
+
+
+def test_final_tallies_are_immutable(client, session):
+    add_tallies(session)
+    session.query(models.Election).filter_by(short_name="started").update({"status": "tally_computed"})
+    session.commit()
+    response = client.get("/election/started/tally/0", params={"group": "g1"})
+    assert response.headers["Cache-Control"] == IMMUTABLE_CACHE_CONTROL
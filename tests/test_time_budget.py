@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+
+from sqlalchemy import column, select, table
+from sqlalchemy.dialects import mysql
+
+from app.database.handler import mariadb_time_budget, statement_timeout, with_time_budget
+
+votes = table("psifos_cast_vote", column("id"))
+
+
+def compiled(statement) -> str:
+    return str(statement.compile(dialect=mysql.dialect()))
+
+
+def test_route_budget_is_applied():
+    token = statement_timeout.set(5)
+    try:
+        assert "MAX_EXECUTION_TIME(5000)" in compiled(with_time_budget(select(votes.c.id)))
+    finally:
+        statement_timeout.reset(token)
+
+
+def test_stream_budget_overrides_route_budget():
+    token = statement_timeout.set(30)
+    try:
+        assert "MAX_EXECUTION_TIME" not in compiled(with_time_budget(select(votes.c.id), 0))
+        assert "MAX_EXECUTION_TIME(120000)" in compiled(with_time_budget(select(votes.c.id), 120))
+    finally:
+        statement_timeout.reset(token)
+
+
+def test_no_budget_outside_route_classes():
+    assert "MAX_EXECUTION_TIME" not in compiled(with_time_budget(select(votes.c.id)))
+
+
+def test_mariadb_runs_under_max_statement_time():
+    statement = with_time_budget(select(votes.c.id), 2.5)
+    context = SimpleNamespace(execution_options=statement.get_execution_options())
+    sql = "SELECT psifos_cast_vote.id FROM psifos_cast_vote"
+
+    mariadb = SimpleNamespace(dialect=SimpleNamespace(is_mariadb=True))
+    assert mariadb_time_budget(mariadb, None, sql, (), context, False) == (f"SET STATEMENT max_statement_time=2.5 FOR {sql}", ())
+
+    mysql_conn = SimpleNamespace(dialect=SimpleNamespace(is_mariadb=False))
+    assert mariadb_time_budget(mysql_conn, None, sql, (), context, False) == (sql, ())
@@ -0,0 +1,27 @@
+from app.psifos.model import models
+from app.psifos.trackers import tracker_set
+from tests.conftest import SEED_CAST_AT
+
+
+def test_verify_batch(client):
+    response = client.post("/election/started/cast-votes/verify", json={"hashes": ["hash1", "hash3", "hash2", "hash1"]})
+    assert response.json() == {"found": ["hash1", "hash2", "hash1"], "missing": ["hash3"]}
+
+    assert client.post("/election/started/cast-votes/verify", json={"hashes": "hash1"}).status_code == 400
+    assert client.post("/election/missing/cast-votes/verify", json={"hashes": []}).status_code == 404
+
+
+def test_votes_after_the_tracker_set_load_are_found(client, session):
+    assert client.post("/election/started/cast-votes/verify", json={"hashes": ["late"]}).json()["missing"] == ["late"]
+    assert "hash1" in tracker_set._hashes[1][1]
+
+    voter = session.query(models.Voter).filter_by(username="u0").one()
+    session.add(models.CastVote(voter_id=voter.id, encrypted_ballot="{}", encrypted_ballot_hash="late", is_valid=True, cast_at=SEED_CAST_AT))
+    session.commit()
+    assert client.post("/election/started/cast-votes/verify", json={"hashes": ["late", "hash1"]}).json()["found"] == ["late", "hash1"]
+
+
+def test_vote_by_hash(client):
+    assert client.get("/election/started/cast-vote/hash1").json()["encrypted_ballot_hash"] == "hash1"
+    assert client.get("/election/started/cast-vote/hash3").status_code == 404
+    assert client.get("/election/missing/cast-vote/hash1").status_code == 404
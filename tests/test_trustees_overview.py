@@ -0,0 +1,46 @@
+from app.psifos.model import models
+from app.psifos.trustees import trustees_overview
+from tests.conftest import recorded_statements, run
+
+
+def add_trustee(session, number: int, step: int):
+    trustee = models.Trustee(name=f"Trustee {number}", username=f"t{number}", email=f"t{number}@example.com")
+    session.add(trustee)
+    session.flush()
+    session.add(models.TrusteeCrypto(
+        election_id=1, trustee_id=trustee.id, trustee_election_id=number, current_step=step,
+        certificate="{}", coefficients="[]", acknowledgements="[]",
+    ))
+    session.commit()
+
+
+def count_statements(session_local, session) -> int:
+    with recorded_statements(session_local) as statements:
+        run(trustees_overview(session, 1, include_crypto=True))
+    return len(statements)
+
+
+def test_overview(client, session):
+    add_trustee(session, 2, 2)
+    crypto = session.query(models.TrusteeCrypto).filter_by(trustee_election_id=1).one()
+    question = session.query(models.AbstractQuestion).one()
+    session.add(models.HomomorphicDecryption(trustee_crypto_id=crypto.id, question_id=question.id, group="g0",
+                                             decryption_factors='["5"]', decryption_proofs="[]"))
+    session.commit()
+
+    overview = client.get("/election/started/trustees/overview").json()
+    assert overview["total_trustees"] == 2 and overview["with_decryptions"] == 1
+    assert overview["by_step"] == {"waiting_decryptions": 1, "certificates_step": 1}
+    first = overview["trustees"][0]
+    assert first["decryptions"] == {"homomorphic": 1, "mixnet": 0} and "certificate" not in first
+
+    with_crypto = client.get("/election/started/trustees/overview", params={"include_crypto": True}).json()
+    assert with_crypto["trustees"][0]["decryptions_data"][0]["decryption_factors"] == ["5"]
+    assert client.get("/election/missing/trustees/overview").status_code == 404
+
+
+def test_query_count_does_not_grow_with_trustees(session_local, session):
+    before = count_statements(session_local, session)
+    for number in range(2, 6):
+        add_trustee(session, number, 1)
+    assert count_statements(session_local, session) == before
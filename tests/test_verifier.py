@@ -0,0 +1,92 @@
+import io
+import json
+
+from app.psifos import verifier
+from app.psifos.verifier import BundleReader, ElGamalKey, fiat_shamir_challenge, hash_b64, verify_bundle, verify_proof
+
+# Subgroup of order q = 11 of Z_23*, trustee secret x = 3
+KEY = ElGamalKey(p=23, g=2, q=11, y=8)
+SECRET = 3
+
+
+def decryption_proof(alpha: int, w: int = 4) -> tuple:
+    factor = pow(alpha, SECRET, KEY.p)
+    commitment = {"A": str(pow(KEY.g, w, KEY.p)), "B": str(pow(alpha, w, KEY.p))}
+    challenge = fiat_shamir_challenge(commitment)
+    proof = {"commitment": commitment, "challenge": str(challenge), "response": str((w + challenge * SECRET) % KEY.q)}
+    return factor, proof
+
+
+def make_bundle(alphas: list, factors: list = None) -> tuple:
+    pairs = [decryption_proof(alpha) for alpha in alphas]
+    text = json.dumps({"answers": [{"choices": [{"alpha": "9", "beta": "1"}]}]})
+    bundle = {
+        "election": {"questions": [{"id": 7, "index": 0}]},
+        "votes": [
+            {"vote": text, "vote_hash": hash_b64(text)},
+            {"vote": text + " ", "vote_hash": hash_b64(text)},
+            {"vote": json.loads(text), "vote_hash": hash_b64(text)},
+        ],
+        "trustees": [{
+            "trustee_id": 1,
+            "public_key": {"_p": "23", "_g": "2", "_q": "11", "_y": "8"},
+            "decryptions": [{
+                "question_id": 7,
+                "group": "g0",
+                "decryption_factors": json.dumps([str(f) for f in factors or [f for f, _ in pairs]]),
+                "decryption_proofs": json.dumps([p for _, p in pairs]),
+            }],
+        }],
+    }
+    tallies = [{"question_index": 0, "group": "g0", "tally": [{"alpha": str(a), "beta": "1"} for a in alphas]}]
+    return bundle, tallies
+
+
+def test_full_chaum_pedersen():
+    factor, proof = decryption_proof(9)
+    assert verify_proof(KEY, proof, 9, factor)
+    assert verify_proof(KEY, proof)
+    assert not verify_proof(KEY, proof, 9, (factor * 2) % KEY.p)
+
+
+def test_report():
+    bundle, tallies = make_bundle([9, 13])
+    report = verify_bundle(bundle, tallies, workers=1)
+    assert report["votes"] == {"checked": 3, "mismatches": [hash_b64(bundle["votes"][0]["vote"])], "unchecked": 1}
+    assert report["decryption_proofs"] == {"checked": 2, "invalid": [], "partially_checked": 0}
+    assert not report["ok"]
+
+
+def test_forged_factor_is_invalid():
+    bundle, tallies = make_bundle([9, 13], factors=[pow(9, SECRET, 23), 5])
+    bundle["votes"] = []
+    report = verify_bundle(bundle, tallies, workers=1)
+    assert [r["index"] for r in report["decryption_proofs"]["invalid"]] == [1]
+
+
+def test_without_tallies_is_partial():
+    bundle, _ = make_bundle([9])
+    bundle["votes"] = bundle["votes"][:1]
+    report = verify_bundle(bundle, workers=1)
+    assert report["decryption_proofs"]["partially_checked"] == 1
+    assert report["decryption_proofs"]["invalid"] == []
+    assert not report["ok"]
+
+    _, tallies = make_bundle([9])
+    assert verify_bundle(bundle, tallies, workers=1)["ok"]
+
+
+def test_reader_is_incremental():
+    bundle, _ = make_bundle([9])
+    bundle["votes"] = [{"vote_hash": str(i), "n": 10 ** 30 + i} for i in range(100)]
+    text = json.dumps(bundle, indent=1)
+
+    votes = []
+    header = BundleReader(io.StringIO(text), read_size=7).read(votes.append)
+    assert votes == bundle["votes"]
+    assert header == {key: value for key, value in bundle.items() if key != "votes"}
+
+
+def test_vote_without_text_is_unchecked():
+    mismatches, unchecked = verifier.verify_vote_chunk([{"vote": {"answers": []}, "vote_hash": "x"}])
+    assert (mismatches, unchecked) == ([], 1)